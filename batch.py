@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+"""Render many PolarMaps on the same domain in a process pool
+
+The coast line is loaded, culled and projected once in the parent
+process and placed in shared memory. The workers attach to it without
+copying, and seed their projection cache, so no worker reads the coast
+file or projects the coast.
+
+A render spec is a dictionary with the keys
+
+  output  : File name of the figure
+  draw    : Function called as draw(pmap, **kwargs), must be picklable,
+            that is defined at module level
+  kwargs  : Keyword arguments to draw, optional
+  figsize, dpi : Figure size and resolution, optional
+  savefig : Keyword arguments to savefig, optional
+
+Example:
+
+  specs = [dict(output='temp_%03d.png' % i, draw=plot_temp,
+                kwargs=dict(step=i)) for i in range(100)]
+  timings = render_batch(specs, 'coast.npz', -10, 30, 54, 72)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+import coast
+from coast import Coast
+from polarmap import PolarMap, agg_figure
+
+# The shared coast and domain, set in the worker processes by attach
+shared = {}
+
+
+# --- Functions ---
+
+
+def render_batch(specs, coastfile, lon0, lon1, lat0, lat1, vlon=None,
+                 max_workers=None):
+    """Render the specs in a process pool
+
+    Returns a list of timing dictionaries, one per spec in order, with
+    the wall times of map setup, drawing, saving and the total in seconds
+    """
+
+    # Cull and project the coast once, as a PolarMap would
+    pmap = PolarMap(lon0, lon1, lat0, lat1, coastfile, vlon=vlon,
+                    ax=agg_figure().add_subplot(1, 1, 1))
+    shm, initargs = share_coast(pmap)
+    try:
+        with ProcessPoolExecutor(
+                max_workers, initializer=attach,
+                initargs=initargs + ((lon0, lon1, lat0, lat1, vlon),)) as pool:
+            return list(pool.map(_render, specs))
+    finally:
+        shm.close()
+        shm.unlink()
+
+
+def share_coast(pmap):
+    """Put the culled and projected coast of a map in shared memory
+
+    The caller closes and unlinks the block when the workers are done.
+
+    Returns the SharedMemory block and the first arguments of the
+    worker initializer attach, to be followed by the domain
+    """
+    subset = pmap.coast_polygons
+    # Without simplification or clipping, as drawn by default
+    key, xy, poffsets = coast.project_packed(subset, pmap,
+                                             pmap.projection_key)
+
+    arrays = dict(lonlat=subset.lonlat, offsets=subset.offsets,
+                  bbox=subset.bbox, types=subset.types,
+                  xy=xy, poffsets=poffsets)
+    shm, layout = _share(arrays)
+    return shm, (shm.name, layout, subset.digest, key)
+
+
+def _share(arrays):
+    """Copy arrays into one shared memory block
+
+    Returns the block and the layout, (name, dtype, shape, offset) for
+    each array
+    """
+    layout = []
+    nbytes = 0
+    for name, a in arrays.items():
+        a = np.asarray(a)
+        layout.append((name, a.dtype.str, a.shape, nbytes))
+        nbytes += (a.nbytes + 63) // 64 * 64   # Keep 64 byte alignment
+    shm = shared_memory.SharedMemory(create=True, size=max(nbytes, 1))
+    for name, dtype, shape, offset in layout:
+        b = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+        b[...] = arrays[name]
+    return shm, layout
+
+
+def attach(name, layout, digest, key, domain):
+    """Worker initializer, attach to the shared coast
+
+    The coast and domain are put in the module dictionary shared
+    """
+    try:
+        shm = shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # Before python 3.13, the workers use the resource tracker of
+        # the parent, which already has the block registered
+        shm = shared_memory.SharedMemory(name=name)
+    a = {}
+    for aname, dtype, shape, offset in layout:
+        a[aname] = np.ndarray(shape, dtype, buffer=shm.buf, offset=offset)
+    shared['shm'] = shm
+    shared['coast'] = Coast(a['lonlat'], a['offsets'], a['bbox'],
+                             a['types'], digest=digest)
+    shared['domain'] = domain
+    coast.cache.put(key, a['xy'], a['poffsets'])
+
+
+def _render(spec):
+    """Render one spec in a worker"""
+    t0 = time.perf_counter()
+    lon0, lon1, lat0, lat1, vlon = shared['domain']
+    fig = agg_figure(figsize=spec.get('figsize'), dpi=spec.get('dpi'))
+    pmap = PolarMap(lon0, lon1, lat0, lat1, shared['coast'], vlon=vlon,
+                    ax=fig.add_subplot(1, 1, 1))
+    t1 = time.perf_counter()
+    spec['draw'](pmap, **spec.get('kwargs', {}))
+    t2 = time.perf_counter()
+    fig.savefig(spec['output'], **spec.get('savefig', {}))
+    t3 = time.perf_counter()
+    return dict(output=spec['output'], pid=os.getpid(),
+                setup=t1 - t0, draw=t2 - t1, save=t3 - t2, total=t3 - t0)
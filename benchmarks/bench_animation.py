@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""Frame rate of map animation, full redraw versus MapAnimation
+
+The baselines rebuild the whole map for each frame, or keep the
+static artists but redraw the whole figure.
+
+Usage: python bench_animation.py [nframes]
+
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from polarmap import PolarMap, agg_figure
+from mapanimation import MapAnimation, _flatten
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+
+lon0, lon1 = -10, 30
+lat0, lat1 = 54, 72
+
+lon = np.linspace(lon0, lon1, 81)
+lat = np.linspace(lat0, lat1, 37)
+llon, llat = np.meshgrid(lon, lat)
+
+
+def update(pmap, step):
+    """Dynamic layer, a moving field"""
+    field = np.sin(0.3 * llon - 0.2 * step) * np.cos(0.4 * llat)
+    return pmap.contourf(llon, llat, field, levels=np.linspace(-1, 1, 11))
+
+
+def make_map(ax=None):
+    """Map with the static layers"""
+    if ax is None:
+        ax = agg_figure(figsize=(6, 4), dpi=100).add_subplot(1, 1, 1)
+    pmap = PolarMap(lon0, lon1, lat0, lat1, COASTFILE, ax=ax)
+    land = pmap.fillcontinents(facecolor='0.7', edgecolor='black')
+    pmap.drawparallels(range(54, 73, 1))
+    pmap.drawmeridians(range(-10, 31, 2))
+    return pmap, land
+
+
+def rebuild(pmap, land, nframes):
+    """Rebuild the map and redraw the whole figure for each frame"""
+    ax = pmap.ax
+    for step in range(nframes):
+        ax.clear()
+        pmap, land = make_map(ax)
+        update(pmap, step)
+        ax.figure.canvas.draw()
+        np.array(ax.figure.canvas.buffer_rgba())
+
+
+def full_redraw(pmap, land, nframes):
+    """Redraw the whole figure for each frame"""
+    canvas = pmap.ax.figure.canvas
+    artists = []
+    for step in range(nframes):
+        for a in artists:
+            a.remove()
+        artists = _flatten(update(pmap, step))
+        canvas.draw()
+        np.array(canvas.buffer_rgba())
+
+
+def animation(pmap, land, nframes):
+    """Draw only the dynamic layer for each frame"""
+    anim = MapAnimation(pmap, foreground=[land])
+    for step in range(nframes):
+        anim.frame(update, step)
+
+
+def main():
+    nframes = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    print("method            frames/s")
+    for func in (rebuild, full_redraw, animation):
+        pmap, land = make_map()
+        t0 = time.perf_counter()
+        func(pmap, land, nframes)
+        rate = nframes / (time.perf_counter() - t0)
+        print("{:16s} {:9.2f}".format(func.__name__, rate))
+
+
+if __name__ == '__main__':
+    main()
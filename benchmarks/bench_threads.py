@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+"""Throughput of PolarMap rendering in a thread pool
+
+Each job makes an Agg figure without pyplot, draws a field, the coast
+and graticule on a PolarMap and saves a PNG to memory.
+
+Usage: python bench_threads.py [njobs]
+
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import io
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from polarmap import PolarMap, agg_figure
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+
+lon0, lon1 = -10, 30
+lat0, lat1 = 54, 72
+
+
+def render(i):
+    """Render one map to a PNG in memory"""
+    fig = agg_figure(figsize=(6, 4), dpi=100)
+    ax = fig.add_subplot(1, 1, 1)
+    pmap = PolarMap(lon0, lon1, lat0, lat1, COASTFILE, ax=ax)
+    lon = np.linspace(lon0, lon1, 200)
+    lat = np.linspace(lat0, lat1, 100)
+    llon, llat = np.meshgrid(lon, lat)
+    pmap.contourf(llon, llat, np.sin(0.2 * llon + 0.1 * i) * np.cos(0.3 * llat))
+    pmap.fillcontinents(facecolor='green')
+    pmap.drawparallels([55, 60, 65, 70])
+    pmap.drawmeridians([-10, 0, 10, 20, 30])
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png')
+    return len(buf.getvalue())
+
+
+def main():
+    njobs = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    render(0)  # Warm up caches and font loading
+    base = None
+    print("threads   maps/s  speedup")
+    for nthreads in (1, 2, 4, 8):
+        t0 = time.perf_counter()
+        with ThreadPoolExecutor(nthreads) as pool:
+            list(pool.map(render, range(njobs)))
+        rate = njobs / (time.perf_counter() - t0)
+        if base is None:
+            base = rate
+        print("{:7d} {:8.2f} {:8.2f}".format(nthreads, rate, rate / base))
+
+
+if __name__ == '__main__':
+    main()
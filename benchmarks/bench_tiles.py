@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Load test of the tile server
+
+Clients in threads request tiles over HTTP, from a local TileServer
+started in this process, or from a running server given by --url.
+The tiles are drawn from the zoom levels up to --zoom, with a few
+popular tiles requested most often, as by users panning around the
+same area. The first pass starts with an empty cache, the second
+repeats the same requests from the warm cache.
+
+Usage:
+
+  python bench_tiles.py [--clients 8] [--requests 400] [--zoom 4]
+                        [--workers N] [--processes] [--url URL]
+
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import urlopen
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from tileserver import TileServer, make_server
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+
+
+def tile_requests(n, maxzoom, seed=0):
+    """Tile paths, Zipf distributed over the tiles of each zoom level"""
+    rng = np.random.default_rng(seed)
+    paths = []
+    for i in range(n):
+        z = int(rng.integers(0, maxzoom + 1))
+        ntiles = 4**z
+        k = min(int(rng.zipf(1.5)) - 1, ntiles - 1)
+        # Popular tiles near the centre of the level
+        order = np.argsort(_centre_distance(z))
+        t = int(order[k])
+        paths.append('/{}/{}/{}.png'.format(z, t % 2**z, t // 2**z))
+    return paths
+
+
+def _centre_distance(z):
+    n = 2**z
+    j, i = np.mgrid[0:n, 0:n]
+    return ((i + 0.5 - 0.5 * n)**2 + (j + 0.5 - 0.5 * n)**2).ravel()
+
+
+def run(url, paths, clients):
+    """Request the paths from clients threads
+
+    Returns the elapsed time and the latencies in seconds
+    """
+    latencies = []
+    lock = threading.Lock()
+
+    def fetch(path):
+        t0 = time.perf_counter()
+        with urlopen(url + path) as response:
+            response.read()
+        dt = time.perf_counter() - t0
+        with lock:
+            latencies.append(dt)
+
+    t0 = time.perf_counter()
+    with ThreadPoolExecutor(clients) as pool:
+        list(pool.map(fetch, paths))
+    return time.perf_counter() - t0, np.array(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tile server load test')
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--zoom', type=int, default=4)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--processes', action='store_true')
+    parser.add_argument('--url', help='Running server, for instance '
+                        'http://127.0.0.1:8000')
+    args = parser.parse_args()
+
+    tiles = server = None
+    url = args.url
+    if url is None:
+        tiles = TileServer(-10, 30, 54, 72, COASTFILE,
+                           workers=args.workers, processes=args.processes)
+        server = make_server(tiles, port=0)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        url = 'http://{}:{}'.format(*server.server_address)
+
+    paths = tile_requests(args.requests, args.zoom)
+    print("{} requests, {} distinct tiles, {} clients".format(
+        len(paths), len(set(paths)), args.clients))
+    print("pass    tiles/s   p50 [ms]   p95 [ms]   max [ms]")
+    try:
+        for label in ('cold', 'warm'):
+            elapsed, lat = run(url, paths, args.clients)
+            p50, p95 = np.percentile(lat, [50, 95]) * 1e3
+            print("{:6s} {:8.1f} {:10.2f} {:10.2f} {:10.2f}".format(
+                label, len(paths) / elapsed, p50, p95, lat.max() * 1e3))
+        with urlopen(url + '/metrics') as response:
+            print(json.dumps(json.loads(response.read().decode('utf-8')),
+                             indent=1))
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+            tiles.close()
+
+
+if __name__ == '__main__':
+    main()
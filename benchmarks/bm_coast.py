@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of reading coast files at the GSHHS resolutions
+
+The packed format is read memory-mapped (npz) or into memory
+(npz-memory), the old pickled format (npy) by np.load and packing.
+Reading a memory-mapped file is cheap, time_load_sum includes
+touching all the vertices.
+
+GSHHSRead extracts a coast from a synthetic GSHHS binary file, the
+domain of makecoast.py, or the whole globe.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import coast
+from coast import load_coast
+from gshhs import read_coast
+from fixtures import COASTFILE, DOMAIN, RESOLUTIONS, coast_file
+
+
+class CoastLoad(object):
+    """Read a synthetic coast file"""
+
+    params = [list(RESOLUTIONS), ['npz', 'npz-memory', 'npy']]
+    param_names = ['resolution', 'format']
+    repeat = 3
+
+    def setup(self, resolution, fmt):
+        self.mmap_mode = None if fmt == 'npz-memory' else 'r'
+        self.filename = coast_file(resolution, fmt.split('-')[0])
+
+    def time_load(self, resolution, fmt):
+        load_coast(self.filename, self.mmap_mode)
+
+    def time_load_sum(self, resolution, fmt):
+        load_coast(self.filename, self.mmap_mode).lonlat.sum()
+
+
+class CoastCull(object):
+    """Read and cull a coast file to the map domain"""
+
+    params = list(RESOLUTIONS)
+    param_names = ['resolution']
+    repeat = 3
+
+    def setup(self, resolution):
+        self.filename = coast_file(resolution)
+
+    def time_cull(self, resolution):
+        coast.cull(load_coast(self.filename), *DOMAIN)
+
+
+class RepositoryCoast(object):
+    """Read the coast file of the repository"""
+
+    def time_load_sum(self):
+        load_coast(COASTFILE).lonlat.sum()
+
+
+class GSHHSRead(object):
+    """Extract a coast from a GSHHS binary file, as makecoast"""
+
+    params = [list(RESOLUTIONS), ['region', 'global']]
+    param_names = ['resolution', 'extent']
+    repeat = 3
+
+    def setup(self, resolution, extent):
+        self.filename = coast_file(resolution, 'b')
+        if extent == 'region':
+            self.box = (-12, 50, 50, 80)
+        else:
+            self.box = (-180, 180, -90, 90)
+
+    def time_read(self, resolution, extent):
+        read_coast(self.filename, *self.box, types=[1])
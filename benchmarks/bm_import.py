@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the import time of the modules
+
+Each import runs in a fresh python interpreter, the time includes
+the interpreter startup, measured alone by time_python.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+
+class Import(object):
+    """Start python and import a module"""
+
+    params = ['projection', 'coast', 'polarmap', 'mercator', 'numpy',
+              'matplotlib.pyplot']
+    param_names = ['module']
+    repeat = 10
+
+    def time_import(self, module):
+        subprocess.check_call([sys.executable, '-c', 'import ' + module],
+                              cwd=ROOT)
+
+
+class Python(object):
+    """Start python without imports"""
+
+    repeat = 10
+
+    def time_python(self):
+        subprocess.check_call([sys.executable, '-c', 'pass'])
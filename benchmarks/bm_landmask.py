@@ -0,0 +1,61 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the land/sea mask"""
+
+# ---------------
+# Imports
+# ---------------
+
+import numpy as np
+
+from coast import load_coast
+from fixtures import COASTFILE, RESOLUTIONS, coast_file, max_points
+from landmask import LandIndex
+
+
+class LandIndexBuild(object):
+    """Build the index of a synthetic coast"""
+
+    params = list(RESOLUTIONS)
+    param_names = ['resolution']
+    repeat = 3
+
+    def setup(self, resolution):
+        self.coast = load_coast(coast_file(resolution), mmap_mode=None)
+
+    def time_build(self, resolution):
+        LandIndex(self.coast)
+
+
+class LandMaskPoints(object):
+    """Query random points in the repository coast"""
+
+    params = [10**4, 10**5, 10**6, 10**7]
+    param_names = ['npoints']
+
+    def setup(self, n):
+        if n > max_points():
+            raise NotImplementedError("Above --max-points")
+        self.index = LandIndex(load_coast(COASTFILE))
+        rng = np.random.default_rng(0)
+        self.lon = rng.uniform(-12, 50, n)
+        self.lat = rng.uniform(50, 80, n)
+
+    def time_contains(self, n):
+        self.index.contains(self.lon, self.lat)
+
+
+class LandMaskGrid(object):
+    """Mask of a 0.05 degree grid, computed and cached"""
+
+    def setup(self):
+        self.index = LandIndex(load_coast(COASTFILE))
+        self.lon = np.arange(-12, 50, 0.05)
+        self.lat = np.arange(50, 80, 0.05)
+
+    def time_grid(self):
+        self.index._grids.clear()
+        self.index.grid(self.lon, self.lat)
+
+    def time_grid_cached(self):
+        self.index.grid(self.lon, self.lat)
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of the map projections on arrays of points"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from fixtures import COASTFILE, DOMAIN, large_files, max_points
+from polarmap import PolarMap, agg_figure
+from projection import memmap_output, merc
+
+SIZES = [10**3, 10**4, 10**5, 10**6, 10**7, 10**8]
+
+# Bound on the memmap files written without --large-files
+MAX_FILE_BYTES = 2**30
+
+
+def _points(n):
+    """Random lon/lat points in the map domain"""
+    if n > max_points():
+        raise NotImplementedError("Above --max-points")
+    lon0, lon1, lat0, lat1 = DOMAIN
+    rng = np.random.default_rng(0)
+    return rng.uniform(lon0, lon1, n), rng.uniform(lat0, lat1, n)
+
+
+class PolarProjection(object):
+    """Forward and inverse polar stereographic projection"""
+
+    params = SIZES
+    param_names = ['npoints']
+
+    def setup(self, n):
+        self.lon, self.lat = _points(n)
+        ax = agg_figure().add_subplot(1, 1, 1)
+        self.pmap = PolarMap(*DOMAIN, coastfile=COASTFILE, ax=ax)
+        self.x, self.y = self.pmap._ll2xy(self.lon, self.lat)
+        self.out = (np.empty(n), np.empty(n))
+
+    def time_ll2xy(self, n):
+        self.pmap._ll2xy(self.lon, self.lat)
+
+    def time_ll2xy_out(self, n):
+        self.pmap(self.lon, self.lat, out=self.out)
+
+    def time_ll2xy_float32(self, n):
+        self.pmap(self.lon, self.lat, dtype='float32')
+
+    def time_xy2ll(self, n):
+        self.pmap._xy2ll(self.x, self.y)
+
+
+class MercatorProjection(object):
+    """Mercator latitude transform"""
+
+    params = SIZES
+    param_names = ['npoints']
+
+    def setup(self, n):
+        self.lon, self.lat = _points(n)
+
+    def time_merc(self, n):
+        merc(self.lat)
+
+
+class PolarGrid(object):
+    """Projection of a lon/lat grid, from meshgrid or from the 1-D axes
+
+    The memmap case writes float32 files in the temporary directory.
+    As the other cases it is skipped above --max-points, and files
+    above 1 GB, 3 GB for the largest grid, need --large-files.
+    """
+
+    repeat = 2
+
+    params = (['1081x2401', '1801x4801', '20000x20000'],
+              ['mesh', 'axes', 'axes-float32', 'mixed', 'memmap',
+               'threads'])
+    param_names = ['shape', 'input']
+
+    def setup(self, shape, kind):
+        ny, nx = (int(n) for n in shape.split('x'))
+        if nx * ny > max_points():
+            raise NotImplementedError("Above --max-points")
+        if (kind == 'memmap' and 8 * nx * ny > MAX_FILE_BYTES and
+                not large_files()):
+            raise NotImplementedError("Needs --large-files")
+        lon0, lon1, lat0, lat1 = DOMAIN
+        self.lon = np.linspace(lon0, lon1, nx)
+        self.lat = np.linspace(lat0, lat1, ny)
+        ax = agg_figure().add_subplot(1, 1, 1)
+        self.pmap = PolarMap(*DOMAIN, coastfile=COASTFILE, ax=ax)
+        self.out = None
+        if kind == 'memmap':
+            self.tmpdir = tempfile.mkdtemp()
+            self.out = memmap_output(os.path.join(self.tmpdir, 'grid'),
+                                     (ny, nx))
+        elif kind == 'mixed':
+            # Longitudes varying along the rows, as a rotated grid
+            self.lon = np.broadcast_to(self.lon, (ny, nx)).copy()
+
+    def teardown(self, shape, kind):
+        if kind == 'memmap':
+            self.out = None
+            shutil.rmtree(self.tmpdir)
+
+    def time_grid(self, shape, kind):
+        if kind == 'mesh':
+            llon, llat = np.meshgrid(self.lon, self.lat)
+            self.pmap.grid(llon, llat)
+        elif kind == 'mixed':
+            self.pmap.grid(self.lon, self.lat[:, np.newaxis])
+        else:
+            dtype = 'float32' if kind == 'axes-float32' else None
+            threads = 4 if kind == 'threads' else None
+            self.pmap.grid(self.lon[np.newaxis, :], self.lat[:, np.newaxis],
+                           dtype=dtype, out=self.out, threads=threads)
@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+
+"""Benchmarks of map rendering on the Agg backend
+
+The layer benchmarks add one layer to a map, draw the figure and
+remove the layer again. The coast polygons are projected once and
+cached, the cold variants clear the projection cache first.
+
+The end-to-end benchmarks make the figures of example.py and
+polar_bathymetry.py, with synthetic bathymetry, and save them. The
+sweep benchmark saves one figure per sub-region of the domain.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import io
+
+import numpy as np
+from matplotlib.ticker import FixedFormatter
+
+import coast
+from fixtures import COASTFILE, DOMAIN, max_points, topography
+from polarmap import PolarMap, agg_figure
+from mercator import MercatorMap
+
+MAPS = dict(polar=PolarMap, mercator=MercatorMap)
+
+
+def _remove(h):
+    """Remove the artists returned by a drawing method
+
+    Tick labels of MercatorMap can not be removed, they are replaced
+    by the next call.
+    """
+    if isinstance(h, (tuple, list)):
+        for a in h:
+            _remove(a)
+    else:
+        try:
+            h.remove()
+        except NotImplementedError:
+            pass
+
+
+class Layers(object):
+    """Draw single map layers"""
+
+    params = list(MAPS)
+    param_names = ['map']
+
+    def setup(self, name):
+        self.fig = agg_figure(figsize=(8, 6), dpi=100)
+        self.pmap = MAPS[name](*DOMAIN, coastfile=COASTFILE,
+                               ax=self.fig.add_subplot(1, 1, 1))
+        self.llon, self.llat, depth = topography()
+        self.field = np.log10(depth)
+        self.fig.canvas.draw()
+
+    def _draw(self, h):
+        self.fig.canvas.draw()
+        _remove(h)
+
+    def time_frame(self, name):
+        self.fig.canvas.draw()
+
+    def time_fillcontinents(self, name):
+        self._draw(self.pmap.fillcontinents())
+
+    def time_fillcontinents_cold(self, name):
+        coast.cache.clear()
+        self._draw(self.pmap.fillcontinents())
+
+    def time_drawcoastlines(self, name):
+        self._draw(self.pmap.drawcoastlines())
+
+    def time_drawparallels(self, name):
+        self._draw(self.pmap.drawparallels(range(55, 72)))
+
+    def time_drawmeridians(self, name):
+        self._draw(self.pmap.drawmeridians(range(-10, 31, 2)))
+
+    def time_contourf(self, name):
+        self._draw(self.pmap.contourf(self.llon, self.llat, self.field,
+                                      levels=np.linspace(0, 3, 13)))
+
+
+class Example(object):
+    """The figure of example.py"""
+
+    params = ['png', 'pdf']
+    param_names = ['format']
+
+    def time_example(self, fmt):
+        fig = agg_figure()
+        pmap = PolarMap(*DOMAIN, coastfile=COASTFILE, facecolor='LightBlue',
+                        ax=fig.add_subplot(1, 1, 1))
+        pmap.fillcontinents(facecolor='green', edgecolor='black')
+        pmap.drawparallels([55, 60, 65, 70])
+        pmap.drawmeridians([-10, 0, 10, 20, 30])
+        fig.savefig(io.BytesIO(), format=fmt)
+
+
+class PolarBathymetry(object):
+    """The figure of polar_bathymetry.py"""
+
+    params = ['png', 'pdf']
+    param_names = ['format']
+
+    def setup(self, fmt):
+        self.llon, self.llat, self.depth = topography()
+
+    def time_polar_bathymetry(self, fmt):
+        levels = [1, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+        loglevels = [np.log10(v) for v in levels]
+        level_labels = ['0'] + [str(v) for v in levels[1:]]
+
+        fig = agg_figure()
+        pmap = PolarMap(*DOMAIN, coastfile=COASTFILE,
+                        ax=fig.add_subplot(1, 1, 1))
+        h = pmap.contourf(self.llon, self.llat, np.log10(self.depth),
+                          cmap='Blues', levels=loglevels, extend='max')
+        fig.colorbar(h, ax=pmap.ax, ticks=loglevels,
+                     format=FixedFormatter(level_labels),
+                     extend='max', shrink=0.8)
+        pmap.fillcontinents(facecolor=(0.8, 0.8, 0.2), edgecolor='black')
+        pmap.drawparallels(range(55, 71, 5))
+        pmap.drawmeridians(range(-10, 31, 10))
+        fig.savefig(io.BytesIO(), format=fmt)
+
+
+class Raster(object):
+    """Field drawn by contourf or by the raster lookup table"""
+
+    params = list(MAPS)
+    param_names = ['map']
+
+    def setup(self, name):
+        self.fig = agg_figure(figsize=(8, 6), dpi=100)
+        self.pmap = MAPS[name](*DOMAIN, coastfile=COASTFILE,
+                               ax=self.fig.add_subplot(1, 1, 1))
+        self.llon, self.llat, depth = topography((1081, 2401))
+        self.field = np.log10(depth)
+        self.levels = np.linspace(0, 3.3, 12)
+        self.fig.canvas.draw()
+
+    def time_contourf(self, name):
+        h = self.pmap.contourf(self.llon, self.llat, self.field,
+                               levels=self.levels)
+        self.fig.canvas.draw()
+        h.remove()
+
+    def time_imshow(self, name):
+        h = self.pmap.imshow(self.llon, self.llat, self.field,
+                             levels=self.levels)
+        self.fig.canvas.draw()
+        h.remove()
+
+
+class Points(object):
+    """Many points drawn by plot or binned by density"""
+
+    params = ([10**5, 10**6, 10**7, 10**8], ['plot', 'count', 'max'])
+    param_names = ['npoints', 'method']
+    repeat = 2
+
+    def setup(self, n, method):
+        if n > max_points():
+            raise NotImplementedError("Above --max-points")
+        if method == 'plot' and n > 10**6:
+            raise NotImplementedError("Too slow")
+        self.fig = agg_figure(figsize=(8, 6), dpi=100)
+        self.pmap = PolarMap(*DOMAIN, coastfile=COASTFILE,
+                             ax=self.fig.add_subplot(1, 1, 1))
+        rng = np.random.default_rng(0)
+        self.lon = rng.normal(10, 8, n)
+        self.lat = rng.normal(63, 4, n)
+        self.fig.canvas.draw()
+
+    def time_points(self, n, method):
+        if method == 'plot':
+            h = self.pmap.plot(self.lon, self.lat, '.', markersize=1)
+        else:
+            h = self.pmap.density(self.lon, self.lat, self.lon, how=method)
+        self.fig.canvas.draw()
+        _remove(h)
+
+
+class Sweep(object):
+    """The same figure for many sub-regions, saved as PNG
+
+    A new map for each region, or one map moved by set_extent. With
+    vlon 'centred', each region has its own vlon and set_extent
+    reprojects the contours.
+    """
+
+    params = (['new', 'set_extent'], ['fixed', 'centred'])
+    param_names = ['method', 'vlon']
+
+    def setup(self, method, vlon):
+        self.llon, self.llat, depth = topography()
+        self.field = np.log10(depth)
+        lon0, lon1, lat0, lat1 = DOMAIN
+        self.regions = [(lon, lon + 10, lat, lat + 6)
+                        for lon in range(lon0, lon1 - 9, 6)
+                        for lat in range(lat0, lat1 - 5, 6)]
+
+    def _draw(self, pmap):
+        pmap.contourf(self.llon, self.llat, self.field,
+                      levels=np.linspace(0, 3, 13))
+        pmap.fillcontinents()
+        pmap.drawparallels(range(54, 73, 2))
+        pmap.drawmeridians(range(-10, 31, 5))
+
+    def time_sweep(self, method, vlon):
+        fig = pmap = None
+        for lon0, lon1, lat0, lat1 in self.regions:
+            v = 0.5 * (lon0 + lon1) if vlon == 'centred' else 10.0
+            if method == 'new' or pmap is None:
+                fig = agg_figure(figsize=(6, 5), dpi=80)
+                pmap = PolarMap(lon0, lon1, lat0, lat1, COASTFILE, vlon=v,
+                                ax=fig.add_subplot(1, 1, 1))
+                self._draw(pmap)
+            else:
+                pmap.set_extent(lon0, lon1, lat0, lat1, vlon=v)
+            fig.savefig(io.BytesIO(), format='png')
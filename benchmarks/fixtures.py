@@ -0,0 +1,143 @@
+# -*- coding: utf-8 -*-
+
+"""Generated data for the benchmark suite
+
+Everything is made from seeded random numbers or analytic functions,
+the suite runs offline without GSHHS or etopo5.
+
+Synthetic coast files have roughly the number of polygons and vertices
+of the global GSHHS data sets at each resolution. The polygons are
+jagged circles with a heavy tailed size distribution, a few large
+continents and many small islands, as in GSHHS.
+
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+import sys
+import tempfile
+from collections import OrderedDict
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
+from coast import Coast, save_coast
+from gshhs import write_gshhs
+
+# Coast file of the repository, used by the rendering benchmarks
+COASTFILE = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                         os.pardir, 'coast.npz')
+
+# Map domain of example.py
+DOMAIN = (-10, 30, 54, 72)
+
+# GSHHS resolution: (polygons, vertices), approximately
+RESOLUTIONS = OrderedDict([
+    ('c', (1000, 30000)),
+    ('l', (6000, 150000)),
+    ('i', (30000, 700000)),
+    ('h', (150000, 3000000)),
+    ('f', (180000, 11000000)),
+])
+
+# Directory for the generated coast files
+FIXTURE_DIR = os.environ.get(
+    'POLARMAP_BENCH_FIXTURES',
+    os.path.join(tempfile.gettempdir(), 'polarmap-bench'))
+
+
+def max_points():
+    """Largest array size for the projection benchmarks
+
+    Set by the runner from --max-points. Arrays of 1e8 points need
+    about 5 GB of memory.
+    """
+    return int(float(os.environ.get('POLARMAP_BENCH_MAX_POINTS', '1e7')))
+
+
+def large_files():
+    """True if benchmarks may write temporary files of several GB
+
+    Set by the runner from --large-files.
+    """
+    return os.environ.get('POLARMAP_BENCH_LARGE_FILES', '') == '1'
+
+
+def synthetic_coast(npoly, nvertices, seed=0):
+    """Coast with npoly random polygons and about nvertices vertices"""
+    rng = np.random.default_rng(seed)
+    weight = rng.pareto(1.5, npoly) + 1.0
+    sizes = np.maximum(4, (weight / weight.sum() * nvertices).astype(np.int64))
+    offsets = np.zeros(npoly + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+
+    # Vertex position along each polygon, closed by the last vertex
+    poly = np.repeat(np.arange(npoly), sizes)
+    t = 2 * np.pi * ((np.arange(offsets[-1]) - offsets[poly]) /
+                     (sizes[poly] - 1.0))
+    radius = 0.01 * np.sqrt(sizes)[poly]
+    radius *= 1.0 + 0.3 * np.sin(7 * t) * rng.uniform(0.5, 1, npoly)[poly]
+    clon = rng.uniform(-180, 180, npoly)
+    clat = np.degrees(np.arcsin(rng.uniform(-0.95, 0.95, npoly)))
+    lonlat = np.empty((2, offsets[-1]))
+    lonlat[0] = clon[poly] + radius * np.cos(t)
+    lonlat[1] = np.clip(clat[poly] + radius * np.sin(t), -89.9, 89.9)
+    # Mostly land, some lakes
+    types = np.where(rng.uniform(size=npoly) < 0.9, 1, 2).astype(np.int32)
+    return Coast(lonlat, offsets, types=types)
+
+
+def coast_file(resolution, fmt='npz', directory=None):
+    """File name of a synthetic coast file, written if missing
+
+    resolution : GSHHS resolution, 'c', 'l', 'i', 'h' or 'f'
+    fmt : 'npz' for the packed format, 'npy' for the old pickled format,
+          'b' for the GSHHS binary format
+    """
+    directory = directory or FIXTURE_DIR
+    if not os.path.isdir(directory):
+        os.makedirs(directory)
+    filename = os.path.join(directory,
+                            'coast_{}.{}'.format(resolution, fmt))
+    if os.path.exists(filename):
+        return filename
+
+    coast = synthetic_coast(*RESOLUTIONS[resolution])
+    fd, tmpname = tempfile.mkstemp(suffix='.' + fmt, dir=directory)
+    if fmt == 'b':
+        os.close(fd)
+        write_gshhs(tmpname, coast)
+        os.replace(tmpname, filename)
+        return filename
+    with os.fdopen(fd, 'wb') as fid:
+        if fmt == 'npz':
+            save_coast(fid, coast)
+        else:
+            polygons = np.empty(len(coast), dtype=object)
+            for i, p in enumerate(coast):
+                polygons[i] = p.copy()
+            np.save(fid, polygons)
+    os.replace(tmpname, filename)
+    return filename
+
+
+def topography(shape=(217, 481)):
+    """Synthetic bathymetry on a lon/lat grid covering DOMAIN
+
+    Positive depth at sea, NaN on land, like polar_bathymetry.py.
+    The default shape is the 5 minute etopo5 grid.
+
+    Returns llon, llat, depth
+    """
+    lon0, lon1, lat0, lat1 = DOMAIN
+    lon = np.linspace(lon0 - 2, lon1 + 2, shape[1])
+    lat = np.linspace(lat0 - 1, lat1 + 1, shape[0])
+    llon, llat = np.meshgrid(lon, lat)
+    topo = (300 * np.sin(0.3 * llon) * np.cos(0.5 * llat) +
+            2000 * np.exp(-((llon + 2) ** 2 + (llat - 70) ** 2) / 30.0) -
+            400 * np.cos(0.2 * (llon - 10)) - 200)
+    depth = np.where(topo >= 0, np.nan, -topo)
+    return llon, llat, depth
@@ -0,0 +1,259 @@
+# -*- coding: utf-8 -*-
+
+"""Run the benchmark suite
+
+The benchmarks are classes in the bm_*.py modules, written in the
+style of airspeed velocity (asv): optional params and param_names,
+setup and teardown methods called with the parameters, and time_*
+methods that are measured. A setup raising NotImplementedError skips
+the benchmark.
+
+Each benchmark runs in a fresh python process on the Agg backend.
+The reported time is the best of the repeats, per call. The peak
+memory is the largest amount allocated by numpy and python during
+one call, traced with tracemalloc, and maxrss the high water mark of
+the process resident size, including imports and setup.
+
+Usage:
+
+  python run.py [-b REGEX] [--max-points N] [--large-files]
+                [--save FILE] [--compare FILE] [--factor F]
+
+  -b REGEX        Only run benchmarks with names matching REGEX
+  --max-points N  Largest array in the projection benchmarks,
+                  default 1e7, 1e8 needs about 5 GB memory
+  --large-files   Also run benchmarks writing temporary files of
+                  several GB, the largest memmap grid needs 4e8
+                  points and 3 GB of disk
+  --save FILE     Save the results as json
+  --compare FILE  Compare with saved results, flag times and peak
+                  memory increased by more than the factor
+  --factor F      Regression factor for --compare, default 1.2
+
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import argparse
+import glob
+import importlib
+import itertools
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+
+# Time spent on each timing sample and the total per benchmark, seconds
+SAMPLE_TIME = 0.05
+MAX_TIME = 20.0
+
+
+# --- Discovery ---
+
+
+def _param_list(cls):
+    """The parameter combinations of a benchmark class"""
+    params = getattr(cls, 'params', None)
+    if params is None:
+        return [()]
+    if params and isinstance(params[0], (list, tuple)):
+        return list(itertools.product(*params))
+    return [(p,) for p in params]
+
+
+def discover(pattern=None):
+    """List of (name, params) for all benchmarks matching the pattern
+
+    name is module.Class.method
+    """
+    sys.path[:0] = [HERE, ROOT]
+    benchmarks = []
+    for path in sorted(glob.glob(os.path.join(HERE, 'bm_*.py'))):
+        modname = os.path.splitext(os.path.basename(path))[0]
+        module = importlib.import_module(modname)
+        for clsname, cls in sorted(vars(module).items()):
+            if not (isinstance(cls, type) and cls.__module__ == modname):
+                continue
+            for method in sorted(vars(cls)):
+                if not method.startswith('time_'):
+                    continue
+                name = '.'.join((modname, clsname, method))
+                for params in _param_list(cls):
+                    label = _label(name, params)
+                    if pattern is None or re.search(pattern, label):
+                        benchmarks.append((name, params))
+    return benchmarks
+
+
+def _label(name, params):
+    if not params:
+        return name
+    return '{}({})'.format(name, ', '.join(str(p) for p in params))
+
+
+# --- Measurement, in the child process ---
+
+
+def measure(name, params):
+    """Time one benchmark and trace its peak memory
+
+    Returns a result dictionary
+    """
+    sys.path[:0] = [HERE, ROOT]
+    modname, clsname, method = name.split('.')
+    cls = getattr(importlib.import_module(modname), clsname)
+    bench = cls()
+    func = getattr(bench, method)
+
+    result = dict(name=name, params=list(params))
+    if hasattr(bench, 'setup'):
+        try:
+            bench.setup(*params)
+        except NotImplementedError as e:
+            result['skipped'] = str(e) or 'skipped'
+            return result
+
+    # Warm up and choose the number of calls per sample
+    t0 = time.perf_counter()
+    func(*params)
+    elapsed = time.perf_counter() - t0
+    number = max(1, int(SAMPLE_TIME / max(elapsed, 1e-9)))
+    repeat = getattr(bench, 'repeat', 5)
+    repeat = max(1, min(repeat, int(MAX_TIME / max(elapsed * number, 1e-9))))
+
+    samples = []
+    for r in range(repeat):
+        t0 = time.perf_counter()
+        for i in range(number):
+            func(*params)
+        samples.append((time.perf_counter() - t0) / number)
+    samples.sort()
+
+    tracemalloc.start()
+    func(*params)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if hasattr(bench, 'teardown'):
+        bench.teardown(*params)
+
+    # ru_maxrss is in kilobytes on Linux, bytes on macOS
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform != 'darwin':
+        maxrss *= 1024
+
+    result.update(time=samples[0], median=samples[len(samples) // 2],
+                  number=number, repeat=repeat, peak=peak, maxrss=maxrss)
+    return result
+
+
+def run_child(name, params):
+    """Measure a benchmark in a fresh process"""
+    env = dict(os.environ, MPLBACKEND='Agg')
+    cmd = [sys.executable, os.path.abspath(__file__),
+           '--child', name, json.dumps(list(params))]
+    proc = subprocess.run(cmd, env=env, stdout=subprocess.PIPE,
+                          stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        return dict(name=name, params=list(params),
+                    failed=proc.stderr.strip().splitlines()[-1:])
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- Reporting ---
+
+
+def _format_time(t):
+    for unit, scale in (('s', 1.0), ('ms', 1e-3), ('us', 1e-6)):
+        if t >= scale:
+            return '{:7.3f} {:2s}'.format(t / scale, unit)
+    return '{:7.3f} {:2s}'.format(t / 1e-9, 'ns')
+
+
+def _format_bytes(n):
+    for unit, scale in (('G', 2**30), ('M', 2**20), ('k', 2**10)):
+        if n >= scale:
+            return '{:7.1f}{}'.format(n / float(scale), unit)
+    return '{:7d} '.format(n)
+
+
+def report(result, reference=None, factor=1.2):
+    """Print one result line, with the ratio to the reference"""
+    label = _label(result['name'], result['params'])
+    if 'skipped' in result:
+        print('{:64s} skipped: {}'.format(label, result['skipped']))
+        return False
+    if 'failed' in result:
+        print('{:64s} failed: {}'.format(label, ' '.join(result['failed'])))
+        return False
+    line = '{:64s} {} {} {}'.format(label, _format_time(result['time']),
+                                    _format_bytes(result['peak']),
+                                    _format_bytes(result['maxrss']))
+    regression = False
+    if reference is not None and 'time' in reference:
+        ratio = result['time'] / reference['time']
+        mratio = (result['peak'] + 1.0) / (reference['peak'] + 1.0)
+        line += ' {:6.2f}x'.format(ratio)
+        if ratio > factor or mratio > factor:
+            line += '  REGRESSION'
+            regression = True
+    print(line)
+    return regression
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the benchmark suite')
+    parser.add_argument('-b', '--bench', help='Regular expression')
+    parser.add_argument('--max-points', default='1e7')
+    parser.add_argument('--large-files', action='store_true')
+    parser.add_argument('--save')
+    parser.add_argument('--compare')
+    parser.add_argument('--factor', type=float, default=1.2)
+    parser.add_argument('--child', nargs=2, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    os.environ['POLARMAP_BENCH_MAX_POINTS'] = args.max_points
+    if args.large_files:
+        os.environ['POLARMAP_BENCH_LARGE_FILES'] = '1'
+    os.environ.setdefault('MPLBACKEND', 'Agg')
+
+    if args.child:
+        name, params = args.child
+        print(json.dumps(measure(name, json.loads(params))))
+        return
+
+    reference = {}
+    if args.compare:
+        with open(args.compare) as fid:
+            for r in json.load(fid):
+                reference[_label(r['name'], r['params'])] = r
+
+    print('{:64s} {:>10s} {:>8s} {:>8s}'.format(
+        'benchmark', 'time', 'peak', 'maxrss'))
+    results = []
+    regressions = 0
+    for name, params in discover(args.bench):
+        result = run_child(name, params)
+        results.append(result)
+        ref = reference.get(_label(name, params))
+        regressions += report(result, ref, args.factor)
+
+    if args.save:
+        with open(args.save, 'w') as fid:
+            json.dump(results, fid, indent=1)
+    if regressions:
+        print('{} regressions'.format(regressions))
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,427 @@
+# -*- coding: utf-8 -*-
+
+"""Coast line polygons in a packed, memory-mappable format
+
+A packed coast file is an uncompressed npz-file with the arrays
+
+  lonlat  : float64, shape (2, N), lon and lat of all vertices
+  offsets : int64, shape (npoly+1,), polygon i is lonlat[:, offsets[i]:offsets[i+1]]
+  bbox    : float64, shape (npoly, 4), lon_min, lon_max, lat_min, lat_max
+  types   : int32, shape (npoly,), GSHHS type (1 = land, 2 = lake, ...)
+
+The members of the archive are stored, not deflated, so they are
+memory-mapped directly from the file. Several processes opening
+the same coast file share the pages.
+
+The old format, a pickled object array of (lon, lat) pairs saved
+with np.save, is still accepted by load_coast.
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import hashlib
+import os
+import struct
+import tempfile
+import threading
+import zipfile
+from collections import OrderedDict
+import numpy as np
+
+from geometry import simplify, clip_polygons, clip_lines, densify
+
+# --- Classes ---
+
+
+class Coast(object):
+    """Packed coast line polygons
+
+    Iterating over a Coast gives the polygons as (2, n) arrays,
+    so p[0], p[1] are the longitudes and latitudes as in the old format.
+    """
+
+    def __init__(self, lonlat, offsets, bbox=None, types=None,
+                 filename=None, digest=None):
+        self.lonlat = lonlat
+        self.offsets = offsets
+        if bbox is None:
+            bbox = _bbox(lonlat, offsets)
+        self.bbox = bbox
+        if types is None:
+            types = np.ones(len(offsets) - 1, dtype=np.int32)
+        self.types = types
+        self.filename = filename
+        self._digest = digest
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        return self.lonlat[:, self.offsets[i]:self.offsets[i+1]]
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def nvertices(self):
+        """Total number of vertices"""
+        return self.lonlat.shape[1]
+
+    @property
+    def digest(self):
+        """SHA1 hex digest identifying the polygons
+
+        Stored in packed coast files, otherwise computed from
+        the vertices and polygon offsets on first use.
+        """
+        if self._digest is None:
+            h = hashlib.sha1(np.ascontiguousarray(self.lonlat))
+            h.update(np.ascontiguousarray(self.offsets, dtype=np.int64))
+            self._digest = h.hexdigest()
+        return self._digest
+
+    def subset(self, index, shift=None):
+        """New Coast with the polygons selected by index or boolean mask
+
+        shift : Longitude shift of each selected polygon, optional
+        """
+        index = np.asarray(index)
+        if index.dtype == bool:
+            index = np.flatnonzero(index)
+        start = self.offsets[index]
+        sizes = self.offsets[index + 1] - start
+        offsets = np.zeros(len(index) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(sizes)
+        # Vertex indices of the selected polygons
+        vertex = (np.repeat(start - offsets[:-1], sizes) +
+                  np.arange(offsets[-1]))
+        lonlat = self.lonlat[:, vertex]
+        bbox = self.bbox[index]
+        # Derive the digest without hashing the vertices
+        h = hashlib.sha1(self.digest.encode('ascii'))
+        h.update(index.astype(np.int64))
+        if shift is not None and np.any(shift):
+            shift = np.asarray(shift, dtype=np.float64)
+            lonlat[0] += np.repeat(shift, sizes)
+            bbox = bbox + np.column_stack((shift, shift, 0 * shift,
+                                           0 * shift))
+            h.update(shift)
+        return Coast(lonlat, offsets, bbox, self.types[index],
+                     filename=self.filename, digest=h.hexdigest())
+
+
+class ProjectionCache(object):
+    """LRU cache of projected coast polygons
+
+    Shared by all map instances in a process through the module
+    variable cache.
+
+    maxbytes : Memory bound for the cached vertex arrays
+    cachedir : Directory for an optional on-disk cache, shared
+               between processes. The files are never evicted.
+    """
+
+    def __init__(self, maxbytes=256 * 2**20, cachedir=None):
+        self.maxbytes = maxbytes
+        self.cachedir = cachedir
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._items)
+
+    def get(self, key):
+        """Return cached (xy, offsets) or None"""
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                value = None
+            else:
+                self._items[key] = value   # Most recently used
+                self.hits += 1
+                return value
+        value = self._read(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+            self._insert(key, value)
+        return value
+
+    def put(self, key, xy, offsets):
+        """Store projected vertices, xy of shape (N, 2)"""
+        self._insert(key, (xy, offsets))
+        self._write(key, xy, offsets)
+
+    def clear(self):
+        """Empty the in-memory cache"""
+        with self._lock:
+            self._items.clear()
+            self.nbytes = 0
+
+    def _insert(self, key, value):
+        nbytes = value[0].nbytes + value[1].nbytes
+        with self._lock:
+            if key in self._items:
+                return
+            self._items[key] = value
+            self.nbytes += nbytes
+            while self.nbytes > self.maxbytes and self._items:
+                xy, offsets = self._items.popitem(last=False)[1]
+                self.nbytes -= xy.nbytes + offsets.nbytes
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cachedir, name + '.npz')
+
+    def _read(self, key):
+        if self.cachedir is None:
+            return None
+        try:
+            arrays = _mmap_npz(self._path(key), 'r')
+        except (IOError, OSError, zipfile.BadZipfile):
+            return None
+        return arrays['xy'], arrays['offsets']
+
+    def _write(self, key, xy, offsets):
+        if self.cachedir is None:
+            return
+        if not os.path.isdir(self.cachedir):
+            os.makedirs(self.cachedir)
+        # Write to a temporary file and rename for atomic update
+        fd, tmpname = tempfile.mkstemp(suffix='.npz', dir=self.cachedir)
+        with os.fdopen(fd, 'wb') as fid:
+            np.savez(fid, xy=xy, offsets=offsets)
+        os.replace(tmpname, self._path(key))
+
+
+# --- Module variables ---
+
+# Projected coast polygons, shared by all maps in the process
+cache = ProjectionCache()
+
+
+# --- Functions ---
+
+
+def pack(polygons, types=None, filename=None):
+    """Make a Coast from a sequence of (lon, lat) polygons"""
+    polygons = list(polygons)
+    sizes = [len(p[0]) for p in polygons]
+    offsets = np.zeros(len(polygons) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+    lonlat = np.empty((2, offsets[-1]))
+    for p, i0, i1 in zip(polygons, offsets[:-1], offsets[1:]):
+        lonlat[0, i0:i1] = p[0]
+        lonlat[1, i0:i1] = p[1]
+    if types is not None:
+        types = np.asarray(types, dtype=np.int32)
+    return Coast(lonlat, offsets, types=types, filename=filename)
+
+
+def save_coast(coastfile, polygons, types=None):
+    """Save coast polygons to a packed coast file
+
+    polygons : A Coast or a sequence of (lon, lat) polygons
+    types : GSHHS type of each polygon, default 1 (land)
+    """
+    if isinstance(polygons, Coast):
+        coast = polygons
+    else:
+        coast = pack(polygons, types)
+    # np.savez stores the members uncompressed
+    np.savez(coastfile, lonlat=coast.lonlat, offsets=coast.offsets,
+             bbox=coast.bbox, types=coast.types,
+             digest=np.array(coast.digest))
+
+
+def load_coast(coastfile, mmap_mode='r'):
+    """Read a coast file
+
+    coastfile : File name of a packed (npz) or old style (npy) coast file,
+                a Coast instance is returned unchanged
+    mmap_mode : Memory-map mode for the packed format, None reads into memory
+    """
+
+    if isinstance(coastfile, Coast):
+        return coastfile
+
+    if zipfile.is_zipfile(coastfile):
+        if mmap_mode is None:
+            with np.load(coastfile) as f:
+                arrays = dict(f)
+        else:
+            arrays = _mmap_npz(coastfile, mmap_mode)
+        digest = arrays.get('digest')
+        if digest is not None:
+            digest = str(digest[()])
+        return Coast(arrays['lonlat'], arrays['offsets'],
+                     arrays['bbox'], arrays['types'], filename=coastfile,
+                     digest=digest)
+
+    # Fallback, pickled object array, possibly from python2
+    polygons = np.load(coastfile, allow_pickle=True, encoding='latin1')
+    return pack(polygons, filename=coastfile)
+
+
+def project(coast, proj, key, tolerance=None, box=None, lines=False,
+            step=None):
+    """Project and optionally clip and simplify the coast polygons
+
+    proj : Projection function, x, y = proj(lon, lat)
+    key : Hashable identification of the projection and its parameters
+    tolerance : Douglas-Peucker tolerance in projected units, None for
+                no simplification
+    box : (lon0, lon1, lat0, lat1), clip the polygons to the box
+          before projecting, None for no clipping
+    lines : Clip as lines, for coast lines, instead of as polygons
+    step : Longitude step of points inserted where clipped polygons
+           follow the parallels lat0 and lat1, starting from lon0
+
+    The result is cached in the module's ProjectionCache
+    per (coast digest, key, tolerance, box, lines, step).
+
+    Returns a list of (n, 2) arrays of projected vertices
+    """
+    xy, offsets = project_packed(coast, proj, key, tolerance, box, lines,
+                                 step)[1:]
+    return np.split(xy, offsets[1:-1])
+
+
+def project_packed(coast, proj, key, tolerance=None, box=None, lines=False,
+                   step=None):
+    """Projected coast polygons as packed arrays, see project
+
+    The arrays are returned also if they are too large for the cache.
+
+    Returns the cache key, the (N, 2) vertices xy and the polygon
+    offsets into xy
+    """
+    ckey = cache_key(coast, key, tolerance, box, lines, step)
+    value = cache.get(ckey)
+    if value is None:
+        lon, lat = coast.lonlat
+        offsets = coast.offsets
+        if box is not None:
+            if lines:
+                lon, lat, offsets = clip_lines(lon, lat, offsets, box)
+            else:
+                lon, lat, offsets = clip_polygons(lon, lat, offsets, box)
+                if step:
+                    lon0, lon1, lat0, lat1 = box
+                    grid = lon0 + step * np.arange(
+                        int(np.ceil((lon1 - lon0) / step)) + 1)
+                    lon, lat, offsets = densify(lon, lat, offsets,
+                                                (lat0, lat1), grid)
+        x, y = proj(lon, lat)
+        if tolerance:
+            x, y, offsets = simplify(x, y, offsets, tolerance)
+        xy = np.column_stack((x, y))
+        offsets = np.asarray(offsets)
+        cache.put(ckey, xy, offsets)
+    else:
+        xy, offsets = value
+    return ckey, xy, offsets
+
+
+def cache_key(coast, key, tolerance=None, box=None, lines=False,
+              step=None):
+    """Key of projected coast polygons in the ProjectionCache
+
+    The arguments are those of project
+    """
+    if box is None:
+        lines, step = False, None
+    return (coast.digest, key, tolerance, box, lines, step)
+
+
+def cull(coast, lon0, lon1, lat0, lat1):
+    """Select the polygons overlapping a lon/lat box
+
+    Uses only the bounding boxes of the polygons. Polygons overlapping
+    the box only with the longitudes shifted by 360 degrees, as across
+    the dateline, are kept with their longitudes shifted.
+
+    Returns
+    subset : Coast with the polygons overlapping the box
+    inside : Boolean array, True for polygons in subset fully inside the box
+    stats : Dictionary with polygon and vertex counts before and after
+    """
+    lonmin, lonmax, latmin, latmax = np.asarray(coast.bbox).T
+    lat_overlap = (latmax >= lat0) & (latmin <= lat1)
+    overlap = np.zeros(len(lonmin), dtype=bool)
+    shift = np.zeros(len(lonmin))
+    for s in (0.0, -360.0, 360.0):
+        hit = (lat_overlap & ~overlap &
+               (lonmax + s >= lon0) & (lonmin + s <= lon1))
+        shift[hit] = s
+        overlap |= hit
+    lonmin = lonmin + shift
+    lonmax = lonmax + shift
+    inside = ((lonmin >= lon0) & (lonmax <= lon1) &
+              (latmin >= lat0) & (latmax <= lat1))
+    if overlap.all() and not shift.any():
+        subset = coast   # Already culled, avoid a copy
+    else:
+        subset = coast.subset(overlap, shift[overlap])
+    inside = inside[overlap]
+    stats = dict(polygons=len(coast),
+                 vertices=coast.nvertices,
+                 culled_polygons=len(subset),
+                 culled_vertices=subset.nvertices,
+                 inside_polygons=int(inside.sum()))
+    return subset, inside, stats
+
+
+def _bbox(lonlat, offsets):
+    """Bounding box of each polygon"""
+    if len(offsets) < 2:
+        return np.zeros((0, 4))
+    start = offsets[:-1]
+    lon, lat = lonlat
+    return np.column_stack((np.minimum.reduceat(lon, start),
+                            np.maximum.reduceat(lon, start),
+                            np.minimum.reduceat(lat, start),
+                            np.maximum.reduceat(lat, start)))
+
+
+def _mmap_npz(filename, mode):
+    """Memory-map the members of an uncompressed npz-file"""
+    arrays = {}
+    with zipfile.ZipFile(filename) as zf, open(filename, 'rb') as fid:
+        for info in zf.infolist():
+            name = info.filename[:-4]   # Strip .npy
+            if info.compress_type != zipfile.ZIP_STORED:
+                arrays[name] = np.load(zf.open(info))
+                continue
+            # Skip the local file header
+            fid.seek(info.header_offset + 26)
+            nname, nextra = struct.unpack('<HH', fid.read(4))
+            fid.seek(info.header_offset + 30 + nname + nextra)
+            version = np.lib.format.read_magic(fid)
+            if version == (1, 0):
+                header = np.lib.format.read_array_header_1_0(fid)
+            else:
+                header = np.lib.format.read_array_header_2_0(fid)
+            shape, fortran_order, dtype = header
+            if np.prod(shape) == 0:
+                arrays[name] = np.empty(shape, dtype=dtype)
+                continue
+            arrays[name] = np.memmap(
+                filename, dtype=dtype, mode=mode, offset=fid.tell(),
+                shape=shape, order='F' if fortran_order else 'C')
+    return arrays
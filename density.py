@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+
+"""Density images of many points, binned at pixel resolution
+
+Instead of one plot vertex per point, the points are projected in
+chunks and binned into a 2-D histogram with one bin per output pixel
+of the axes. The bins hold the number of points, or the mean or
+maximum of values at the points. The result is drawn as one image.
+
+The memory is a few arrays of the image size and of the chunk size,
+independent of the number of points. The points can be given as
+arrays, or as an iterable of chunks for data read piece by piece.
+
+Example:
+
+  pmap.density(lon, lat, cmap='viridis', norm=LogNorm())
+  pmap.density(((d.lon, d.lat, d.speed) for d in read_days(files)),
+               how='max')
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import numpy as np
+
+# Points projected and binned at a time
+CHUNK = 2**20
+
+# --- Classes ---
+
+
+class DensityGrid(object):
+    """Pixel bins of an image, accumulating points
+
+    shape : Image shape, (height, width)
+    extent : Data coordinates of the image, (x0, x1, y0, y1)
+    how : 'count', 'mean' or 'max' of the values in each bin
+    """
+
+    def __init__(self, shape, extent, how='count'):
+        if how not in ('count', 'mean', 'max'):
+            raise ValueError("Unknown aggregation {}".format(how))
+        self.shape = shape
+        self.extent = extent
+        self.how = how
+        npixels = shape[0] * shape[1]
+        self.count = np.zeros(npixels, dtype=np.int64)
+        if how == 'mean':
+            self.total = np.zeros(npixels)
+        elif how == 'max':
+            self.maximum = np.full(npixels, -np.inf)
+
+    def add(self, x, y, values=None):
+        """Bin points in map coordinates, with values for mean and max"""
+        x0, x1, y0, y1 = self.extent
+        height, width = self.shape
+        i = np.floor((np.asarray(x) - x0) * (width / (x1 - x0)))
+        j = np.floor((np.asarray(y) - y0) * (height / (y1 - y0)))
+        inside = (i >= 0) & (i < width) & (j >= 0) & (j < height)
+        pixel = (j[inside] * width + i[inside]).astype(np.intp)
+        npixels = len(self.count)
+        self.count += np.bincount(pixel, minlength=npixels)
+        if self.how == 'count':
+            return
+        if values is None:
+            raise ValueError("Values are needed for {}".format(self.how))
+        values = np.broadcast_to(values, np.shape(x))[inside]
+        if self.how == 'mean':
+            self.total += np.bincount(pixel, weights=values,
+                                      minlength=npixels)
+        else:
+            np.maximum.at(self.maximum, pixel, values)
+
+    def image(self):
+        """The aggregated image, NaN in pixels without points"""
+        empty = self.count == 0
+        if self.how == 'count':
+            image = self.count.astype(np.float64)
+        elif self.how == 'mean':
+            with np.errstate(invalid='ignore', divide='ignore'):
+                image = self.total / self.count
+        else:
+            image = self.maximum.copy()
+        image[empty] = np.nan
+        return image.reshape(self.shape)
+
+
+# --- Functions ---
+
+
+def chunks(lon, lat=None, values=None, chunk=CHUNK):
+    """Chunks of lon, lat, values from arrays or an iterable
+
+    With lat None, lon is an iterable of (lon, lat) or
+    (lon, lat, values) tuples, each split further if larger than chunk.
+
+    Yields lon, lat, values, values is None without values
+    """
+    if lat is not None:
+        source = [(lon, lat, values)]
+    else:
+        source = lon
+    for item in source:
+        lon, lat = np.asarray(item[0]).ravel(), np.asarray(item[1]).ravel()
+        values = item[2] if len(item) > 2 else None
+        if values is not None:
+            values = np.broadcast_to(values, np.shape(item[0])).ravel()
+        for i in range(0, len(lon), chunk):
+            yield (lon[i:i + chunk], lat[i:i + chunk],
+                   None if values is None else values[i:i + chunk])
+
+
+def accumulate(pmap, grid, lon, lat=None, values=None, chunk=CHUNK):
+    """Project points in chunks and bin them in a DensityGrid
+
+    Points outside the lon/lat domain of the map are skipped.
+
+    Returns the number of points binned
+    """
+    n = 0
+    for clon, clat, cvalues in chunks(lon, lat, values, chunk):
+        inside = ((clon >= pmap.lon0) & (clon <= pmap.lon1) &
+                  (clat >= pmap.lat0) & (clat <= pmap.lat1))
+        if cvalues is not None:
+            inside &= ~np.isnan(cvalues)
+        if not inside.all():
+            clon, clat = clon[inside], clat[inside]
+            if cvalues is not None:
+                cvalues = cvalues[inside]
+        x, y = pmap(clon, clat)
+        grid.add(x, y, cvalues)
+        n += len(clon)
+    return n
+
+
+def show(ax, grid, **kwargs):
+    """Draw a DensityGrid with imshow
+
+    kwargs : Passed on to imshow, like cmap, norm, vmin and vmax
+
+    Returns the AxesImage
+    """
+    # Keep the aspect of the axes, the bins are its pixels
+    opts = dict(interpolation='nearest', aspect=ax.get_aspect())
+    opts.update(kwargs)
+    limits = ax.axis()
+    h = ax.imshow(grid.image(), extent=grid.extent, origin='lower', **opts)
+    ax.axis(limits)
+    return h
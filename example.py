@@ -12,7 +12,7 @@ import polarmap
 lon0, lon1 = -10, 30       # Longitude range
 lat0, lat1 =  54, 72       # Latitude range
 
-pmap = polarmap.PolarMap(lon0, lon1, lat0, lat1, 'coast.npy',
+pmap = polarmap.PolarMap(lon0, lon1, lat0, lat1, 'coast.npz',
                          facecolor='LightBlue')
 
 pmap.fillcontinents(facecolor='green', edgecolor='black')
@@ -0,0 +1,39 @@
+# -*- coding: utf-8 -*-
+
+# Render a sequence of maps in parallel with batch.render_batch
+
+# -----------------------------------
+# Bjørn Ådlandsvik <bjorn@imr.no>
+# Institute of Marine Research
+# -----------------------------------
+
+import numpy as np
+from batch import render_batch
+
+# Define geographical extent
+lon0, lon1 = -10, 30       # Longitude range
+lat0, lat1 = 54, 72        # Latitude range
+
+
+def draw(pmap, step):
+    """Draw a synthetic field for one time step"""
+    lon = np.linspace(lon0, lon1, 161)
+    lat = np.linspace(lat0, lat1, 73)
+    llon, llat = np.meshgrid(lon, lat)
+    field = np.sin(0.3 * llon - 0.2 * step) * np.cos(0.4 * llat)
+    pmap.contourf(llon, llat, field, cmap='RdBu_r')
+    pmap.fillcontinents(facecolor='0.7', edgecolor='black')
+    pmap.drawparallels([55, 60, 65, 70])
+    pmap.drawmeridians([-10, 0, 10, 20, 30])
+
+
+if __name__ == '__main__':
+    specs = [dict(output='batch_{:03d}.png'.format(i), draw=draw,
+                  kwargs=dict(step=i), figsize=(6, 4), dpi=100)
+             for i in range(24)]
+    timings = render_batch(specs, 'coast.npz', lon0, lon1, lat0, lat1)
+
+    print("output            pid   setup    draw    save   total")
+    for t in timings:
+        print("{output:14s} {pid:6d} {setup:7.3f} {draw:7.3f} "
+              "{save:7.3f} {total:7.3f}".format(**t))
@@ -12,7 +12,7 @@ from mercator import MercatorMap
 lon0, lon1 = -10, 30       # Longitude range
 lat0, lat1 =  54, 72       # Latitude range
 
-pmap = MercatorMap(lon0, lon1, lat0, lat1, 'coast.npy',
+pmap = MercatorMap(lon0, lon1, lat0, lat1, 'coast.npz',
                    facecolor='LightBlue')
 
 pmap.fillcontinents(facecolor='green', edgecolor='black')
@@ -0,0 +1,337 @@
+# -*- coding: utf-8 -*-
+
+"""Vectorized geometry on packed polygons
+
+Polygons are packed as in coast.py, vertex arrays x, y with
+polygon i given by the slice offsets[i]:offsets[i+1].
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import numpy as np
+
+# --- Functions ---
+
+
+def simplify(x, y, offsets, tolerance):
+    """Douglas-Peucker simplification of packed polygons
+
+    All polygons are handled together, the recursion is replaced by
+    iteration over the active segments of all polygons at once.
+    The first and last vertex of each polygon are always kept.
+
+    Returns simplified x, y, offsets
+    """
+
+    x = np.asarray(x)
+    y = np.asarray(y)
+    offsets = np.asarray(offsets)
+    keep = np.zeros(len(x), dtype=bool)
+    keep[offsets[:-1]] = True
+    keep[offsets[1:] - 1] = True
+    tol2 = tolerance * tolerance
+
+    # Active segments, first and last vertex
+    s = offsets[:-1]
+    e = offsets[1:] - 1
+    while True:
+        active = e - s > 1
+        s, e = s[active], e[active]
+        if len(s) == 0:
+            break
+
+        # Interior vertices of all active segments
+        count = e - s - 1
+        first = np.zeros(len(s), dtype=np.int64)
+        first[1:] = np.cumsum(count)[:-1]
+        seg = np.repeat(np.arange(len(s)), count)
+        vertex = np.arange(count.sum()) - first[seg] + s[seg] + 1
+
+        # Squared distance to the line (or point) from start to end
+        x0, y0 = x[s][seg], y[s][seg]
+        dx, dy = x[e][seg] - x0, y[e][seg] - y0
+        px, py = x[vertex] - x0, y[vertex] - y0
+        len2 = dx * dx + dy * dy
+        dist2 = np.where(len2 > 0,
+                         (px * dy - py * dx) ** 2 / np.where(len2 > 0, len2, 1),
+                         px * px + py * py)
+
+        # The farthest vertex of each segment
+        dmax = np.maximum.reduceat(dist2, first)
+        cand = np.flatnonzero(dist2 == dmax[seg])
+        _, i = np.unique(seg[cand], return_index=True)
+        farthest = vertex[cand[i]]
+
+        # Split the segments with a vertex outside the tolerance
+        split = dmax > tol2
+        k = farthest[split]
+        keep[k] = True
+        s = np.concatenate((s[split], k))
+        e = np.concatenate((k, e[split]))
+
+    # Pack the result
+    count = np.add.reduceat(keep.astype(np.int64), offsets[:-1])
+    new_offsets = np.zeros_like(offsets)
+    new_offsets[1:] = np.cumsum(count)
+    return x[keep], y[keep], new_offsets
+
+
+def auto_tolerance(ax, dpi=None):
+    """Simplification tolerance in data units from the size of an Axes
+
+    Half a pixel at the figure resolution, or at dpi if given,
+    rounded down to a power of two for better cache reuse.
+    """
+    fig = ax.figure
+    if dpi is None:
+        dpi = fig.dpi
+    width, height = fig.get_size_inches() * ax.get_position().size * dpi
+    xmin, xmax = ax.get_xlim()
+    ymin, ymax = ax.get_ylim()
+    pixel = max(abs(xmax - xmin) / width, abs(ymax - ymin) / height)
+    return 2.0 ** np.floor(np.log2(0.5 * pixel))
+
+
+def clip_polygons(x, y, offsets, box):
+    """Sutherland-Hodgman clipping of packed polygons to a box
+
+    box : (xmin, xmax, ymin, ymax)
+
+    The polygons are treated as closed, the output polygons are
+    explicitly closed. Polygons outside the box are removed.
+
+    Returns x, y, offsets
+    """
+    xmin, xmax, ymin, ymax = box
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = np.asarray(offsets)
+    for axis, value, upper in ((0, xmin, False), (0, xmax, True),
+                               (1, ymin, False), (1, ymax, True)):
+        x, y, offsets = _clip_side(x, y, offsets, axis, value, upper)
+    return _close(x, y, offsets)
+
+
+def _clip_side(x, y, offsets, axis, value, upper):
+    """Clip packed polygons to one side of a box"""
+    offsets = _drop_small(offsets, 1)
+    n = len(x)
+    if n == 0:
+        return x, y, offsets
+    sizes = np.diff(offsets)
+    c = x if axis == 0 else y
+    inside = c <= value if upper else c >= value
+
+    # Previous vertex, cyclic within each polygon
+    prev = np.arange(-1, n - 1)
+    prev[offsets[:-1]] = offsets[1:] - 1
+    cross = inside != inside[prev]
+
+    # Each vertex gives an intersection with the edge from the previous
+    # vertex if it crosses the side, followed by itself if inside
+    count = inside.astype(np.int64) + cross
+    start = np.cumsum(count) - count
+    out = np.empty((2, count.sum()))
+
+    i = np.flatnonzero(cross)
+    p = prev[i]
+    t = (value - c[p]) / (c[i] - c[p])
+    out[0, start[i]] = x[p] + t * (x[i] - x[p])
+    out[1, start[i]] = y[p] + t * (y[i] - y[p])
+    out[axis, start[i]] = value   # Exactly on the side
+
+    j = np.flatnonzero(inside)
+    out[0, start[j] + cross[j]] = x[j]
+    out[1, start[j] + cross[j]] = y[j]
+
+    polygon = np.repeat(np.arange(len(sizes)), sizes)
+    new_sizes = np.bincount(polygon, weights=count, minlength=len(sizes))
+    new_offsets = np.zeros_like(offsets)
+    new_offsets[1:] = np.cumsum(new_sizes.astype(np.int64))
+    return out[0], out[1], new_offsets
+
+
+def _drop_small(offsets, size):
+    """Offsets without the polygons with fewer than size vertices"""
+    sizes = np.diff(offsets)
+    if (sizes >= size).all():
+        return offsets
+    new_offsets = np.zeros(np.count_nonzero(sizes >= size) + 1,
+                           dtype=offsets.dtype)
+    new_offsets[1:] = np.cumsum(sizes[sizes >= size])
+    return new_offsets
+
+
+def _close(x, y, offsets):
+    """Drop degenerate polygons and repeat the first vertex at the end"""
+    sizes = np.diff(offsets)
+    big = sizes >= 3
+    vertex = np.repeat(big, sizes)
+    x, y = x[vertex], y[vertex]
+    offsets = _drop_small(offsets, 3)
+    first = offsets[:-1]
+    # Insert the first vertex of each polygon after its last one
+    x = np.insert(x, offsets[1:], x[first])
+    y = np.insert(y, offsets[1:], y[first])
+    offsets = offsets + np.arange(len(offsets))
+    return x, y, offsets
+
+
+def clip_lines(x, y, offsets, box):
+    """Liang-Barsky clipping of packed polylines to a box
+
+    box : (xmin, xmax, ymin, ymax)
+
+    A polyline leaving and entering the box is split in pieces.
+
+    Returns x, y, offsets of the pieces
+    """
+    xmin, xmax, ymin, ymax = box
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    offsets = _drop_small(np.asarray(offsets), 2)
+
+    # Segments from vertex i0 to i0 + 1 within a polyline
+    last = np.zeros(len(x), dtype=bool)
+    last[offsets[1:] - 1] = True
+    i0 = np.flatnonzero(~last)
+    x0, y0 = x[i0], y[i0]
+    dx, dy = x[i0 + 1] - x0, y[i0 + 1] - y0
+
+    t0 = np.zeros(len(i0))
+    t1 = np.ones(len(i0))
+    reject = np.zeros(len(i0), dtype=bool)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for p, q in ((-dx, x0 - xmin), (dx, xmax - x0),
+                     (-dy, y0 - ymin), (dy, ymax - y0)):
+            r = q / p
+            reject |= (p == 0) & (q < 0)
+            t0 = np.where(p < 0, np.maximum(t0, r), t0)
+            t1 = np.where(p > 0, np.minimum(t1, r), t1)
+    keep = ~reject & (t0 < t1)
+
+    # A kept segment continues the piece of the previous one if that
+    # was kept, is in the same polyline and both are unclipped there
+    cont = np.zeros(len(i0), dtype=bool)
+    cont[1:] = (keep[:-1] & (i0[1:] == i0[:-1] + 1) &
+                (t1[:-1] == 1) & (t0[1:] == 0))
+    k = np.flatnonzero(keep)
+    start = ~cont[k]
+
+    # A new piece gives the clipped start and end, else only the end
+    count = 1 + start
+    pos = np.cumsum(count) - count
+    out = np.empty((2, count.sum()))
+    s = k[start]
+    out[0, pos[start]] = x0[s] + t0[s] * dx[s]
+    out[1, pos[start]] = y0[s] + t0[s] * dy[s]
+    out[0, pos + start] = x0[k] + t1[k] * dx[k]
+    out[1, pos + start] = y0[k] + t1[k] * dy[k]
+
+    new_offsets = np.append(pos[start], count.sum()).astype(np.int64)
+    return out[0], out[1], new_offsets
+
+
+def densify(x, y, offsets, levels, grid):
+    """Insert grid points along edges lying on given y levels
+
+    Used for edges along parallels, that become arcs in the projection.
+    For an edge with both ends at y equal to one of the levels, the grid
+    values strictly between the x values of the ends are inserted.
+
+    Returns x, y, offsets
+    """
+    grid = np.asarray(grid)
+    n = len(x)
+    last = np.zeros(n, dtype=bool)
+    last[offsets[1:] - 1] = True
+    nxt = np.minimum(np.arange(1, n + 1), n - 1)
+    on_level = np.zeros(n, dtype=bool)
+    for level in levels:
+        on_level |= (y == level) & (y[nxt] == level)
+    on_level &= ~last
+
+    xa, xb = x, x[nxt]
+    lo = np.searchsorted(grid, np.minimum(xa, xb), side='right')
+    hi = np.searchsorted(grid, np.maximum(xa, xb), side='left')
+    extra = np.where(on_level, np.maximum(hi - lo, 0), 0)
+    if not extra.any():
+        return x, y, offsets
+
+    count = 1 + extra
+    pos = np.cumsum(count) - count
+    out = np.empty((2, count.sum()))
+    out[0, pos] = x
+    out[1, pos] = y
+
+    # Inserted points, in the direction of the edge
+    e = np.repeat(np.arange(n), extra)
+    k = np.arange(extra.sum()) - np.repeat(np.cumsum(extra) - extra, extra)
+    index = np.where(xb[e] > xa[e], lo[e] + k, hi[e] - 1 - k)
+    out[0, pos[e] + 1 + k] = grid[index]
+    out[1, pos[e] + 1 + k] = y[e]
+
+    return out[0], out[1], offsets + np.append(0, np.cumsum(
+        np.add.reduceat(extra, offsets[:-1])))
+
+
+def clip_contours(h, box, inverse=None, forward=None, levels=(), grid=None):
+    """Clip the paths of a contour set in place
+
+    box : (xmin, xmax, ymin, ymax) in the coordinates of inverse
+    inverse, forward : Transforms from the path coordinates to the
+                       coordinates of box and back, default the identity
+    levels, grid : Densify filled contours along these y levels, see densify
+    """
+    from matplotlib.collections import Collection
+    if isinstance(h, Collection):
+        collections = [h]
+    else:
+        collections = h.collections
+    for coll in collections:
+        paths = coll.get_paths()
+        for i, path in enumerate(paths):
+            paths[i] = clip_path(path, box, h.filled, inverse, forward,
+                                 levels, grid)
+        coll.stale = True
+
+
+def clip_path(path, box, filled, inverse=None, forward=None,
+              levels=(), grid=None):
+    """Clip a matplotlib Path, see clip_contours"""
+    from matplotlib.path import Path
+    vertices = path.vertices
+    codes = path.codes
+    if codes is None:
+        codes = np.full(len(vertices), Path.LINETO, dtype=Path.code_type)
+        if len(codes):
+            codes[0] = Path.MOVETO
+    # Drop the CLOSEPOLY vertices, the rings are closed anyway
+    keep = codes != Path.CLOSEPOLY
+    vertices, codes = vertices[keep], codes[keep]
+    offsets = np.append(np.flatnonzero(codes == Path.MOVETO), len(codes))
+    x, y = vertices[:, 0], vertices[:, 1]
+    if inverse is not None:
+        x, y = inverse(x, y)
+    if filled:
+        x, y, offsets = clip_polygons(x, y, offsets, box)
+        if grid is not None and len(x):
+            x, y, offsets = densify(x, y, offsets, levels, grid)
+    else:
+        x, y, offsets = clip_lines(x, y, offsets, box)
+    if forward is not None:
+        x, y = forward(x, y)
+    codes = np.full(len(x), Path.LINETO, dtype=Path.code_type)
+    codes[offsets[:-1]] = Path.MOVETO
+    if filled:
+        codes[offsets[1:] - 1] = Path.CLOSEPOLY
+    return Path(np.column_stack((x, y)), codes)
@@ -0,0 +1,68 @@
+# -*- coding: utf-8 -*-
+
+"""Lon/lat grids projected once for repeated plotting"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+
+# --- Classes ---
+
+
+class ProjectedGrid(object):
+    """Projected coordinates of a lon/lat grid
+
+    Made by the grid method of a map, and passed in place of lon, lat
+    to its contourf, contour, plot and fill methods:
+
+      g = pmap.grid(llon, llat, dtype='float32')
+      for temp in temps:
+          pmap.contourf(g, temp)
+
+    x, y : Projected coordinates
+    projection_key : Projection of the map making the grid
+    """
+
+    def __init__(self, x, y, projection_key):
+        self.x = x
+        self.y = y
+        self.projection_key = projection_key
+
+    @property
+    def shape(self):
+        return self.x.shape
+
+    @property
+    def nbytes(self):
+        return self.x.nbytes + self.y.nbytes
+
+
+# --- Functions ---
+
+
+def make_grid(pmap, lon, lat, dtype=None, out=None, threads=None):
+    """Project a lon/lat grid with a map, optionally in another dtype"""
+    x, y = pmap(lon, lat, out=out, dtype=dtype, threads=threads)
+    return ProjectedGrid(x, y, pmap.projection_key)
+
+
+def grid_xy(pmap, lon, lat, args):
+    """Projected coordinates for the plotting wrappers
+
+    lon, lat may be a ProjectedGrid followed by the other arguments
+
+    Returns x, y and the remaining positional arguments
+    """
+    if isinstance(lon, ProjectedGrid):
+        if lon.projection_key != pmap.projection_key:
+            raise ValueError("ProjectedGrid made with another projection")
+        return lon.x, lon.y, (lat,) + tuple(args)
+    x, y = pmap(lon, lat)
+    return x, y, args
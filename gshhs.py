@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+
+"""Streaming reader of the GSHHS binary coast line files
+
+Reads the native binary files of GSHHS/GSHHG (version 2.0 and later),
+gshhs_c.b, ..., gshhs_f.b, without Basemap. Each polygon record has a
+header with its number of points, level (GSHHS type) and bounding box.
+Records of other types, or outside the domain, are skipped by seeking
+past their points, so only the polygons in the domain are read.
+
+Example:
+
+  coast = read_coast('gshhs_f.b', -12, 50, 50, 80, types=[1])
+  save_coast('coast.npz', coast)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import struct
+import numpy as np
+
+from coast import Coast
+from geometry import clip_polygons
+
+# Record header: id, npoints, flag, west, east, south, north,
+# area, area_full, container, ancestor, big-endian int32
+HEADER = struct.Struct('>11i')
+
+# Coordinates are stored in micro-degrees
+SCALE = 1.0e-6
+
+# Version written by write_gshhs, of GSHHG 2.3
+VERSION = 12
+
+# Longitudes above this are west of Greenwich in polygons crossing it
+MAX_EAST = 270000000
+
+# --- Functions ---
+
+
+def read_polygons(gshhsfile, lon0=-180, lon1=180, lat0=-90, lat1=90,
+                  types=None):
+    """Generate the polygons of a GSHHS file overlapping a lon/lat box
+
+    types : GSHHS types (levels) to read, default all
+
+    Longitudes are shifted by a multiple of 360 degrees to overlap
+    lon0..lon1. The polygons are not clipped.
+
+    Yields lon, lat, type
+    """
+    with open(gshhsfile, 'rb') as fid:
+        while True:
+            buf = fid.read(HEADER.size)
+            if len(buf) < HEADER.size:
+                return
+            (id_, n, flag, west, east, south, north,
+             area, area_full, container, ancestor) = HEADER.unpack(buf)
+            level = flag & 255
+            version = (flag >> 8) & 255
+            if version < 7:
+                raise ValueError("{}: GSHHS version {} not supported, "
+                                 "need 2.0 or later".format(gshhsfile,
+                                                            version))
+            greenwich = (flag >> 16) & 1
+
+            shift = _shift(west, east, south, north, lon0, lon1, lat0, lat1)
+            if shift is None or (types is not None and level not in types):
+                fid.seek(8 * n, 1)
+                continue
+
+            xy = np.frombuffer(fid.read(8 * n), dtype='>i4').reshape(n, 2)
+            x = xy[:, 0]
+            lon = x * SCALE
+            if west > 180000000:
+                lon -= 360.0
+            elif greenwich:
+                lon[x > MAX_EAST] -= 360.0
+            lon += shift
+            yield lon, xy[:, 1] * SCALE, level
+
+
+def _shift(west, east, south, north, lon0, lon1, lat0, lat1):
+    """Longitude shift making a record overlap the box, None if none does"""
+    if south * SCALE > lat1 or north * SCALE < lat0:
+        return None
+    west = west * SCALE
+    east = east * SCALE
+    if west > 180.0:
+        west -= 360.0
+        east -= 360.0
+    for shift in (0.0, -360.0, 360.0):
+        if west + shift <= lon1 and east + shift >= lon0:
+            return shift
+    return None
+
+
+def read_coast(gshhsfile, lon0=-180, lon1=180, lat0=-90, lat1=90,
+               types=None, clip=True):
+    """Coast of the polygons of a GSHHS file in a lon/lat box
+
+    types : GSHHS types to read, default all
+    clip : Clip the polygons crossing the edge of the box
+
+    Returns a Coast, with the polygons grouped by type
+    """
+    polygons = {}
+    for lon, lat, level in read_polygons(gshhsfile, lon0, lon1, lat0, lat1,
+                                         types):
+        polygons.setdefault(level, []).append((lon, lat))
+
+    lons, lats, sizes, levels = [], [], [], []
+    for level in sorted(polygons):
+        x = np.concatenate([p[0] for p in polygons[level]])
+        y = np.concatenate([p[1] for p in polygons[level]])
+        offsets = np.zeros(len(polygons[level]) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(p[0]) for p in polygons[level]])
+        if clip:
+            x, y, offsets = clip_polygons(x, y, offsets,
+                                          (lon0, lon1, lat0, lat1))
+        lons.append(x)
+        lats.append(y)
+        sizes.append(np.diff(offsets))
+        levels.append(np.full(len(offsets) - 1, level, dtype=np.int32))
+
+    if not lons:
+        return Coast(np.empty((2, 0)), np.zeros(1, dtype=np.int64),
+                     types=np.empty(0, dtype=np.int32))
+    sizes = np.concatenate(sizes)
+    offsets = np.zeros(len(sizes) + 1, dtype=np.int64)
+    offsets[1:] = np.cumsum(sizes)
+    lonlat = np.array([np.concatenate(lons), np.concatenate(lats)])
+    return Coast(lonlat, offsets, types=np.concatenate(levels))
+
+
+def write_gshhs(gshhsfile, coast):
+    """Write a Coast as a GSHHS binary file
+
+    For test data, the areas are written as zero and the polygons
+    have no container or ancestor.
+    """
+    with open(gshhsfile, 'wb') as fid:
+        for i, (p, level) in enumerate(zip(coast, coast.types)):
+            x = np.round(p[0] / SCALE).astype(np.int64)
+            y = np.round(p[1] / SCALE).astype(np.int64)
+            west, east = x.min(), x.max()
+            greenwich = west < 0 <= east
+            if east < 0:
+                # West of Greenwich, stored as 180..360
+                x += 360000000
+                west += 360000000
+                east += 360000000
+            flag = int(level) | VERSION << 8 | int(greenwich) << 16
+            fid.write(HEADER.pack(i, len(x), flag, west, east,
+                                  y.min(), y.max(), 0, 0, -1, -1))
+            fid.write(np.column_stack((x, y)).astype('>i4').tobytes())
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+
+"""Land/sea mask from the coast polygons
+
+A LandIndex is a grid of lon/lat cells over the coast polygons.
+Each cell stores the polygon edges crossing it and whether its
+centre is on land. A point in a cell without edges has the state of
+the centre. For a point in a cell with edges, the edges crossing the
+path from the centre to the point are counted, horizontally and then
+vertically, and each crossing flips the state.
+
+The polygons are combined by the even-odd rule, so lakes (GSHHS type
+2) inside land are sea and islands in lakes (type 3) are land.
+
+Points and grids are answered in vectorized batches. The index of a
+coast is built once per process and the masks of 1-D grid axes are
+cached by the index.
+
+Example:
+
+  index = land_index(load_coast('coast.npz'))
+  on_land = index.contains(obs_lon, obs_lat)
+  mask = index.grid(lon, lat)     # shape (len(lat), len(lon))
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# Point/edge pairs tested at a time, bounds the temporary memory
+CHUNK = 2**21
+
+# --- Classes ---
+
+
+class LandIndex(object):
+    """Grid bucket index of coast polygon edges
+
+    coast : Coast
+    cellsize : Cell size in degrees, by default about four cells per edge,
+               at most 4 million cells
+    maxgrids : Number of grid masks cached by the grid method
+    """
+
+    def __init__(self, coast, cellsize=None, maxgrids=16):
+        lon, lat = np.asarray(coast.lonlat, dtype=np.float64)
+        offsets = np.asarray(coast.offsets, dtype=np.int64)
+
+        # Edges, from each vertex to the next, closing each polygon
+        start = offsets[:-1][offsets[1:] > offsets[:-1]]
+        end = offsets[1:][offsets[1:] > offsets[:-1]]
+        nxt = np.arange(1, len(lon) + 1)
+        nxt[end - 1] = start
+        keep = (lon != lon[nxt]) | (lat != lat[nxt])
+        self.ax, self.ay = lon[keep], lat[keep]
+        self.bx, self.by = lon[nxt][keep], lat[nxt][keep]
+        nedges = len(self.ax)
+
+        # Cell grid covering all vertices
+        if nedges:
+            x0, x1, y0, y1 = lon.min(), lon.max(), lat.min(), lat.max()
+        else:
+            x0, x1, y0, y1 = 0.0, 1.0, 0.0, 1.0
+        if cellsize is None:
+            area = max((x1 - x0) * (y1 - y0), 1e-6)
+            cellsize = np.sqrt(area / min(4 * max(nedges, 1), 2**22))
+        self.cellsize = float(cellsize)
+        self.x0, self.y0 = x0, y0
+        self.nx = int((x1 - x0) // cellsize) + 1
+        self.ny = int((y1 - y0) // cellsize) + 1
+
+        self._bucket_edges()
+        self._centre_states()
+
+        self.maxgrids = maxgrids
+        self._grids = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def nbytes(self):
+        """Memory used by the index"""
+        return (4 * self.ax.nbytes + self.cell_offsets.nbytes +
+                self.cell_edges.nbytes + self.centre.nbytes)
+
+    def _cell(self, x, y):
+        """Cell column and row, not checked against the grid"""
+        with np.errstate(invalid='ignore'):   # NaN
+            i = np.floor((x - self.x0) / self.cellsize).astype(np.int64)
+            j = np.floor((y - self.y0) / self.cellsize).astype(np.int64)
+        return i, j
+
+    def _bucket_edges(self):
+        """Put each edge in all cells overlapped by its bounding box"""
+        nx, ny = self.nx, self.ny
+        i0, j0 = self._cell(np.minimum(self.ax, self.bx),
+                            np.minimum(self.ay, self.by))
+        i1, j1 = self._cell(np.maximum(self.ax, self.bx),
+                            np.maximum(self.ay, self.by))
+        i0, i1 = np.clip(i0, 0, nx - 1), np.clip(i1, 0, nx - 1)
+        j0, j1 = np.clip(j0, 0, ny - 1), np.clip(j1, 0, ny - 1)
+        width = i1 - i0 + 1
+        counts = width * (j1 - j0 + 1)
+
+        # Expand to (edge, cell) pairs
+        edge = np.repeat(np.arange(len(counts)), counts)
+        k = np.arange(len(edge)) - np.repeat(np.cumsum(counts) - counts,
+                                             counts)
+        cell = (j0[edge] + k // width[edge]) * nx + i0[edge] + k % width[edge]
+
+        order = np.argsort(cell, kind='stable')
+        self.cell_edges = edge[order].astype(np.int32)
+        self.pair_cell = cell[order]
+        ncount = np.bincount(cell, minlength=nx * ny)
+        self.cell_offsets = np.zeros(nx * ny + 1, dtype=np.int64)
+        self.cell_offsets[1:] = np.cumsum(ncount)
+        self._clip = (i0, i1)
+
+    def _centre_states(self):
+        """Land state of all cell centres, by eastward rays
+
+        The ray from a centre crosses the edges in its row of cells.
+        Each crossing is counted once, in the cell containing it.
+        """
+        nx, ny = self.nx, self.ny
+        edge, cell = self.cell_edges, self.pair_cell
+        i, j = cell % nx, cell // nx
+        ay, by = self.ay[edge], self.by[edge]
+        cy = self.y0 + (j + 0.5) * self.cellsize
+        cross = (ay > cy) != (by > cy)
+        edge, i, cy = edge[cross], i[cross], cy[cross]
+        ax, ay = self.ax[edge], self.ay[edge]
+        bx, by = self.bx[edge], self.by[edge]
+        xc = ax + (cy - ay) * (bx - ax) / (by - ay)
+        i0, i1 = self._clip
+        ic = np.clip(self._cell(xc, cy)[0], i0[edge], i1[edge])
+        own = ic == i
+        cell, xc = cell[cross][own], xc[own]
+
+        cx = self.x0 + (cell % nx + 0.5) * self.cellsize
+        east = np.bincount(cell[xc > cx], minlength=nx * ny)
+        total = np.bincount(cell, minlength=nx * ny).reshape(ny, nx)
+        # Crossings in the cells further east in the row
+        beyond = np.cumsum(total[:, ::-1], axis=1)[:, ::-1] - total
+        self.centre = ((beyond.ravel() + east) % 2).astype(bool)
+        del self.pair_cell, self._clip
+
+    def contains(self, lon, lat):
+        """True for points on land
+
+        lon, lat : Arrays of coordinates, broadcast together
+
+        Points outside the bounding box of the coast are sea
+        """
+        lon, lat = np.broadcast_arrays(np.asarray(lon, dtype=np.float64),
+                                       np.asarray(lat, dtype=np.float64))
+        shape = lon.shape
+        lon, lat = lon.ravel(), lat.ravel()
+        result = np.zeros(lon.size, dtype=bool)
+
+        i, j = self._cell(lon, lat)
+        valid = np.flatnonzero((i >= 0) & (i < self.nx) &
+                               (j >= 0) & (j < self.ny))
+        cell = j[valid] * self.nx + i[valid]
+        result[valid] = self.centre[cell]
+
+        # Points in cells with edges
+        counts = self.cell_offsets[cell + 1] - self.cell_offsets[cell]
+        mixed = counts > 0
+        point, cell, counts = valid[mixed], cell[mixed], counts[mixed]
+        ends = np.cumsum(counts)
+        n0 = 0
+        while n0 < len(point):
+            n1 = max(n0 + 1, np.searchsorted(ends, ends[n0] - counts[n0] +
+                                             CHUNK, side='right'))
+            flips = self._flips(lon[point[n0:n1]], lat[point[n0:n1]],
+                                cell[n0:n1], counts[n0:n1])
+            result[point[n0:n1]] ^= flips
+            n0 = n1
+        return result.reshape(shape)
+
+    def _flips(self, px, py, cell, counts):
+        """Parity of the edge crossings between the centres and the points"""
+        npair = counts.sum()
+        local = np.repeat(np.arange(len(counts)), counts)
+        k = (np.arange(npair) - np.repeat(np.cumsum(counts) - counts, counts)
+             + np.repeat(self.cell_offsets[cell], counts))
+        edge = self.cell_edges[k]
+        ax, ay = self.ax[edge], self.ay[edge]
+        bx, by = self.bx[edge], self.by[edge]
+        px, py = px[local], py[local]
+        cell = cell[local]
+        cx = self.x0 + (cell % self.nx + 0.5) * self.cellsize
+        cy = self.y0 + (cell // self.nx + 0.5) * self.cellsize
+
+        # Horizontal, from (cx, cy) to (px, cy)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            hit = (ay > cy) != (by > cy)
+            xc = ax + (cy - ay) * (bx - ax) / (by - ay)
+            hit &= (xc > np.minimum(cx, px)) & (xc <= np.maximum(cx, px))
+            # Vertical, from (px, cy) to (px, py)
+            vhit = (ax > px) != (bx > px)
+            yc = ay + (px - ax) * (by - ay) / (bx - ax)
+            vhit &= (yc > np.minimum(cy, py)) & (yc <= np.maximum(cy, py))
+        hit ^= vhit
+        return (np.bincount(local, weights=hit, minlength=len(counts))
+                % 2).astype(bool)
+
+    def grid(self, lon, lat):
+        """Land mask of a grid given by 1-D lon and lat axes
+
+        Returns a boolean array of shape (len(lat), len(lon)).
+        The masks of the latest grids are cached.
+        """
+        lon = np.ascontiguousarray(lon, dtype=np.float64)
+        lat = np.ascontiguousarray(lat, dtype=np.float64)
+        h = hashlib.sha1(lon)
+        h.update(b'/')
+        h.update(lat)
+        key = h.hexdigest()
+        with self._lock:
+            mask = self._grids.pop(key, None)
+            if mask is not None:
+                self._grids[key] = mask
+                return mask
+        mask = self.contains(lon[np.newaxis, :], lat[:, np.newaxis])
+        mask.flags.writeable = False
+        with self._lock:
+            self._grids[key] = mask
+            while len(self._grids) > self.maxgrids:
+                self._grids.popitem(last=False)
+        return mask
+
+
+# --- Functions ---
+
+# Indexes by coast digest and cell size
+_indexes = OrderedDict()
+_lock = threading.Lock()
+
+
+def land_index(coast, cellsize=None):
+    """The LandIndex of a coast, built once and kept for the process
+
+    The latest four indexes are kept.
+    """
+    key = (coast.digest, cellsize)
+    with _lock:
+        index = _indexes.pop(key, None)
+        if index is not None:
+            _indexes[key] = index
+            return index
+    index = LandIndex(coast, cellsize)
+    with _lock:
+        _indexes[key] = index
+        while len(_indexes) > 4:
+            _indexes.popitem(last=False)
+    return index
@@ -3,10 +3,11 @@
 
 """Extract a closed coast line
 
-Extracts a coast line in lat-lon from GSHHS using
-the advanced polygon handling features in Basemap
+Extracts a coast line in lat-lon from GSHHS, reading the GSHHS
+binary file directly, see gshhs.py, or using the advanced polygon
+handling features in Basemap
 
-The polygons are saved to a npy-file
+The polygons are saved to a packed npz-file, see coast.py
 
 """
 
@@ -21,12 +22,8 @@ The polygons are saved to a npy-file
 
 import sys
 
-import numpy as np
-try:
-    from mpl_toolkits.basemap import Basemap
-except ImportError:
-    print("Basemap is needed for makecoast")
-    sys.exit(-1)
+from coast import save_coast
+from gshhs import read_coast
 
 
 def main():
@@ -49,15 +46,20 @@ def main():
     # 1 = land, 2 = lake, 3 = island in lake, 4 = pond in island in lake
     GSHHStypes = [1]
 
+    # GSHHS binary file, like 'gshhs_i.b' from GSHHG, read without
+    # Basemap. With None, Basemap is used with the resolution above
+    gshhsfile = None
+
     # Output coast file
-    coastfile = 'coast.npy'
+    coastfile = 'coast.npz'
 
     # --- End user settings ---
 
     makecoast(**locals())
 
 
-def makecoast(lon0, lon1, lat0, lat1, GSHHSres, GSHHStypes, coastfile):
+def makecoast(lon0, lon1, lat0, lat1, GSHHSres, GSHHStypes, coastfile,
+              gshhsfile=None):
     """Make a lat/lon coast file
 
     Arguments:
@@ -66,9 +68,24 @@ def makecoast(lon0, lon1, lat0, lat1, GSHHSres, GSHHStypes, coastfile):
     GSHHSres : GSHHS resolution ('f','h','i','l','c')
     GSHHStypes : GSHHS types to be extracted (subset of {1,2,3,4})
     coastfile : File name for output
+    gshhsfile : GSHHS binary file to read instead of using Basemap,
+                GSHHSres is then not used
 
     """
 
+    if gshhsfile is not None:
+        # Read only the polygons of the selected types in the domain,
+        # clipped to it
+        coast = read_coast(gshhsfile, lon0, lon1, lat0, lat1, GSHHStypes)
+        save_coast(coastfile, coast)
+        return
+
+    try:
+        from mpl_toolkits.basemap import Basemap
+    except ImportError:
+        print("Basemap is needed for makecoast without a gshhsfile")
+        sys.exit(-1)
+
     # ------------------------------
     # Set up Basemap map projection
     # ------------------------------
@@ -88,14 +105,16 @@ def makecoast(lon0, lon1, lat0, lat1, GSHHSres, GSHHStypes, coastfile):
     polygons = bmap.coastpolygons
 
     # Only use the selected polygon types
-    polygons = [p for (p, t) in zip(polygons, bmap.coastpolygontypes)
+    selected = [(p, t) for (p, t) in zip(polygons, bmap.coastpolygontypes)
                 if t in GSHHStypes]
+    polygons = [p for (p, t) in selected]
+    types = [t for (p, t) in selected]
 
     # --------------------
     # Save the coast data
     # --------------------
 
-    np.save(coastfile, polygons)
+    save_coast(coastfile, polygons, types)
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+
+"""Animation of dynamic layers over a static map
+
+The static layers of a map, frame, land, graticule and labels, are
+rendered once and kept as a raster. For each frame only the dynamic
+artists are drawn on top of a copy of this raster.
+
+Static artists that should stay on top of the dynamic layers, typically
+the filled continents, are given as foreground. They are rendered once
+to a transparent raster that is composited over each frame.
+
+Example:
+
+  pmap = PolarMap(lon0, lon1, lat0, lat1, 'coast.npz', ax=ax)
+  land = pmap.fillcontinents()
+  pmap.drawparallels([55, 60, 65, 70])
+
+  def update(pmap, step):
+      return pmap.contourf(llon, llat, temp[step])
+
+  anim = MapAnimation(pmap, foreground=[land])
+  anim.save('temp.mp4', update, range(len(temp)), fps=10)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import os
+import subprocess
+import tempfile
+import numpy as np
+from matplotlib.artist import Artist
+
+# --- Classes ---
+
+
+class MapAnimation(object):
+    """Fast animation of a map with a cached static background
+
+    pmap : PolarMap or MercatorMap with the static layers drawn
+    foreground : Static artists to be kept above the dynamic layers
+    """
+
+    def __init__(self, pmap, foreground=()):
+        self.pmap = pmap
+        self.ax = pmap.ax
+        self.fig = pmap.ax.figure
+        self.foreground = list(foreground)
+        self.artists = []       # Dynamic artists of the current frame
+        self.capture()
+
+    def capture(self):
+        """Render and store the static background and foreground
+
+        Call again if the static layers or the figure size change.
+        """
+        canvas = self.fig.canvas
+        for a in self.foreground:
+            a.set_visible(False)
+        canvas.draw()
+        self.background = canvas.copy_from_bbox(self.fig.bbox)
+        self._fg = None
+        if self.foreground:
+            self._fg = self._render_foreground()
+        for a in self.foreground:
+            a.set_visible(True)
+
+    def _render_foreground(self):
+        """Foreground artists alone on a transparent raster
+
+        Returns premultiplied RGB and 255 - alpha as uint16 arrays,
+        for compositing in integer arithmetic without overflow
+        """
+        canvas = self.fig.canvas
+        hidden = [a for a in self.fig.findobj(include_self=False)
+                  if a.get_visible() and a not in self.foreground and
+                  not _contains(a, self.foreground)]
+        for a in hidden:
+            a.set_visible(False)
+        fpatch = self.fig.patch.get_visible()
+        self.fig.patch.set_visible(False)
+        for a in self.foreground:
+            a.set_visible(True)
+        try:
+            canvas.draw()
+            rgba = np.asarray(canvas.buffer_rgba()).astype(np.uint16)
+        finally:
+            for a in hidden:
+                a.set_visible(True)
+            self.fig.patch.set_visible(fpatch)
+        alpha = rgba[..., 3:]
+        return rgba[..., :3] * alpha, 255 - alpha
+
+    def clear(self):
+        """Remove the dynamic artists of the current frame"""
+        self.pmap.untrack(self.artists)
+        for a in self.artists:
+            a.remove()
+        self.artists = []
+
+    def frame(self, update, *args):
+        """Render a frame
+
+        update : Function called as update(pmap, *args), drawing the
+                 dynamic layers and returning the artists or containers
+                 returned by the drawing methods
+
+        Returns the frame as a (height, width, 4) uint8 RGBA array
+        """
+        canvas = self.fig.canvas
+        self.clear()
+        self.artists = _flatten(update(self.pmap, *args))
+        canvas.restore_region(self.background)
+        for a in self.artists:
+            a.set_animated(True)
+            self.ax.draw_artist(a)
+        rgba = np.array(canvas.buffer_rgba())
+        if self._fg is not None:
+            fg, inv_alpha = self._fg
+            rgb = rgba[..., :3] * inv_alpha
+            rgb += fg
+            rgba[..., :3] = rgb // 255
+        return rgba
+
+    def blit(self, update, *args):
+        """Update an interactive figure with blitting
+
+        The foreground artists are drawn again on top of the frame.
+        """
+        canvas = self.fig.canvas
+        self.clear()
+        self.artists = _flatten(update(self.pmap, *args))
+        canvas.restore_region(self.background)
+        for a in self.artists + self.foreground:
+            a.set_animated(True)
+            self.ax.draw_artist(a)
+        canvas.blit(self.fig.bbox)
+        canvas.flush_events()
+
+    def save(self, filename, update, frames, fps=10):
+        """Write an animation
+
+        update : Frame update function, as for the frame method
+        frames : Iterable of arguments to update, tuples are unpacked
+        fps : Frames per second
+
+        GIF files are written with Pillow, other formats by ffmpeg
+        """
+
+        def images():
+            for f in frames:
+                if not isinstance(f, tuple):
+                    f = (f,)
+                yield self.frame(update, *f)
+
+        if os.path.splitext(filename)[1].lower() == '.gif':
+            _write_gif(filename, images(), fps)
+        else:
+            _write_ffmpeg(filename, images(), fps)
+
+
+# --- Functions ---
+
+
+def _flatten(h):
+    """List of artists from the return values of the drawing methods"""
+    if h is None:
+        return []
+    if isinstance(h, Artist):
+        return [h]
+    artists = []
+    for a in h:
+        artists.extend(_flatten(a))
+    return artists
+
+
+def _contains(a, artists):
+    """True if a is a descendant of one of the artists or an ancestor"""
+    for b in artists:
+        if a in b.findobj() or b in a.findobj():
+            return True
+    return False
+
+
+def _write_gif(filename, images, fps):
+    from PIL import Image
+    frames = [Image.fromarray(rgba).convert('RGB') for rgba in images]
+    frames[0].save(filename, save_all=True, append_images=frames[1:],
+                   duration=int(round(1000.0 / fps)), loop=0)
+
+
+def _write_ffmpeg(filename, images, fps):
+    """Pipe the frames to ffmpeg, RuntimeError if it fails"""
+    proc = None
+    with tempfile.TemporaryFile() as errfile:
+        try:
+            for rgba in images:
+                if proc is None:
+                    height, width = rgba.shape[:2]
+                    cmd = ['ffmpeg', '-y', '-loglevel', 'error',
+                           '-f', 'rawvideo', '-pix_fmt', 'rgba',
+                           '-s', '{}x{}'.format(width, height),
+                           '-r', str(fps), '-i', '-',
+                           '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2',
+                           '-pix_fmt', 'yuv420p', filename]
+                    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE,
+                                            stderr=errfile)
+                try:
+                    proc.stdin.write(rgba.tobytes())
+                except BrokenPipeError:   # ffmpeg stopped, reported below
+                    break
+        finally:
+            if proc is not None:
+                try:
+                    proc.stdin.close()
+                except BrokenPipeError:
+                    pass
+                proc.wait()
+        if proc is not None and proc.returncode != 0:
+            errfile.seek(0)
+            message = errfile.read().decode('utf-8', 'replace').strip()
+            raise RuntimeError("ffmpeg failed with exit status {}: {}".format(
+                proc.returncode, message))
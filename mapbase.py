@@ -0,0 +1,571 @@
+# -*- coding: utf-8 -*-
+
+"""Common base class of PolarMap and MercatorMap
+
+A map is a lon/lat domain, a coast and a projection engine from
+projection.py. The base class does the coast culling, projection,
+caching and batched drawing, the plotting wrappers, raster drawing and
+land masks. A subclass sets up the axes and draws the graticule.
+
+The artists drawn by the map methods follow the map when it is moved
+to another domain with set_extent, see MapBase.set_extent.
+
+The projection of a map is called as pmap(lon, lat), optionally with
+out= preallocated arrays and dtype, see projection.py.
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import numpy as np
+
+from coast import load_coast, cull, project
+from density import CHUNK, DensityGrid, accumulate
+from density import show as show_density
+from geometry import auto_tolerance, clip_contours
+from grid import make_grid, grid_xy
+from landmask import land_index
+from mapstats import Instrumented, instrumented
+from rastercache import draw_cached_base
+from raster import raster_lut, separable_lut, show, image_geometry
+
+# --- Constants ---
+
+# unicode degree symbol
+degree = '\u00B0'
+
+
+# --- Functions ---
+
+
+def lat_label(lat):
+    """Label text for a parallel"""
+    if lat > 0:
+        return "{}{}N".format(lat, degree)
+    elif lat < 0:
+        return "{}{}S".format(-lat, degree)
+    else:
+        return "0" + degree
+
+
+def lon_label(lon):
+    """Label text for a meridian"""
+    if lon > 0:
+        return "{}{}E".format(lon, degree)
+    elif lon < 0:
+        return "{}{}W".format(-lon, degree)
+    else:
+        return "0" + degree
+
+
+def _reproject(xy, old, new):
+    """Vertices, shape (n, 2), from one projection engine to another"""
+    x, y = old.inverse(xy[:, 0], xy[:, 1])
+    return np.stack(new.forward(x, y), axis=-1)
+
+
+def _reproject_artist(h, old, new):
+    """Move the vertices of a drawn artist to a new projection"""
+    from matplotlib.lines import Line2D
+    from matplotlib.patches import Polygon
+    if isinstance(h, Line2D):
+        x, y = h.get_data()
+        h.set_data(new.forward(*old.inverse(np.asarray(x, dtype=float),
+                                            np.asarray(y, dtype=float))))
+    elif isinstance(h, Polygon):
+        h.set_xy(_reproject(h.get_xy(), old, new))
+    elif hasattr(h, 'collections'):
+        # ContourSet of older matplotlib
+        for q in h.collections:
+            _reproject_artist(q, old, new)
+    else:
+        _reproject_paths(h.get_paths(), old, new)
+        h.stale = True
+
+
+def _reproject_paths(paths, old, new):
+    """Move the vertices of matplotlib Paths to a new projection"""
+    for path in paths:
+        if len(path.vertices):
+            path.vertices = _reproject(path.vertices, old, new)
+
+
+def _removed(artists):
+    """True if all the artists are removed from their axes"""
+    return bool(artists) and all(a.axes is None for a in artists)
+
+
+def _collections(h):
+    """Collections of a ContourSet, itself a Collection in newer matplotlib"""
+    from matplotlib.collections import Collection
+    if isinstance(h, Collection):
+        return [h]
+    return h.collections
+
+
+def _set_clip_path(h, clip_path):
+    """Clip a ContourSet"""
+    for q in _collections(h):
+        q.set_clip_path(clip_path)
+
+
+# --- Classes ---
+
+
+class MapBase(Instrumented):
+    """Map of a lon/lat domain with a projection engine
+
+    Subclasses define _setup_axes and _update_axes and may set
+    clip_path, the patch hiding drawing outside the map domain.
+    """
+
+    # Patch clipping the drawing to the map domain, None for no clipping
+    clip_path = None
+
+    def __init__(self, lon0, lon1, lat0, lat1, coastfile, projection,
+                 facecolor='white', ax=None):
+        self.lon0 = lon0
+        self.lon1 = lon1
+        self.lat0 = lat0
+        self.lat1 = lat1
+        self.projection = projection
+
+        # Coast line, keep the polygons overlapping the map domain
+        self.coast = load_coast(coastfile)
+        self.coast_polygons, self._coast_inside, self.coast_stats = cull(
+            self.coast, lon0, lon1, lat0, lat1)
+
+        if ax is None:
+            import matplotlib.pyplot as plt
+            ax = plt.gca()
+        self.ax = ax
+        # Drawn artists and the functions updating them, called by
+        # set_extent with the previous projection engine, or None if
+        # unchanged
+        self._updates = []
+        self._cached_base = False
+        self._setup_axes(facecolor)
+
+    def _setup_axes(self, facecolor):
+        """Initiate the matplotlib axes"""
+        raise NotImplementedError
+
+    def _update_axes(self):
+        """Move the frame and axis limits to the current domain"""
+        raise NotImplementedError
+
+    def set_extent(self, lon0, lon1, lat0, lat1, projection=None):
+        """Move the map to a new lon/lat domain
+
+        projection : New projection engine, default unchanged
+
+        The coast already loaded is culled again, and the frame, clip
+        path and axis limits are recomputed. The artists drawn by the
+        map methods are updated in place, keeping their styles:
+        coast, land and graticule are made for the new domain, images
+        are resampled, and with a new projection the vertices of
+        contours and plotted lines are moved to it. Much cheaper than
+        making a new map for each of many regions.
+
+        Contours drawn with preclip=True are clipped again to the new
+        domain. Density images of a chunk iterable, which can not be
+        read again, are removed. Artists drawn directly on the axes,
+        and ProjectedGrids of an old projection, are not updated.
+        Removed artists are no longer updated.
+        """
+        if self._cached_base:
+            raise ValueError("Base layers drawn from a raster cache "
+                             "can not be moved, make a new map")
+        old = None
+        if projection is not None and projection.key != self.projection_key:
+            old = self.projection
+        self.lon0 = lon0
+        self.lon1 = lon1
+        self.lat0 = lat0
+        self.lat1 = lat1
+        if projection is not None:
+            self.projection = projection
+        self.coast_polygons, self._coast_inside, self.coast_stats = cull(
+            self.coast, lon0, lon1, lat0, lat1)
+        self._update_axes()
+        for artists, update in self._prune():
+            if not _removed(artists):
+                update(old)
+
+    def _prune(self):
+        """Drop the updates of removed artists, returns the others"""
+        self._updates = [(artists, update)
+                         for artists, update in self._updates
+                         if not _removed(artists)]
+        return list(self._updates)
+
+    def _track(self, artists, update):
+        """Update drawn artists in set_extent
+
+        artists : List of the artists, may be changed by update
+        update : Function called as update(old), old is the previous
+                 projection engine or None
+        """
+        self._prune()
+        self._updates.append((artists, update))
+
+    def untrack(self, artists):
+        """Stop updating artists in set_extent
+
+        Removed artists are dropped anyway, but only at the next
+        drawing or set_extent.
+        """
+        ids = set(id(a) for a in artists)
+        self._updates = [(a, update) for a, update in self._updates
+                         if not any(id(b) in ids for b in a)]
+
+    def _follow(self, artists):
+        """Move drawn artists to a new projection in set_extent"""
+        def update(old):
+            if old is not None:
+                for h in artists:
+                    _reproject_artist(h, old, self.projection)
+        self._track(list(artists), update)
+
+    def _follow_contours(self, h, preclip):
+        """Move a ContourSet in set_extent, clipped again with preclip"""
+        if not preclip:
+            self._follow([h])
+            return
+        # The clipped paths are new Paths, keep the unclipped ones
+        unclipped = [list(q.get_paths()) for q in _collections(h)]
+        self._clip_contours(h)
+
+        def update(old):
+            for q, paths in zip(_collections(h), unclipped):
+                if old is not None:
+                    _reproject_paths(paths, old, self.projection)
+                q.get_paths()[:] = paths
+            self._clip_contours(h)
+        self._track([h], update)
+
+    def __call__(self, lon, lat, inverse=False, out=None, dtype=None,
+                 threads=None):
+        """Provide projection by calling the instance
+
+        out : Tuple of two preallocated arrays for the result
+        dtype : Result type, for instance 'float32'
+        threads : Number of threads sharing the work
+        """
+        if self._stats is not None:
+            # Broadcast size, for instance a row of lon and a column of lat
+            self._stats.add_vertices(
+                np.broadcast(np.asarray(lon), np.asarray(lat)).size)
+        if inverse:
+            # lon, lat is x, y in this case
+            return self.projection.inverse(lon, lat, out, dtype, threads)
+        return self.projection.forward(lon, lat, out, dtype, threads)
+
+    def _ll2xy(self, lon, lat):
+        """Forward projection"""
+        return self(lon, lat)
+
+    def _xy2ll(self, x, y):
+        """Inverse projection"""
+        return self(x, y, inverse=True)
+
+    @property
+    def projection_key(self):
+        """Hashable identification of the projection and its parameters"""
+        return self.projection.key
+
+    def _project_coast(self, simplify=None, preclip=False, lines=False):
+        """Project all coast polygons in one vectorized pass
+
+        simplify : Douglas-Peucker tolerance in map coordinates,
+                   'auto' for half a pixel on the current axes
+        preclip : Clip the polygons to the map domain
+        lines : Clip as coast lines instead of polygons
+
+        Returns a list of (n, 2) vertex arrays in map coordinates
+        """
+        if simplify == 'auto':
+            simplify = auto_tolerance(self.ax)
+        box = step = None
+        if preclip:
+            box = (float(self.lon0), float(self.lon1),
+                   float(self.lat0), float(self.lat1))
+            if not self.projection.separable:
+                # Same points along the parallels as the frame
+                step = (box[1] - box[0]) / 49
+        return project(self.coast_polygons, self, self.projection_key,
+                       simplify, box, lines, step)
+
+    def _clip_flags(self, npolygons, preclip):
+        """Polygons inside the clip path, drawn without clipping"""
+        if preclip or self.clip_path is None:
+            return [True] * npolygons
+        return self._coast_inside
+
+    def _draw_coast(self, lines, batch, simplify, preclip, opts):
+        """Coast line or land artists, updated by set_extent
+
+        lines : Coast lines, else land polygons
+        opts : Drawing options, with the defaults
+        """
+        from matplotlib.collections import LineCollection, PolyCollection
+
+        if batch:
+            if lines:
+                h = LineCollection([], **opts)
+            else:
+                h = PolyCollection([], **opts)
+            self.ax.add_collection(h, autolim=False)
+        else:
+            h = []
+            draw = self.ax.plot if lines else self.ax.fill
+
+        def update(old):
+            polygons = self._project_coast(simplify, preclip, lines)
+            flags = self._clip_flags(len(polygons), preclip)
+            if batch:
+                if lines:
+                    h.set_segments(polygons)
+                else:
+                    h.set_verts(polygons)
+                h.set_clip_path(None if np.all(flags) else self.clip_path)
+                return
+            for h0 in h:
+                if h0.axes is not None:
+                    h0.remove()
+            del h[:]
+            for xy, inside in zip(polygons, flags):
+                h0, = draw(xy[:, 0], xy[:, 1], **opts)
+                if not inside:
+                    h0.set_clip_path(self.clip_path)
+                h.append(h0)
+
+        update(None)
+        self._track([h] if batch else h, update)
+        return h
+
+    @instrumented
+    def drawcoastlines(self, batch=True, simplify=None, preclip=False,
+                       **kwargs):
+        """Draw the coast line
+
+        Returns a single LineCollection by default. Changed from earlier
+        versions returning a list of Line2D, one per polygon, which is
+        still returned with batch=False.
+        With simplify, a tolerance in map coordinates or 'auto',
+        the polygons are simplified before drawing. With preclip,
+        they are clipped to the map domain before drawing.
+        """
+        opts = dict(color='black')
+        opts.update(kwargs)
+        return self._draw_coast(True, batch, simplify, preclip, opts)
+
+    @instrumented
+    def fillcontinents(self, batch=True, simplify=None, preclip=False,
+                       **kwargs):
+        """Fill land
+
+        Returns a single PolyCollection by default. Changed from earlier
+        versions returning a list of Polygon, one per polygon, which is
+        still returned with batch=False.
+        With simplify, a tolerance in map coordinates or 'auto',
+        the polygons are simplified before drawing. With preclip,
+        they are clipped to the map domain before drawing.
+        """
+        opts = dict(facecolor='0.8', edgecolor='black')
+        opts.update(kwargs)
+        return self._draw_coast(False, batch, simplify, preclip, opts)
+
+    @instrumented
+    def drawbase(self, draw, cache, key=None):
+        """Draw the base layers through an on-disk raster cache
+
+        draw : Function drawing the base layers, called as draw(self)
+        cache : rastercache.RasterCache
+        key : Extra hashable cache key, for instance for styles.
+              Required if draw is not a module-level function.
+
+        Call before drawing anything else. On a cache hit the stored
+        raster is used as a background image, see rastercache.py.
+
+        Returns True on a cache hit
+        """
+        hit = draw_cached_base(self, draw, cache, key)
+        self._cached_base = self._cached_base or hit
+        return hit
+
+    @instrumented
+    def grid(self, lon, lat, dtype=None, out=None, threads=None):
+        """Project a lon/lat grid once for repeated plotting
+
+        The returned ProjectedGrid can be given in place of lon, lat to
+        contourf, contour, plot and fill. With dtype='float32' the
+        projected coordinates take half the memory. 1-D axes broadcast
+        together, lon[np.newaxis, :] and lat[:, np.newaxis], are
+        projected without making the 2-D lon/lat arrays.
+
+        out : Preallocated x, y arrays, for instance from
+              projection.memmap_output for grids larger than memory
+        threads : Number of threads sharing the projection
+        """
+        return make_grid(self, lon, lat, dtype, out, threads)
+
+    @instrumented
+    def landmask(self, lon, lat, grid=False):
+        """Land/sea mask from the coast polygons, True on land
+
+        lon, lat : Arrays of points, broadcast together, or with
+                   grid=True the 1-D axes of a grid. The mask of a grid
+                   has shape (len(lat), len(lon)) and is cached.
+
+        Uses all polygons of the coast file, also outside the map domain.
+        """
+        index = land_index(self.coast)
+        if grid:
+            return index.grid(lon, lat)
+        return index.contains(lon, lat)
+
+    # Wrap some plotting methods
+
+    def _clip_contours(self, h):
+        """Clip the paths of a ContourSet to the map domain"""
+        if self.projection.separable:
+            x0, y0 = self(self.lon0, self.lat0)
+            x1, y1 = self(self.lon1, self.lat1)
+            clip_contours(h, (x0, x1, y0, y1))
+        else:
+            clip_contours(h, (self.lon0, self.lon1, self.lat0, self.lat1),
+                          self._xy2ll, self._ll2xy, (self.lat0, self.lat1),
+                          np.linspace(self.lon0, self.lon1, 50))
+
+    @instrumented
+    def contourf(self, lon, lat, *args, **kwargs):
+        """Wrap the contourf method of the axes
+
+        With preclip=True, the contour paths are clipped to the map
+        domain instead of hidden by the clip path, giving smaller
+        vector output.
+        """
+        preclip = kwargs.pop('preclip', False)
+        x, y, args = grid_xy(self, lon, lat, args)
+        h = self.ax.contourf(x, y, *args, **kwargs)
+        if not preclip and self.clip_path is not None:
+            _set_clip_path(h, self.clip_path)
+        self._follow_contours(h, preclip)
+        return h
+
+    @instrumented
+    def contour(self, lon, lat, *args, **kwargs):
+        """Wrap the contour method of the axes
+
+        With preclip=True, the contour paths are clipped to the map
+        domain instead of hidden by the clip path, giving smaller
+        vector output.
+        """
+        preclip = kwargs.pop('preclip', False)
+        x, y, args = grid_xy(self, lon, lat, args)
+        h = self.ax.contour(x, y, *args, **kwargs)
+        if not preclip and self.clip_path is not None:
+            _set_clip_path(h, self.clip_path)
+        self._follow_contours(h, preclip)
+        return h
+
+    @instrumented
+    def imshow(self, lon, lat, field, method='bilinear', **kwargs):
+        """Draw a field on a regular lon/lat grid as an image
+
+        Faster than contourf for screen and PNG output. The output
+        pixels are inverse projected once for the grid, figure size and
+        dpi, later fields are drawn by table lookup, see raster.py.
+        For a separable projection, the lookup is done by rows and
+        columns, without a 2-D projected mesh.
+
+        lon, lat : 1-D grid axes, or 2-D from meshgrid
+        method : 'bilinear' or 'nearest'
+        levels : Colour boundaries as for contourf, optional
+        kwargs : Passed on to imshow
+
+        Returns the AxesImage
+        """
+        h = show(self.ax, self._lut(lon, lat, method), field, **kwargs)
+        if self.clip_path is not None:
+            h.set_clip_path(self.clip_path)
+
+        def update(old):
+            lut = self._lut(lon, lat, method)
+            h.set_data(lut(field))
+            h.set_extent(lut.extent)
+        self._track([h], update)
+        return h
+
+    def _lut(self, lon, lat, method):
+        """Raster lookup table of the current axes"""
+        if self.projection.separable:
+            return separable_lut(self, lon, lat, method)
+        return raster_lut(self, lon, lat, method)
+
+    @instrumented
+    def density(self, lon, lat=None, values=None, how='count', chunk=CHUNK,
+                **kwargs):
+        """Draw many points as an image of their density
+
+        The points are projected in chunks and binned at the pixel
+        resolution of the axes, see density.py. Use instead of plot
+        for millions of points.
+
+        lon, lat : Arrays of points, or with lat None an iterable of
+                   (lon, lat) or (lon, lat, values) chunks
+        values : Values at the points, for how='mean' or 'max'
+        how : 'count', 'mean' or 'max' in each pixel
+        chunk : Number of points projected at a time
+        kwargs : Passed on to imshow, like cmap and norm
+
+        Returns the AxesImage, pixels without points are transparent
+        """
+        shape, extent = image_geometry(self.ax)
+        grid = DensityGrid(shape, extent, how)
+        accumulate(self, grid, lon, lat, values, chunk)
+        h = show_density(self.ax, grid, **kwargs)
+        if self.clip_path is not None:
+            h.set_clip_path(self.clip_path)
+
+        def update(old):
+            if lat is None:
+                # The chunks are consumed
+                h.remove()
+                return
+            shape, extent = image_geometry(self.ax)
+            grid = DensityGrid(shape, extent, how)
+            accumulate(self, grid, lon, lat, values, chunk)
+            h.set_data(grid.image())
+            h.set_extent(extent)
+        self._track([h], update)
+        return h
+
+    @instrumented
+    def plot(self, lon, lat, *args, **kwargs):
+        x, y, args = grid_xy(self, lon, lat, args)
+        h = self.ax.plot(x, y, *args, **kwargs)
+        if self.clip_path is not None:
+            for q in h:
+                q.set_clip_path(self.clip_path)
+        self._follow(h)
+        return h
+
+    @instrumented
+    def fill(self, lon, lat, *args, **kwargs):
+        x, y, args = grid_xy(self, lon, lat, args)
+        h = self.ax.fill(x, y, *args, **kwargs)
+        if self.clip_path is not None:
+            for q in h:
+                q.set_clip_path(self.clip_path)
+        self._follow(h)
+        return h
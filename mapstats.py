@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+
+"""Opt-in timing and memory statistics for the map classes
+
+The public drawing methods of PolarMap and MercatorMap are wrapped by
+the instrumented decorator. Statistics are off by default, then the
+wrapper only looks up one attribute before calling the method.
+
+After pmap.enable_stats(), each method call records the wall time,
+the number of vertices projected, the number of artists created and,
+with memory=True, the bytes allocated (traced with tracemalloc).
+The artists created get a draw hook recording their drawing time,
+and the draw and savefig methods of the figure are timed.
+
+Example:
+
+  pmap = PolarMap(-10, 30, 54, 72, 'coast.npz', ax=ax)
+  pmap.enable_stats(memory=True)
+  pmap.fillcontinents()
+  pmap.contourf(llon, llat, temp)
+  ax.figure.savefig('temp.png')
+  print(pmap.stats())
+
+A callback, called with a dictionary for every call and draw, can
+forward the numbers to a metrics system.
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import time
+import tracemalloc
+from collections import OrderedDict
+from functools import wraps
+
+# Names of the fields of a record, in report order
+FIELDS = ('calls', 'time', 'vertices', 'artists', 'bytes',
+          'draws', 'draw_time')
+
+# --- Classes ---
+
+
+class MapStats(object):
+    """Statistics per method of a map
+
+    callback : Function called with a dictionary for each event
+    memory : Trace the memory allocated by each method call
+
+    Times are in seconds and inclusive, the time of a method
+    calling another public method, like drawbase, includes it.
+    Memory is the peak allocated above the start of the outermost
+    call, for nested calls the net allocation.
+    """
+
+    def __init__(self, callback=None, memory=False):
+        self.callback = callback
+        self.memory = memory
+        self.records = OrderedDict()
+        self._stack = []
+
+    def record(self, name):
+        """The record of a method, created if needed"""
+        try:
+            return self.records[name]
+        except KeyError:
+            rec = self.records[name] = dict.fromkeys(FIELDS, 0)
+            return rec
+
+    def add_vertices(self, n):
+        """Count vertices projected by the current method"""
+        name = self._stack[-1] if self._stack else 'projection'
+        self.record(name)['vertices'] += n
+
+    def call(self, name, method, pmap, args, kwargs):
+        """Call a method and record its statistics"""
+        rec = self.record(name)
+        vertices = rec['vertices']
+        outer = not self._stack
+        if self.memory:
+            if outer:
+                tracemalloc.reset_peak()
+            mem0 = tracemalloc.get_traced_memory()[0]
+        self._stack.append(name)
+        t0 = time.perf_counter()
+        try:
+            result = method(pmap, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            self._stack.pop()
+
+        nbytes = 0
+        if self.memory:
+            current, peak = tracemalloc.get_traced_memory()
+            nbytes = (peak if outer else current) - mem0
+        artists = _artists(result)
+        for a in artists:
+            self._hook(pmap, name, a)
+        rec['calls'] += 1
+        rec['time'] += elapsed
+        rec['artists'] += len(artists)
+        rec['bytes'] += nbytes
+        if self.callback is not None:
+            self.callback(dict(event='call', method=name, time=elapsed,
+                               vertices=rec['vertices'] - vertices,
+                               artists=len(artists), bytes=nbytes))
+        return result
+
+    def draw(self, name, elapsed):
+        """Record the drawing time of an artist"""
+        rec = self.record(name)
+        rec['draws'] += 1
+        rec['draw_time'] += elapsed
+        if self.callback is not None:
+            self.callback(dict(event='draw', method=name, time=elapsed))
+
+    def _hook(self, pmap, name, artist):
+        """Time the drawing of an artist while the statistics are on"""
+        draw = artist.draw
+
+        @wraps(draw)
+        def timed_draw(*args, **kwargs):
+            if pmap._stats is not self:
+                return draw(*args, **kwargs)
+            t0 = time.perf_counter()
+            try:
+                return draw(*args, **kwargs)
+            finally:
+                self.draw(name, time.perf_counter() - t0)
+
+        artist.draw = timed_draw
+
+    def as_dict(self):
+        """The records as a dictionary of dictionaries"""
+        return OrderedDict((name, dict(rec))
+                           for name, rec in self.records.items())
+
+    def __str__(self):
+        lines = ['{:16s} {:>5s} {:>9s} {:>9s} {:>7s} {:>10s} {:>5s} {:>9s}'
+                 .format('method', 'calls', 'time [s]', 'vertices',
+                         'artists', 'bytes', 'draws', 'draw [s]')]
+        for name, rec in self.records.items():
+            lines.append(
+                '{:16s} {calls:5d} {time:9.4f} {vertices:9d} {artists:7d} '
+                '{bytes:10d} {draws:5d} {draw_time:9.4f}'.format(name, **rec))
+        return '\n'.join(lines)
+
+
+class Instrumented(object):
+    """Statistics interface of the map classes"""
+
+    _stats = None
+
+    def enable_stats(self, callback=None, memory=False):
+        """Start collecting statistics, discarding earlier ones
+
+        callback : Function called with a dictionary for each method
+                   call and artist draw
+        memory : Trace memory allocations, starts tracemalloc
+        """
+        self.disable_stats()
+        stats = MapStats(callback, memory)
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            stats._started_tracing = True
+        fig = self.ax.figure
+        for name in ('draw', 'savefig'):
+            _hook_figure(self, stats, fig, name)
+        self._stats = stats
+
+    def disable_stats(self):
+        """Stop collecting statistics, keeping the ones collected"""
+        stats = self._stats
+        if stats is None:
+            return
+        fig = self.ax.figure
+        for name in ('draw', 'savefig'):
+            if getattr(getattr(fig, name), '_mapstats', None) is stats:
+                delattr(fig, name)
+        if getattr(stats, '_started_tracing', False):
+            tracemalloc.stop()
+        self._stats = None
+        self._last_stats = stats
+
+    def stats(self):
+        """The statistics, a MapStats, or None if never enabled
+
+        Printing it gives a table per method.
+        """
+        if self._stats is not None:
+            return self._stats
+        return getattr(self, '_last_stats', None)
+
+
+# --- Functions ---
+
+
+def instrumented(method):
+    """Decorator recording statistics of a map method when enabled"""
+    name = method.__name__
+
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self._stats
+        if stats is None:
+            return method(self, *args, **kwargs)
+        return stats.call(name, method, self, args, kwargs)
+
+    return wrapper
+
+
+def _hook_figure(pmap, stats, fig, name):
+    """Time a method of the figure, draw or savefig"""
+    method = getattr(type(fig), name)
+    label = 'figure.' + name
+
+    def timed(*args, **kwargs):
+        if pmap._stats is not stats:
+            return method(fig, *args, **kwargs)
+        t0 = time.perf_counter()
+        try:
+            return method(fig, *args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - t0
+            if name == 'draw':
+                stats.draw(label, elapsed)
+            else:
+                rec = stats.record(label)
+                rec['calls'] += 1
+                rec['time'] += elapsed
+                if stats.callback is not None:
+                    stats.callback(dict(event='call', method=label,
+                                        time=elapsed, vertices=0,
+                                        artists=0, bytes=0))
+
+    timed._mapstats = stats
+    setattr(fig, name, timed)
+
+
+def _artists(h):
+    """List of artists in the return value of a drawing method"""
+    from matplotlib.artist import Artist
+    if isinstance(h, Artist):
+        return [h]
+    if isinstance(h, (list, tuple)):
+        artists = []
+        for a in h:
+            artists.extend(_artists(a))
+        return artists
+    return []
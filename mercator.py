@@ -10,7 +10,6 @@
 # TODO:
 # Better documentation
 # Control over tickmark lengths
-# Inherit from a superclass
 
 # ---------------
 # Imports
@@ -18,134 +17,105 @@
 
 from __future__ import unicode_literals
 
-from functools import partial
-
 import numpy as np
-import matplotlib.pyplot as plt
-
-# Radian factor
-rad = np.pi / 180.0
-deg = 180.0 / np.pi
-
-# unicode degree symbol
-degree = '\u00B0'
 
+from mapbase import MapBase, lat_label, lon_label
+from mapstats import instrumented
+# merc and imerc are also used from this module
+from projection import Mercator, merc, imerc  # noqa: F401
 
-def merc(lat):
-    return deg * np.log(np.tan((45 + 0.5*lat)*rad))
 
+class MercatorMap(MapBase):
+    """Mercator map
 
-class MercatorMap(object):
-    """Mercator map"""
+    All drawing is done on the matplotlib Axes ax,
+    by default the current pyplot axes.
+    """
 
     def __init__(self, lon0, lon1, lat0, lat1,
-                 coastfile, facecolor='white'):
-        self.lon0 = lon0
-        self.lon1 = lon1
-        self.lat0 = lat0
-        self.lat1 = lat1
+                 coastfile, facecolor='white', ax=None):
+        MapBase.__init__(self, lon0, lon1, lat0, lat1, coastfile,
+                         Mercator(), facecolor, ax)
 
-        # Coast line
-        self.coast_polygons = np.load(coastfile)
-
-        # Initiate maplotlib axis
-        # ------------------------
+    def _setup_axes(self, facecolor):
+        """Initiate the matplotlib axes"""
+        ax = self.ax
 
         # Set axis limits
-        plt.axis([lon0, lon1, merc(lat0), merc(lat1)])
+        self._update_axes()
 
         # Background colour
-        plt.gca().set_axis_bgcolor(facecolor)
+        ax.set_facecolor(facecolor)
 
         # Turn off ordinary ticks and labels
-        plt.xticks([])
-        plt.yticks([])
-
-    def __call__(self, lon, lat):
-        """Call the instance to project from lon/lat"""
+        ax.set_xticks([])
+        ax.set_yticks([])
 
-        lon = np.asarray(lon)
-        lat = np.asarray(lat)
-        x = lon
-        y = merc(lat)
-        return x, y
+    def _update_axes(self):
+        """Move the axis limits to the current domain"""
+        self.ax.axis([self.lon0, self.lon1,
+                      merc(self.lat0), merc(self.lat1)])
 
+    @instrumented
     def drawparallels(self, parallels, **kwargs):
-        """Draw and label parallels"""
-        myplot = partial(plt.plot, color='black', linestyle=':')
-        labels = []
-        for lat in parallels:
-            x, y = self([self.lon0, self.lon1], [lat, lat])
-            myplot(x, y, **kwargs)
-            # Labels
-            if lat > 0:
-                label = "{}{}N".format(lat, degree)
-            elif lat < 0:
-                label = "{}{}S".format(-lat, degree)
-            else:
-                label = "0"+degree
-            labels.append(label)
-
-        plt.yticks([merc(lat) for lat in parallels],  labels)
-
+        """Draw and label parallels
+
+        The parallels are drawn as one LineCollection, labelled
+        by the y ticks.
+
+        Returns the LineCollection and the list of tick label Texts
+        """
+        from matplotlib.collections import LineCollection
+        parallels = np.asarray(parallels)
+        y = merc(parallels)
+        segments = np.zeros((len(parallels), 2, 2))
+        segments[:, :, 1] = y[:, np.newaxis]
+        opts = dict(color='black', linestyle=':')
+        opts.update(kwargs)
+        lines = LineCollection([], **opts)
+        self.ax.add_collection(lines, autolim=False)
+
+        def update(old):
+            segments[:, :, 0] = self.lon0, self.lon1
+            lines.set_segments(segments)
+        update(None)
+        self._track([lines], update)
+
+        # Ticks outside the domain must not widen the axis limits
+        limits = self.ax.axis()
+        self.ax.set_yticks(y)
+        labels = self.ax.set_yticklabels([lat_label(lat)
+                                          for lat in parallels])
+        self.ax.axis(limits)
+        return lines, labels
+
+    @instrumented
     def drawmeridians(self, meridians, **kwargs):
-        """Draw and label meridians"""
-        myplot = partial(plt.plot, color='black', linestyle=':')
-        labels = []
-        for lon in meridians:
-            # Plot meridians
-            x, y = self([lon, lon], [self.lat0, self.lat1])
-            myplot(x, y, **kwargs)
-            if lon > 0:
-                label = "{}{}E".format(lon, degree)
-            elif lon < 0:
-                label = "{}{}W".format(-lon, degree)
-            else:
-                label = "0"+degree
-            labels.append(label)
-
-        plt.xticks(meridians, labels)
-
-    def drawcoastlines(self, **kwargs):
-        """Draw the coast line"""
-
-        myplot = partial(plt.plot, color='black')
-        for p in self.coast_polygons:
-            x, y = self(p[0], p[1])
-            myplot(x, y, **kwargs)
-
-    def fillcontinents(self, **kwargs):
-        """Fill land"""
-
-        myfill = partial(plt.fill, facecolor='0.8', edgecolor='black')
-        for p in self.coast_polygons:
-            x, y = self(p[0], p[1])
-            myfill(x, y, **kwargs)
-
-    # Wrap some plotting methods
-
-    def contourf(self, lon, lat, data, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.contourf(x, y, data, *args, **kwargs)
-        # for q in h.collections:
-        #    q.set_clip_path(self.clip_path)
-        return h
-
-    def contour(self, lon, lat, data, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.contour(x, y, data, *args, **kwargs)
-        # for q in h.collections:
-        #    q.set_clip_path(self.clip_path)
-        return h
-
-    def plot(self, lon, lat, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.plot(x, y, *args, **kwargs)
-        # h[0].set_clip_path(self.clip_path)
-        return h
-
-    def fill(self, lon, lat, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.fill(x, y, *args, **kwargs)
-        # h[0].set_clip_path(self.clip_path)
-        return h
+        """Draw and label meridians
+
+        The meridians are drawn as one LineCollection, labelled
+        by the x ticks.
+
+        Returns the LineCollection and the list of tick label Texts
+        """
+        from matplotlib.collections import LineCollection
+        meridians = np.asarray(meridians)
+        segments = np.zeros((len(meridians), 2, 2))
+        segments[:, :, 0] = meridians[:, np.newaxis]
+        opts = dict(color='black', linestyle=':')
+        opts.update(kwargs)
+        lines = LineCollection([], **opts)
+        self.ax.add_collection(lines, autolim=False)
+
+        def update(old):
+            segments[:, :, 1] = merc(self.lat0), merc(self.lat1)
+            lines.set_segments(segments)
+        update(None)
+        self._track([lines], update)
+
+        limits = self.ax.axis()
+        self.ax.set_xticks(meridians)
+        labels = self.ax.set_xticklabels([lon_label(lon)
+                                          for lon in meridians])
+        self.ax.axis(limits)
+        return lines, labels
@@ -12,8 +12,8 @@ Usage: python plotcoast.py coast_file
 # -----------------------------------
 
 import sys
-import numpy as np
 import matplotlib.pyplot as plt
+from coast import load_coast
 
 # Get the name of the coast file from the command line
 try:
@@ -24,9 +24,9 @@ except IndexError:
 
 # Load the coast line
 try:
-    polys = np.load(coastfile)
-except IOError:
-    print("Not a valid npy-file: " + coastfile)
+    polys = load_coast(coastfile)
+except (IOError, ValueError):
+    print("Not a valid coast file: " + coastfile)
     sys.exit(-2)
 
 # Make the land polygons green
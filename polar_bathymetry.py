@@ -44,16 +44,18 @@ with Dataset(topo_file) as fid:
     lon = fid.variables['lon'][:]
     lat = fid.variables['lat'][:]
     topo = fid.variables['topo'][:, :]
-llon, llat = np.meshgrid(lon, lat)
 
 # Depth is positive and only defined at sea
 topo = np.where(topo >= 0, np.nan, -topo)
 
 # Define the PolarMap instance
-pmap = PolarMap(lon0, lon1, lat0, lat1, 'coast.npy')
+pmap = PolarMap(lon0, lon1, lat0, lat1, 'coast.npz')
+
+# Project the grid from its axes, without lon/lat meshgrids
+g = pmap.grid(lon[np.newaxis, :], lat[:, np.newaxis], dtype='float32')
 
 # Contour the bathymetry
-pmap.contourf(llon, llat, np.log10(topo),
+pmap.contourf(g, np.log10(topo),
               cmap=plt.get_cmap('Blues'),
               levels=loglevels,
               extend='max')
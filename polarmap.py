@@ -16,89 +16,118 @@
 # ---------------
 
 from __future__ import unicode_literals
-from functools import partial
 import numpy as np
-import matplotlib.pyplot as plt
 
-# --- Constants ---
+from mapbase import MapBase, degree, lat_label, lon_label
+from mapstats import instrumented
+from projection import PolarStereographic, rad
 
-# Radian factor
-rad = np.pi / 180.0
 
-# unicode degree symbol
-degree = '\u00B0'
+# --- Functions ---
+
+
+def agg_figure(**kwargs):
+    """Make a matplotlib Figure on the Agg backend, bypassing pyplot
+
+    The keyword arguments are passed to Figure. The figure is not
+    known to pyplot, so several figures can be rendered concurrently
+    from different threads. Save it with fig.savefig.
+    """
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+    fig = Figure(**kwargs)
+    FigureCanvasAgg(fig)
+    return fig
 
 
 # --- Classes ---
 
 
-class PolarMap(object):
-    """Polar stereographic map from South pole onto equator"""
+class PolarMap(MapBase):
+    """Polar stereographic map from South pole onto equator
 
-    def __init__(self, lon0, lon1, lat0, lat1,
-                 coastfile, vlon=None, facecolor='white'):
-        self.lon0 = lon0
-        self.lon1 = lon1
-        self.lat0 = lat0
-        self.lat1 = lat1
+    All drawing is done on the matplotlib Axes ax, by default the current
+    pyplot axes. With an Axes of a Figure from agg_figure, maps can be
+    made in several threads at once.
+    """
 
+    def __init__(self, lon0, lon1, lat0, lat1,
+                 coastfile, vlon=None, facecolor='white', ax=None):
         if vlon is None:
-            self.vlon = 0.5 * (lon0 + lon1)
-        else:
-            self.vlon = vlon
-
-        # Map boundary
+            vlon = 0.5 * (lon0 + lon1)
+        MapBase.__init__(self, lon0, lon1, lat0, lat1, coastfile,
+                         PolarStereographic(vlon), facecolor, ax)
+
+    @property
+    def vlon(self):
+        """Longitude pointing up on the map"""
+        return self.projection.vlon
+
+    def set_extent(self, lon0, lon1, lat0, lat1, vlon=None):
+        """Move the map to a new lon/lat domain
+
+        vlon : New longitude pointing up, default unchanged
+
+        Reuses the coast and the drawn artists, see MapBase.set_extent.
+        With a new vlon the map is rotated, and the vertices of
+        contours and plotted lines are projected again.
+        """
+        projection = None
+        if vlon is not None and vlon != self.vlon:
+            projection = PolarStereographic(vlon)
+        MapBase.set_extent(self, lon0, lon1, lat0, lat1, projection)
+
+    def _boundary(self):
+        """Map boundary in map coordinates"""
+        lon0, lon1, lat0, lat1 = self.lon0, self.lon1, self.lat0, self.lat1
         lon_bry = np.concatenate((np.linspace(lon0, lon1, 50),
                                   np.linspace(lon1, lon0, 50),
                                   [lon0]))
         lat_bry = np.concatenate((lat0 + np.zeros((50,)),
                                   lat1 + np.zeros((50,)),
                                   [lat0]))
-        self.xbry, self.ybry = self(lon_bry, lat_bry)
+        return self(lon_bry, lat_bry)
 
-        # Coast line
-        self.coast_polygons = np.load(coastfile)
+    def _setup_axes(self, facecolor):
+        """Initiate the matplotlib axes"""
+        ax = self.ax
 
-        # Initiate maplotlib axis
-        # ------------------------
+        # Map boundary
+        self.xbry, self.ybry = self._boundary()
 
         # Make white background plot area and store as clipping path
-        self.clip_path, = plt.fill(self.xbry, self.ybry,
-                                   facecolor=facecolor, zorder=-2)
+        self.clip_path, = ax.fill(self.xbry, self.ybry,
+                                  facecolor=facecolor, zorder=-2)
         # Plot a black foreground frame for the plot area
-        plt.plot(self.xbry, self.ybry, color='black', lw=2)
+        self._frame, = ax.plot(self.xbry, self.ybry, color='black', lw=2)
 
         # Make a thight of correct aspect ration and save it
-        plt.axis('image')
-        self.axis_limits = plt.axis()
+        ax.axis('image')
+        self.axis_limits = ax.axis()
 
         # Hide the standard matplotlib axes
-        ax = plt.gca()
-        ax.set_axis_bgcolor(plt.gcf().get_facecolor())
+        ax.set_facecolor(ax.figure.get_facecolor())
         ax.set_axis_off()
         # Control the coordinate display
         ax.format_coord = self._format_coord
 
-        plt.axis(self.axis_limits)
-        plt.axis('image')
-
-    def _ll2xy(self, lon, lat):
-        """Forward stereographic projection on spherical earth"""
-        lon = np.asarray(lon)
-        lat = np.asarray(lat)
-        m = np.tan((45.0 - 0.5 * lat) * rad)
-        x = m * np.sin((lon - self.vlon) * rad)
-        y = -m * np.cos((lon - self.vlon) * rad)
-        return x, y
-
-    def _xy2ll(self, x, y):
-        """Inverse stereographic projection on a spherical earth"""
-        x = np.asarray(x)
-        y = np.asarray(y)
-        m = np.sqrt(x * x + y * y)
-        lon = self.vlon + np.arctan2(x, -y) / rad
-        lat = 90.0 - 2 * np.arctan(m) / rad
-        return lon, lat
+        ax.axis(self.axis_limits)
+        ax.axis('image')
+
+    def _update_axes(self):
+        """Move the frame and axis limits to the current domain"""
+        self.xbry, self.ybry = self._boundary()
+        self.clip_path.set_xy(np.column_stack((self.xbry, self.ybry)))
+        self._frame.set_data(self.xbry, self.ybry)
+        # Tight around the frame with the axes margins, as axis('image')
+        xmargin, ymargin = self.ax.margins()
+        x0, x1 = self.xbry.min(), self.xbry.max()
+        y0, y1 = self.ybry.min(), self.ybry.max()
+        dx = xmargin * (x1 - x0)
+        dy = ymargin * (y1 - y0)
+        self.axis_limits = (float(x0 - dx), float(x1 + dx),
+                            float(y0 - dy), float(y1 + dy))
+        self.ax.axis(self.axis_limits)
 
     def _format_coord(self, x, y):
         """Format coordinate string with lon/lat"""
@@ -109,121 +138,90 @@ class PolarMap(object):
         else:
             return ""
 
-    def __call__(self, lon, lat, inverse=False):
-        """Provide projection by calling the instance"""
-        if inverse:
-            return self._xy2ll(lon, lat)  # lon, lat is x, y in this case
-        else:
-            return self._ll2xy(lon, lat)
-
+    @instrumented
     def drawparallels(self, parallels, labelsep=1.0, **kwargs):
-        """Draw and label parallels"""
-        xmin = self._ll2xy(self.lon0, self.lat0)[0]
-        xmax = self._ll2xy(self.lon1, self.lat0)[0]
-        labelsep *= 0.015 * (xmax - xmin)
-        myplot = partial(plt.plot, color='black', linestyle=':')
-        lon = np.linspace(self.lon0, self.lon1, 100)
-
-        label_angle = self.lon0 - self.vlon
-        cosa = np.cos(label_angle * rad)
-        sina = np.sin(label_angle * rad)
-
-        for lat in parallels:
-            x, y = self(lon, lat + np.zeros_like(lon))
-            myplot(x, y, **kwargs)
-            # Labels
-            x0, y0 = self(self.lon0, lat)
-            x1 = x0 - labelsep * cosa
-            y1 = y0 - labelsep * sina
-            if lat > 0:
-                label = "{}{}N".format(lat, degree)
-            elif lat < 0:
-                label = "{}{}S".format(-lat, degree)
-            else:
-                label = "0" + degree
-            plt.text(x1, y1, label,
-                     rotation=label_angle,
-                     rotation_mode='anchor',
-                     horizontalalignment='right',
-                     verticalalignment='center')
+        """Draw and label parallels
+
+        The parallels are drawn as one LineCollection.
+
+        Returns the LineCollection and the list of label Texts
+        """
+        from matplotlib.collections import LineCollection
+        parallels = np.asarray(parallels)
+        opts = dict(color='black', linestyle=':')
+        opts.update(kwargs)
+        lines = LineCollection([], **opts)
+        self.ax.add_collection(lines, autolim=False)
+        labels = [self.ax.text(0, 0, lat_label(lat),
+                               rotation_mode='anchor',
+                               horizontalalignment='right',
+                               verticalalignment='center')
+                  for lat in parallels]
+
+        def update(old):
+            xmin = self._ll2xy(self.lon0, self.lat0)[0]
+            xmax = self._ll2xy(self.lon1, self.lat0)[0]
+            sep = labelsep * 0.015 * (xmax - xmin)
+
+            # All lines in one projection call, shape (nlines, 100)
+            lon = np.linspace(self.lon0, self.lon1, 100)
+            x, y = self(lon[np.newaxis, :], parallels[:, np.newaxis])
+            lines.set_segments(np.stack((x, y), axis=-1))
 
+            # Labels
+            label_angle = self.lon0 - self.vlon
+            cosa = np.cos(label_angle * rad)
+            sina = np.sin(label_angle * rad)
+            x1 = x[:, 0] - sep * cosa
+            y1 = y[:, 0] - sep * sina
+            for i, label in enumerate(labels):
+                label.set_position((x1[i], y1[i]))
+                label.set_rotation(label_angle)
+
+        update(None)
+        self._track([lines] + list(labels), update)
+        return lines, labels
+
+    @instrumented
     def drawmeridians(self, meridians, labelsep=1.0, **kwargs):
-        """Draw and label meridians"""
-        ymin = self(self.vlon, self.lat0)[1]
-        ymax = self(self.vlon, self.lat1)[1]
-        labelsep *= 0.02 * (ymax - ymin)
-        myplot = partial(plt.plot, color='black', linestyle=':')
-        for lon in meridians:
-            # Plot meridians
-            x, y = self([lon, lon], [self.lat0, self.lat1])
-            myplot(x, y, **kwargs)
+        """Draw and label meridians
+
+        The meridians are drawn as one LineCollection.
+
+        Returns the LineCollection and the list of label Texts
+        """
+        from matplotlib.collections import LineCollection
+        meridians = np.asarray(meridians)
+        opts = dict(color='black', linestyle=':')
+        opts.update(kwargs)
+        lines = LineCollection([], **opts)
+        self.ax.add_collection(lines, autolim=False)
+        labels = [self.ax.text(0, 0, lon_label(lon),
+                               rotation_mode='anchor',
+                               horizontalalignment='center',
+                               verticalalignment='top')
+                  for lon in meridians]
+
+        def update(old):
+            ymin = self(self.vlon, self.lat0)[1]
+            ymax = self(self.vlon, self.lat1)[1]
+            sep = labelsep * 0.02 * (ymax - ymin)
+
+            # All lines in one projection call, shape (nlines, 2)
+            x, y = self(meridians[:, np.newaxis],
+                        np.array([[self.lat0, self.lat1]]))
+            lines.set_segments(np.stack((x, y), axis=-1))
 
             # Labels
-            angle = lon - self.vlon
+            angle = meridians - self.vlon
             cosa = np.cos(angle * rad)
             sina = np.sin(angle * rad)
-            x0, y0 = self(lon, self.lat0)
-            x1 = x0 + labelsep * sina
-            y1 = y0 - labelsep * cosa
-            if lon > 0:
-                label = "{}{}E".format(lon, degree)
-            elif lon < 0:
-                label = "{}{}W".format(-lon, degree)
-            else:
-                label = "0" + degree
-            plt.text(x1, y1, label,
-                     rotation=angle,
-                     rotation_mode='anchor',
-                     horizontalalignment='center',
-                     verticalalignment='top')
-
-    def drawcoastlines(self, **kwargs):
-        """Draw the coast line"""
-
-        myplot = partial(plt.plot, color='black')
-        h = []
-        for p in self.coast_polygons:
-            x, y = self(p[0], p[1])
-            h0, = myplot(x, y, **kwargs)
-            h0.set_clip_path(self.clip_path)
-            h.append(h0)
-        return h
-
-    def fillcontinents(self, **kwargs):
-        """Fill land"""
-        myfill = partial(plt.fill, facecolor='0.8', edgecolor='black')
-        h = []
-        for p in self.coast_polygons:
-            x, y = self(p[0], p[1])
-            h0, = myfill(x, y, **kwargs)
-            h0.set_clip_path(self.clip_path)
-            h.append(h0)
-        return h
-
-    # Wrap some plotting methods
-
-    def contourf(self, lon, lat, data, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.contourf(x, y, data, *args, **kwargs)
-        for q in h.collections:
-            q.set_clip_path(self.clip_path)
-        return h
-
-    def contour(self, lon, lat, data, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.contour(x, y, data, *args, **kwargs)
-        for q in h.collections:
-            q.set_clip_path(self.clip_path)
-        return h
-
-    def plot(self, lon, lat, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.plot(x, y, *args, **kwargs)
-        h[0].set_clip_path(self.clip_path)
-        return h
-
-    def fill(self, lon, lat, *args, **kwargs):
-        x, y = self(lon, lat)
-        h = plt.fill(x, y, *args, **kwargs)
-        h[0].set_clip_path(self.clip_path)
-        return h
+            x1 = x[:, 0] + sep * sina
+            y1 = y[:, 0] - sep * cosa
+            for i, label in enumerate(labels):
+                label.set_position((x1[i], y1[i]))
+                label.set_rotation(angle[i])
+
+        update(None)
+        self._track([lines] + list(labels), update)
+        return lines, labels
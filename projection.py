@@ -0,0 +1,304 @@
+# -*- coding: utf-8 -*-
+
+"""Map projections on spherical earth, depending only on NumPy
+
+The coordinate conversions of PolarMap and MercatorMap, for programs
+that convert coordinates without drawing. Importing this module does
+not import matplotlib.
+
+The projection engines, PolarStereographic and Mercator, are used by
+the map classes. Their forward and inverse methods take
+
+  out : Tuple of two preallocated arrays for the result
+  dtype : Result type, float32 halves the memory and is computed
+          in single precision
+
+  threads : Number of threads sharing the work, NumPy releases the GIL
+
+Large arrays are evaluated in place, in chunks, using the output
+arrays as work space, so the peak memory is the output. Inputs that
+broadcast to a grid, like lon[np.newaxis, :] and lat[:, np.newaxis],
+are broadcast chunk by chunk, and have the trigonometric functions
+evaluated on the axes only. For grids too large for memory, the
+output can be memory-mapped files from memmap_output.
+
+Example:
+
+  from projection import PolarStereographic, ll2xy
+
+  x, y = ll2xy(lon, lat, vlon=10.0)
+
+  proj = PolarStereographic(vlon=10.0)
+  x, y = proj.forward(lon[np.newaxis, :], lat[:, np.newaxis],
+                      dtype='float32')
+  lon2, lat2 = proj.inverse(x, y)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+# --- Constants ---
+
+# Radian and degree factors
+rad = np.pi / 180.0
+deg = 180.0 / np.pi
+
+# --- Classes ---
+
+
+class Projection(object):
+    """Base class of the projection engines
+
+    Subclasses define _forward and _inverse, evaluating 1-D chunks in
+    place into the output arrays, and may define _forward_outer for
+    broadcast inputs.
+    """
+
+    # True if x depends only on lon and y only on lat
+    separable = False
+
+    # Number of points evaluated at a time
+    chunk = 2**16
+
+    @property
+    def key(self):
+        """Hashable identification of the projection and its parameters"""
+        raise NotImplementedError
+
+    def forward(self, lon, lat, out=None, dtype=None, threads=None):
+        """Project lon, lat to x, y"""
+        return self._apply(self._forward, self._forward_outer,
+                           lon, lat, out, dtype, threads)
+
+    def inverse(self, x, y, out=None, dtype=None, threads=None):
+        """Inverse projection from x, y to lon, lat"""
+        return self._apply(self._inverse, None, x, y, out, dtype, threads)
+
+    def __call__(self, lon, lat, inverse=False, out=None, dtype=None,
+                 threads=None):
+        if inverse:
+            return self.inverse(lon, lat, out, dtype, threads)
+        return self.forward(lon, lat, out, dtype, threads)
+
+    _forward_outer = None
+
+    def _apply(self, func, outer, a, b, out, dtype, threads=None):
+        """Evaluate func in chunks, or outer on broadcast inputs
+
+        The inputs are broadcast chunk by chunk, the temporary memory
+        is a few chunks per thread.
+        """
+        a = np.asarray(a)
+        b = np.asarray(b)
+        shape = np.broadcast(a, b).shape
+        scalar = out is None and shape == ()
+        if out is None:
+            if dtype is None:
+                dtype = np.result_type(a.dtype, b.dtype, np.float32)
+            out = (np.empty(shape, dtype), np.empty(shape, dtype))
+        else:
+            for c in out:
+                if c.shape != shape or not c.flags.c_contiguous:
+                    raise ValueError(
+                        "out must be C contiguous arrays of shape {}"
+                        .format(shape))
+        n = int(np.prod(shape))
+        a = a.reshape((1,) * (len(shape) - a.ndim) + a.shape)
+        b = b.reshape((1,) * (len(shape) - b.ndim) + b.shape)
+
+        if outer is not None and a.size + b.size < n:
+            # Temporaries have the size of the inputs, only split
+            # the work between the threads
+            chunk = -(-n // (threads or 1))
+
+            def work(index):
+                index += (Ellipsis,)
+                outer(_block(a, index), _block(b, index),
+                      out[0][index], out[1][index])
+        else:
+            chunk = self.chunk
+
+            def work(index):
+                index += (Ellipsis,)
+                c0, c1 = out[0][index], out[1][index]
+                func(np.broadcast_to(_block(a, index), c0.shape).ravel(),
+                     np.broadcast_to(_block(b, index), c0.shape).ravel(),
+                     c0.reshape(-1), c1.reshape(-1))
+
+        blocks = _blocks(shape, chunk)
+        if threads and threads > 1:
+            with ThreadPoolExecutor(threads) as pool:
+                list(pool.map(work, blocks))
+        else:
+            for index in blocks:
+                work(index)
+
+        if scalar:
+            return out[0][()], out[1][()]
+        return out
+
+
+class PolarStereographic(Projection):
+    """Polar stereographic projection from the South pole onto the equator
+
+    vlon : Longitude pointing up on the map
+    """
+
+    def __init__(self, vlon):
+        self.vlon = vlon
+
+    @property
+    def key(self):
+        return ('polar', float(self.vlon))
+
+    def _forward(self, lon, lat, x, y):
+        # x, y are work space for the angle and its sine and cosine
+        np.subtract(lon, self.vlon, out=x)
+        x *= rad
+        np.cos(x, out=y)
+        np.sin(x, out=x)
+        m = np.multiply(lat, -0.5 * rad, dtype=x.dtype)
+        m += 45.0 * rad
+        np.tan(m, out=m)
+        x *= m
+        y *= m
+        np.negative(y, out=y)
+
+    def _forward_outer(self, lon, lat, x, y):
+        # Trigonometric functions on the unbroadcast inputs
+        angle = (lon - self.vlon) * rad
+        m = np.tan((45.0 - 0.5 * lat) * rad)
+        np.multiply(m, np.sin(angle), out=x)
+        np.multiply(m, np.cos(angle), out=y)
+        np.negative(y, out=y)
+
+    def _inverse(self, x, y, lon, lat):
+        np.negative(y, out=lat)
+        np.arctan2(x, lat, out=lon)
+        lon *= deg
+        lon += self.vlon
+        np.hypot(x, y, out=lat)
+        np.arctan(lat, out=lat)
+        lat *= -2 * deg
+        lat += 90.0
+
+
+class Mercator(Projection):
+    """Mercator projection, x is longitude, y in degrees at the equator"""
+
+    separable = True
+
+    @property
+    def key(self):
+        return ('mercator',)
+
+    def _forward(self, lon, lat, x, y):
+        x[...] = lon
+        np.multiply(lat, 0.5 * rad, out=y)
+        y += 45.0 * rad
+        np.tan(y, out=y)
+        np.log(y, out=y)
+        y *= deg
+
+    def _forward_outer(self, lon, lat, x, y):
+        x[...] = lon
+        y[...] = merc(lat)
+
+    def _inverse(self, x, y, lon, lat):
+        lon[...] = x
+        np.multiply(y, rad, out=lat)
+        np.exp(lat, out=lat)
+        np.arctan(lat, out=lat)
+        lat *= 2 * deg
+        lat -= 90.0
+
+
+# --- Functions ---
+
+
+def _blocks(shape, chunk):
+    """Index tuples of contiguous blocks of at most chunk elements
+
+    A block is a range of whole rows, or a range within a row when the
+    rows are longer than the chunk.
+    """
+    if len(shape) == 0:
+        yield ()
+        return
+    rowsize = int(np.prod(shape[1:]))
+    if rowsize <= chunk:
+        nrows = max(chunk // max(rowsize, 1), 1)
+        for i in range(0, shape[0], nrows):
+            yield (slice(i, i + nrows),)
+    else:
+        for i in range(shape[0]):
+            for index in _blocks(shape[1:], chunk):
+                yield (i,) + index
+
+
+def _block(a, index):
+    """Block of an input, keeping its length one axes for broadcasting
+
+    index : Block index from _blocks, followed by Ellipsis
+    """
+    return a[tuple(slice(None) if n == 1 and isinstance(i, slice)
+                   else 0 if n == 1 else i
+                   for n, i in zip(a.shape, index[:-1])) + (Ellipsis,)]
+
+
+def memmap_output(filename, shape, dtype='float32'):
+    """Memory-mapped output arrays for projecting very large grids
+
+    Creates the .npy files filename_x.npy and filename_y.npy, readable
+    later with np.load(..., mmap_mode='r').
+
+    Returns the pair of arrays, to be given as out=
+    """
+    from numpy.lib.format import open_memmap
+    return tuple(open_memmap('{}_{}.npy'.format(filename, c), mode='w+',
+                             dtype=dtype, shape=shape)
+                 for c in 'xy')
+
+
+def ll2xy(lon, lat, vlon):
+    """Forward polar stereographic projection, as PolarMap
+
+    vlon : Longitude pointing up on the map
+    """
+    lon = np.asarray(lon)
+    lat = np.asarray(lat)
+    m = np.tan((45.0 - 0.5 * lat) * rad)
+    x = m * np.sin((lon - vlon) * rad)
+    y = -m * np.cos((lon - vlon) * rad)
+    return x, y
+
+
+def xy2ll(x, y, vlon):
+    """Inverse polar stereographic projection, as PolarMap"""
+    x = np.asarray(x)
+    y = np.asarray(y)
+    m = np.sqrt(x * x + y * y)
+    lon = vlon + np.arctan2(x, -y) / rad
+    lat = 90.0 - 2 * np.arctan(m) / rad
+    return lon, lat
+
+
+def merc(lat):
+    """Mercator y coordinate in degrees at the equator"""
+    return deg * np.log(np.tan((45 + 0.5*lat)*rad))
+
+
+def imerc(y):
+    """Inverse of merc"""
+    return 2 * deg * np.arctan(np.exp(y*rad)) - 90
@@ -0,0 +1,340 @@
+# -*- coding: utf-8 -*-
+
+"""Raster drawing of lon/lat fields through a cached lookup table
+
+For screen and PNG output, a field on a regular lon/lat grid can be
+drawn as one image instead of contours. The output pixels of the axes
+are inverse projected once, and for each pixel inside the map the
+source grid cell and bilinear weights are stored. Every later field on
+the same grid is drawn by a gather and a weighted sum, without
+trigonometry, and shown with imshow.
+
+The lookup tables are cached per projection, map domain, source grid,
+image size in pixels and data extent, so the figure size and dpi
+are part of the key. Save the figure with the dpi it had when drawing,
+otherwise the image is resampled.
+
+Example:
+
+  pmap = PolarMap(-10, 30, 54, 72, 'coast.npz', ax=ax)
+  for temp in temps:
+      pmap.imshow(lon, lat, temp, cmap='RdBu_r', levels=levels)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import hashlib
+import threading
+from collections import OrderedDict
+import numpy as np
+
+# --- Classes ---
+
+
+class RasterLUT(object):
+    """Lookup table from image pixels to source grid cells
+
+    shape : Image shape, (height, width)
+    extent : Data coordinates of the image, (x0, x1, y0, y1)
+    pixels : Flat indices of the image pixels with data
+    index : Flat source indices, shape (4, npixels), or (1, npixels)
+            for nearest neighbour
+    weights : Weights of the source values, same shape as index
+    source : Shape of the source grid, (len(lat), len(lon))
+    """
+
+    def __init__(self, shape, extent, pixels, index, weights, source):
+        self.shape = shape
+        self.extent = extent
+        self.pixels = pixels
+        self.index = index
+        self.weights = weights
+        self.source = source
+
+    @property
+    def nbytes(self):
+        return self.pixels.nbytes + self.index.nbytes + self.weights.nbytes
+
+    def __call__(self, field):
+        """Image of a field, NaN outside the map and at missing values"""
+        field = _source_field(field, self.source).ravel()
+        image = np.full(self.shape[0] * self.shape[1], np.nan,
+                        dtype=np.float32)
+        values = field[self.index]
+        values *= self.weights
+        image[self.pixels] = values.sum(axis=0)
+        return image.reshape(self.shape)
+
+
+class SeparableLUT(object):
+    """Row and column lookup tables for separable projections
+
+    For a projection where x depends only on lon and y only on lat,
+    the field is resampled in two 1-D passes, first the rows and then
+    the columns.
+
+    rows, cols : (index, next, weight, valid), the source rows or
+                 columns on both sides of each pixel row or column and
+                 the weight of the next one
+    source : Shape of the source grid, (len(lat), len(lon))
+    """
+
+    def __init__(self, shape, extent, rows, cols, source):
+        self.shape = shape
+        self.extent = extent
+        self.rows = rows
+        self.cols = cols
+        self.source = source
+
+    @property
+    def nbytes(self):
+        return sum(a.nbytes for a in self.rows + self.cols
+                   if a is not None)
+
+    def __call__(self, field):
+        """Image of a field, NaN outside the grid and at missing values"""
+        field = _source_field(field, self.source)
+        return _resample(_resample(field, self.rows, 0), self.cols, 1)
+
+
+class LUTCache(object):
+    """LRU cache of lookup tables, bounded by number"""
+
+    def __init__(self, maxitems=8):
+        self.maxitems = maxitems
+        self.hits = 0
+        self.misses = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            lut = self._items.pop(key, None)
+            if lut is None:
+                self.misses += 1
+                return None
+            self._items[key] = lut
+            self.hits += 1
+            return lut
+
+    def put(self, key, lut):
+        with self._lock:
+            self._items[key] = lut
+            while len(self._items) > self.maxitems:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+
+# --- Module variables ---
+
+# Lookup tables, shared by all maps in the process
+cache = LUTCache()
+
+
+# --- Functions ---
+
+
+def raster_lut(pmap, lon, lat, method='bilinear'):
+    """Lookup table for the axes of a map and a source grid, cached
+
+    The pixel centres are inverse projected with pmap(x, y, inverse=True)
+    """
+    lon, lat = grid_axes(lon, lat)
+    shape, extent = image_geometry(pmap.ax)
+    key = lut_key(pmap, lon, lat, shape, extent, method)
+    lut = cache.get(key)
+    if lut is None:
+        x, y = pixel_centres(shape, extent)
+        xx, yy = np.meshgrid(x, y)
+        plon, plat = pmap(xx.ravel(), yy.ravel(), inverse=True)
+        inside = ((plon >= pmap.lon0) & (plon <= pmap.lon1) &
+                  (plat >= pmap.lat0) & (plat <= pmap.lat1))
+        lut = make_lut(plon, plat, inside, lon, lat, shape, extent, method)
+        cache.put(key, lut)
+    return lut
+
+
+def separable_lut(pmap, lon, lat, method='bilinear'):
+    """Row and column lookup tables for a separable projection, cached
+
+    The pixel rows and columns are inverse projected separately
+    """
+    lon, lat = grid_axes(lon, lat)
+    shape, extent = image_geometry(pmap.ax)
+    key = lut_key(pmap, lon, lat, shape, extent, method) + ('separable',)
+    lut = cache.get(key)
+    if lut is None:
+        x, y = pixel_centres(shape, extent)
+        plon = pmap(x, np.zeros_like(x) + extent[2], inverse=True)[0]
+        plat = pmap(np.zeros_like(y) + extent[0], y, inverse=True)[1]
+        lut = SeparableLUT(shape, extent, _axis_lut(lat, plat, method),
+                           _axis_lut(lon, plon, method), (len(lat), len(lon)))
+        cache.put(key, lut)
+    return lut
+
+
+def show(ax, lut, field, levels=None, **kwargs):
+    """Draw a field through a lookup table with imshow
+
+    levels : Colour boundaries, as for contourf, giving a BoundaryNorm
+    kwargs : Passed on to imshow, like cmap, norm, vmin and vmax
+
+    Returns the AxesImage
+    """
+    from matplotlib import colormaps
+    from matplotlib.colors import BoundaryNorm
+
+    extend = kwargs.pop('extend', 'neither')
+    if levels is not None and kwargs.get('norm') is None:
+        cmap = colormaps.get_cmap(kwargs.get('cmap'))
+        kwargs['norm'] = BoundaryNorm(levels, cmap.N, extend=extend)
+    # Keep the aspect of the map, the image is made for its geometry
+    opts = dict(interpolation='nearest', aspect=ax.get_aspect())
+    opts.update(kwargs)
+    limits = ax.axis()
+    h = ax.imshow(lut(field), extent=lut.extent, origin='lower', **opts)
+    ax.axis(limits)
+    return h
+
+
+def grid_axes(lon, lat):
+    """1-D axes of a regular lon/lat grid
+
+    lon, lat may be 1-D axes or 2-D arrays from meshgrid
+    """
+    lon = np.asarray(lon, dtype=np.float64)
+    lat = np.asarray(lat, dtype=np.float64)
+    if lon.ndim == 2:
+        if not ((lon == lon[:1, :]).all() and (lat == lat[:, :1]).all()):
+            raise ValueError("Raster drawing needs a regular lon/lat grid")
+        lon, lat = lon[0, :], lat[:, 0]
+    return lon, lat
+
+
+def image_geometry(ax):
+    """Image shape in pixels and extent in data coordinates of an axes"""
+    ax.apply_aspect()
+    bbox = ax.get_window_extent()
+    shape = (max(int(round(bbox.height)), 1), max(int(round(bbox.width)), 1))
+    x0, x1 = ax.get_xlim()
+    y0, y1 = ax.get_ylim()
+    return shape, (float(x0), float(x1), float(y0), float(y1))
+
+
+def lut_key(pmap, lon, lat, shape, extent, method):
+    """Cache key of a lookup table"""
+    h = hashlib.sha1(np.ascontiguousarray(lon))
+    h.update(b'/')
+    h.update(np.ascontiguousarray(lat))
+    return (pmap.projection_key, pmap.lon0, pmap.lon1, pmap.lat0, pmap.lat1,
+            h.hexdigest(), shape, extent, method)
+
+
+def make_lut(plon, plat, inside, lon, lat, shape, extent, method='bilinear'):
+    """Lookup table from the lon/lat of the image pixels
+
+    plon, plat : Lon/lat of the pixel centres, flat
+    inside : Boolean, pixels inside the map domain
+    lon, lat : 1-D axes of the source grid
+    """
+    i, fx, ok = _locate(lon, plon)
+    j, fy, ok2 = _locate(lat, plat)
+    valid = inside & ok & ok2
+    pixels = np.flatnonzero(valid)
+    i, j, fx, fy = i[valid], j[valid], fx[valid], fy[valid]
+    nlon = len(lon)
+
+    if method == 'nearest':
+        i = i + (fx >= 0.5)
+        j = j + (fy >= 0.5)
+        index = (j * nlon + i)[np.newaxis, :]
+        weights = np.ones(index.shape, dtype=np.float32)
+    elif method == 'bilinear':
+        k = j * nlon + i
+        index = np.stack((k, k + 1, k + nlon, k + nlon + 1))
+        weights = np.stack(((1 - fx) * (1 - fy), fx * (1 - fy),
+                            (1 - fx) * fy, fx * fy)).astype(np.float32)
+    else:
+        raise ValueError("Unknown method {}".format(method))
+    dtype = np.int32 if len(lon) * len(lat) < 2**31 else np.int64
+    return RasterLUT(shape, extent, pixels, index.astype(dtype), weights,
+                     (len(lat), len(lon)))
+
+
+def _source_field(field, source):
+    """Field as float32 with NaN at missing values, checking its shape"""
+    field = np.ma.filled(np.ma.asarray(field, dtype=np.float32), np.nan)
+    if field.shape != tuple(source):
+        raise ValueError("Field shape {} does not match the grid {}".format(
+            field.shape, tuple(source)))
+    return field
+
+
+def _axis_lut(axis, values, method):
+    """Index, next index, weight of the next and validity along one axis"""
+    i, frac, valid = _locate(axis, values)
+    if method == 'nearest':
+        i = i + (frac >= 0.5)
+        return i, i, None, valid
+    elif method != 'bilinear':
+        raise ValueError("Unknown method {}".format(method))
+    return i, i + 1, frac.astype(np.float32), valid
+
+
+def _resample(a, lut, axis):
+    """Resample a 2-D array along one axis with an axis lookup table"""
+    i0, i1, w, valid = lut
+    if axis == 0:
+        b = a[i0]
+        if i1 is not i0:
+            b *= 1 - w[:, np.newaxis]
+            b += w[:, np.newaxis] * a[i1]
+        b[~valid] = np.nan
+    else:
+        b = a[:, i0]
+        if i1 is not i0:
+            b *= 1 - w
+            b += w * a[:, i1]
+        b[:, ~valid] = np.nan
+    return b
+
+
+def pixel_centres(shape, extent):
+    """Data coordinates of the pixel centres, x of the columns, y of the rows"""
+    x0, x1, y0, y1 = extent
+    height, width = shape
+    x = x0 + (np.arange(width) + 0.5) * (x1 - x0) / width
+    y = y0 + (np.arange(height) + 0.5) * (y1 - y0) / height
+    return x, y
+
+
+def _locate(axis, values):
+    """Cell index and fraction of values on a monotonic axis
+
+    Returns i, frac, valid with axis[i] <= value <= axis[i+1]
+    for increasing axes, and the index of the same cell for
+    decreasing axes.
+    """
+    n = len(axis)
+    decreasing = n > 1 and axis[-1] < axis[0]
+    if decreasing:
+        axis = axis[::-1]
+    valid = (values >= axis[0]) & (values <= axis[-1])
+    i = np.clip(np.searchsorted(axis, values, side='right') - 1, 0, n - 2)
+    frac = (values - axis[i]) / (axis[i + 1] - axis[i])
+    if decreasing:
+        i = n - 2 - i
+        frac = 1.0 - frac
+    return i, frac, valid
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+
+"""On-disk cache of rendered map base layers
+
+The base layers of a map, the frame, filled land and graticule with
+labels, are rendered once and saved as an RGBA raster of the whole
+figure. Later maps with the same domain, projection, figure size, dpi,
+background colours, coast file and drawing function put the raster
+into the figure as an image below the axes, instead of drawing the
+layers again.
+
+The drawing function is identified by its module and name, so it must
+be a function defined at module level. Give an explicit key for
+lambdas, nested functions, partials and other callables.
+
+The raster is in figure pixels, save the figure with its own dpi.
+
+Example:
+
+  cache = RasterCache('basemaps', maxbytes=500*2**20)
+
+  def base(pmap):
+      pmap.fillcontinents(facecolor='green')
+      pmap.drawparallels([55, 60, 65, 70])
+      pmap.drawmeridians([-10, 0, 10, 20, 30])
+
+  pmap = PolarMap(-10, 30, 54, 72, 'coast.npz', ax=ax)
+  pmap.drawbase(base, cache)
+  pmap.contourf(llon, llat, temp)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import hashlib
+import os
+import sys
+import tempfile
+import types
+import numpy as np
+
+# --- Classes ---
+
+
+class RasterCache(object):
+    """Directory of cached RGBA rasters with LRU eviction
+
+    cachedir : Cache directory, created if needed
+    maxbytes : Bound on the total size of the cached rasters. The least
+               recently used rasters are removed when it is exceeded.
+    """
+
+    def __init__(self, cachedir, maxbytes=256 * 2**20):
+        self.cachedir = cachedir
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        if not os.path.isdir(cachedir):
+            os.makedirs(cachedir)
+
+    # File name suffix of the cached items
+    suffix = '.npy'
+
+    def _path(self, key):
+        name = hashlib.sha1(repr(key).encode('utf-8')).hexdigest()
+        return os.path.join(self.cachedir, name + self.suffix)
+
+    def _read(self, fid):
+        return np.load(fid)
+
+    def _write(self, fid, rgba):
+        np.save(fid, rgba)
+
+    def get(self, key):
+        """Return the cached raster or None"""
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as fid:
+                rgba = self._read(fid)
+        except (IOError, OSError, ValueError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        try:
+            os.utime(path, None)   # Mark as recently used
+        except OSError:
+            pass
+        return rgba
+
+    def put(self, key, rgba):
+        """Store a raster and evict old rasters if needed"""
+        fd, tmpname = tempfile.mkstemp(suffix='.tmp', dir=self.cachedir)
+        with os.fdopen(fd, 'wb') as fid:
+            self._write(fid, rgba)
+        os.replace(tmpname, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Remove least recently used rasters until below maxbytes"""
+        files = []
+        for name in os.listdir(self.cachedir):
+            if not name.endswith(self.suffix):
+                continue
+            path = os.path.join(self.cachedir, name)
+            try:
+                st = os.stat(path)
+            except OSError:   # Removed by another process
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        total = sum(f[1] for f in files)
+        for mtime, size, path in sorted(files):
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Remove all cached rasters"""
+        for name in os.listdir(self.cachedir):
+            if name.endswith(self.suffix):
+                os.remove(os.path.join(self.cachedir, name))
+
+
+# --- Functions ---
+
+
+def _function_key(draw):
+    """Module and qualified name of a module-level function, or None"""
+    if not isinstance(draw, types.FunctionType):
+        return None
+    module = sys.modules.get(draw.__module__)
+    if getattr(module, draw.__qualname__, None) is not draw:
+        return None
+    return draw.__module__, draw.__qualname__
+
+
+def _facecolor(artist):
+    return tuple(float(v) for v in artist.get_facecolor())
+
+
+def base_key(pmap, draw, key=None):
+    """Cache key for the base layers of a map
+
+    The domain, projection, figure size, dpi, axes position, map and
+    figure background colours, coast file digest and drawing function,
+    with an optional extra user key for styles not given by the
+    function itself.
+
+    draw is identified by module and name. Raises ValueError if it is
+    not a module-level function and no key is given, as lambdas,
+    nested functions and partials can not be told apart that way.
+    """
+    fig = pmap.ax.figure
+    fkey = _function_key(draw)
+    if fkey is None and key is None:
+        raise ValueError('draw is not a module-level function, '
+                         'give an explicit key')
+    # The map background is the clip path patch if any, else the axes
+    background = pmap.clip_path if pmap.clip_path is not None else pmap.ax
+    return (pmap.lon0, pmap.lon1, pmap.lat0, pmap.lat1,
+            pmap.projection_key,
+            tuple(float(v) for v in fig.get_size_inches()),
+            float(fig.dpi),
+            tuple(float(v) for v in pmap.ax.get_position().bounds),
+            _facecolor(background),
+            _facecolor(fig),
+            pmap.coast.digest,
+            fkey,
+            key)
+
+
+def draw_cached_base(pmap, draw, cache, key=None):
+    """Draw base layers through a RasterCache
+
+    draw : Function drawing the base layers, called as draw(pmap)
+    cache : RasterCache
+    key : Extra hashable key, for instance for styles. Required if
+          draw is not a module-level function.
+
+    Call on a map with nothing drawn yet apart from the frame.
+
+    Returns True on a cache hit
+    """
+    fig = pmap.ax.figure
+    key = base_key(pmap, draw, key)
+    rgba = cache.get(key)
+    if rgba is not None:
+        # Raster below the axes, hide what it replaces
+        fig.figimage(rgba, zorder=-1, origin='upper')
+        pmap.ax.patch.set_visible(False)
+        for a in pmap.ax.get_children():
+            a.set_visible(False)
+        return True
+
+    draw(pmap)
+    fig.canvas.draw()
+    cache.put(key, np.array(fig.canvas.buffer_rgba()))
+    return False
@@ -0,0 +1,325 @@
+# -*- coding: utf-8 -*-
+
+"""Deferred drawing of maps, recorded once and rendered to many outputs
+
+A Scene records the drawing calls of a map, with the same methods and
+arguments as PolarMap or MercatorMap, without drawing anything. When
+rendered, the recorded layers are resolved first:
+
+  Invisible layers, with visible=False or alpha=0, are dropped
+  An identical layer repeated right after another is drawn once
+  A coast line drawn right after filling the land with the same
+  options becomes the edge of the land, one collection instead of two,
+  if no other layer is drawn between them by zorder
+  Fields on the same lon/lat arrays are projected once for all
+  layers and outputs
+
+The same scene can then be saved several times, for instance as a PNG
+thumbnail and a full size PDF, without running the drawing code again.
+The data arrays are kept by reference, changing them before rendering
+changes the result.
+
+Example:
+
+  scene = Scene(PolarMap, -10, 30, 54, 72, 'coast.npz')
+  scene.contourf(llon, llat, temp, levels=levels)
+  scene.contour(llon, llat, temp, levels=levels, colors='k')
+  scene.fillcontinents()
+  scene.drawcoastlines()
+  scene.drawparallels([55, 60, 65, 70])
+  scene.savefig('temp.pdf', figsize=(10, 8))
+  scene.savefig('thumb.png', figsize=(3, 2), dpi=72)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import numpy as np
+
+from coast import load_coast
+from grid import ProjectedGrid
+
+# Map methods recorded as layers
+LAYERS = ('drawbase', 'fillcontinents', 'drawcoastlines', 'drawparallels',
+          'drawmeridians', 'contourf', 'contour', 'imshow', 'density',
+          'plot', 'fill')
+
+# Layers with lon, lat as the first arguments, projected once when
+# followed by other positional arguments
+GRIDDED = ('contourf', 'contour', 'plot', 'fill')
+
+# drawcoastlines options carried over to the edge of fillcontinents
+EDGE_OPTIONS = ('color', 'linewidth', 'lw', 'linestyle', 'ls')
+
+# Default zorders of the artists drawn by the layers, drawbase may
+# draw anything and is left out
+ZORDERS = dict(fillcontinents=(1,), drawcoastlines=(2,),
+               drawparallels=(2, 3), drawmeridians=(2, 3), contourf=(1,),
+               contour=(2,), imshow=(0,), density=(0,), plot=(2,), fill=(1,))
+
+# --- Classes ---
+
+
+class Layer(object):
+    """A recorded drawing call
+
+    Set visible to False to leave the layer out of later renderings.
+    """
+
+    def __init__(self, name, args, kwargs):
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.visible = True
+
+    def __repr__(self):
+        return 'Layer({!r}, {} args, {!r})'.format(
+            self.name, len(self.args), sorted(self.kwargs))
+
+
+class Scene(object):
+    """Recorded drawing calls of a map
+
+    mapclass : PolarMap or MercatorMap
+    The other arguments are those of mapclass, without ax
+    """
+
+    def __init__(self, mapclass, lon0, lon1, lat0, lat1, coastfile,
+                 **kwargs):
+        self.mapclass = mapclass
+        self.domain = (lon0, lon1, lat0, lat1)
+        self.coast = load_coast(coastfile)
+        self.map_kwargs = kwargs
+        self.layers = []
+        self.stats = {}
+        # Projected grids by the ids of lon and lat, with references
+        # keeping the ids valid
+        self._grids = {}
+
+    def add(self, name, *args, **kwargs):
+        """Record a layer, name is the map method
+
+        Returns the Layer
+        """
+        if name not in LAYERS:
+            raise ValueError("{} is not a drawing method".format(name))
+        layer = Layer(name, args, kwargs)
+        self.layers.append(layer)
+        return layer
+
+    def resolve(self):
+        """The layers to draw, after dropping and merging
+
+        The counts are in the stats attribute
+        """
+        recorded = [layer for layer in self.layers if layer.visible]
+        layers = [layer for layer in recorded if _visible(layer)]
+        dropped = len(recorded) - len(layers)
+
+        # Only adjacent duplicates, a layer in between may be covered
+        # by the first and covered by the second
+        unique = []
+        for layer in layers:
+            if not (unique and _same(layer, unique[-1])):
+                unique.append(layer)
+        duplicates = len(layers) - len(unique)
+
+        merged = []
+        start = 0   # Index in unique of the first layer of merged[-1]
+        for k, layer in enumerate(unique):
+            if (merged and _mergeable(merged[-1], layer) and
+                    _keeps_order(merged[-1], layer, unique[:start],
+                                 unique[k + 1:])):
+                merged[-1] = _merge(merged[-1], layer)
+            else:
+                merged.append(layer)
+                start = k
+
+        self.stats = dict(recorded=len(self.layers),
+                          hidden=len(self.layers) - len(recorded),
+                          invisible=dropped, duplicates=duplicates,
+                          merged=len(unique) - len(merged),
+                          drawn=len(merged))
+        return merged
+
+    def render(self, ax):
+        """Draw the scene on a matplotlib Axes
+
+        Returns the map
+        """
+        lon0, lon1, lat0, lat1 = self.domain
+        pmap = self.mapclass(lon0, lon1, lat0, lat1, self.coast, ax=ax,
+                             **self.map_kwargs)
+        for layer in self.resolve():
+            args = layer.args
+            # A ProjectedGrid takes the place of lon, lat, and must be
+            # followed by another argument in the lat position
+            if (layer.name in GRIDDED and len(args) > 2 and
+                    not isinstance(args[0], ProjectedGrid)):
+                args = (self._grid(pmap, args[0], args[1]),) + args[2:]
+            getattr(pmap, layer.name)(*args, **layer.kwargs)
+        return pmap
+
+    def savefig(self, filename, figsize=None, dpi=None, **kwargs):
+        """Render the scene on a new figure and save it
+
+        figsize, dpi : Of the figure
+        kwargs : Passed on to savefig
+
+        Returns the map
+        """
+        from polarmap import agg_figure
+        fig = agg_figure(figsize=figsize, dpi=dpi)
+        pmap = self.render(fig.add_subplot(1, 1, 1))
+        fig.savefig(filename, **kwargs)
+        return pmap
+
+    def _grid(self, pmap, lon, lat):
+        """ProjectedGrid of lon, lat, made once per scene"""
+        key = (id(lon), id(lat))
+        try:
+            return self._grids[key][2]
+        except KeyError:
+            grid = pmap.grid(lon, lat)
+            self._grids[key] = (lon, lat, grid)
+            return grid
+
+
+def _record(name):
+    """Recording method of a layer"""
+    def record(self, *args, **kwargs):
+        return self.add(name, *args, **kwargs)
+    record.__name__ = str(name)
+    record.__doc__ = "Record a {} layer, returns the Layer".format(name)
+    return record
+
+
+for _name in LAYERS:
+    setattr(Scene, _name, _record(_name))
+
+
+# --- Functions ---
+
+
+def _visible(layer):
+    """False for layers drawing nothing"""
+    return (layer.kwargs.get('visible', True) is not False and
+            layer.kwargs.get('alpha', 1) != 0)
+
+
+def _same(a, b):
+    """True for layers with the same method, arguments and options
+
+    Arrays are compared by identity
+    """
+    if a.name != b.name or len(a.args) != len(b.args):
+        return False
+    if a.kwargs.get('alpha', 1) != 1:
+        # Translucent layers darken when drawn twice
+        return False
+    if any(x is not y and not _equal(x, y) for x, y in zip(a.args, b.args)):
+        return False
+    if sorted(a.kwargs) != sorted(b.kwargs):
+        return False
+    return all(_equal(a.kwargs[k], b.kwargs[k]) for k in a.kwargs)
+
+
+def _equal(x, y):
+    """Equality of scalars, strings and tuples, arrays only by identity"""
+    if x is y:
+        return True
+    if isinstance(x, np.ndarray) or isinstance(y, np.ndarray):
+        return False
+    try:
+        return bool(x == y)
+    except (TypeError, ValueError):
+        return False
+
+
+def _mergeable(fill, coast):
+    """True if a coast line layer can be drawn as the edge of the land
+
+    The land and the coast line must be drawn in batch with the same
+    simplification and without preclipping, the line clipping differs,
+    and the edge of the land must be hidden by the coast line.
+    """
+    from matplotlib import rcParams
+    from matplotlib.colors import to_rgba
+
+    if fill.name != 'fillcontinents' or coast.name != 'drawcoastlines':
+        return False
+    if fill.args or coast.args:
+        return False
+    for layer in (fill, coast):
+        if not layer.kwargs.get('batch', True) or \
+                layer.kwargs.get('preclip', False):
+            return False
+    if fill.kwargs.get('simplify') != coast.kwargs.get('simplify'):
+        return False
+    options = set(coast.kwargs) - {'batch', 'simplify', 'preclip'}
+    if not options <= set(EDGE_OPTIONS):
+        return False
+
+    edgecolor = fill.kwargs.get('edgecolor', 'black')
+    linewidth = fill.kwargs.get('linewidth', fill.kwargs.get(
+        'linewidths', rcParams['patch.linewidth']))
+    color = coast.kwargs.get('color', 'black')
+    width = coast.kwargs.get('linewidth', coast.kwargs.get(
+        'lw', rcParams['lines.linewidth']))
+    try:
+        hidden = (edgecolor == 'none' or
+                  (to_rgba(edgecolor) == to_rgba(color) and
+                   float(linewidth) <= float(width)))
+    except (TypeError, ValueError):
+        return False
+    return hidden
+
+
+def _keeps_order(fill, coast, before, after):
+    """True if merging the coast into the land keeps the drawing order
+
+    Matplotlib draws by zorder, and in the order drawn at equal zorder.
+    The merged coast line is drawn at the zorder of the land, every
+    other layer must stay on the same side of it.
+
+    before, after : The other layers, drawn before and after
+    """
+    zfill = fill.kwargs.get('zorder', ZORDERS['fillcontinents'][0])
+    zcoast = coast.kwargs.get('zorder', ZORDERS['drawcoastlines'][0])
+    for later, layers in ((False, before), (True, after)):
+        for layer in layers:
+            if 'zorder' in layer.kwargs:
+                zorders = (layer.kwargs['zorder'],)
+            elif layer.name in ZORDERS:
+                zorders = ZORDERS[layer.name]
+            else:
+                return False
+            for z in zorders:
+                above = (z, later) > (zcoast, False)
+                if above != ((z, later) > (zfill, False)):
+                    return False
+    return True
+
+
+def _merge(fill, coast):
+    """Land layer with the coast line as its edge"""
+    from matplotlib import rcParams
+
+    kwargs = dict(fill.kwargs)
+    for key in ('linewidth', 'linewidths', 'lw'):
+        kwargs.pop(key, None)
+    kwargs['edgecolor'] = coast.kwargs.get('color', 'black')
+    kwargs['linewidth'] = coast.kwargs.get('linewidth', coast.kwargs.get(
+        'lw', rcParams['lines.linewidth']))
+    linestyle = coast.kwargs.get('linestyle', coast.kwargs.get('ls'))
+    if linestyle is not None:
+        kwargs['linestyle'] = linestyle
+    return Layer('fillcontinents', fill.args, kwargs)
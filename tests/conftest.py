@@ -0,0 +1,8 @@
+# -*- coding: utf-8 -*-
+
+"""The modules are at the top level of the repository"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), os.pardir))
@@ -0,0 +1,115 @@
+# -*- coding: utf-8 -*-
+
+"""Coast files of coast.py, packed and old style"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+
+import numpy as np
+import pytest
+
+from coast import Coast, cull, load_coast, pack, save_coast
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+LEGACYFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npy')
+
+
+def _polygons(seed=0):
+    """Closed (lon, lat) polygons of different lengths"""
+    rng = np.random.default_rng(seed)
+    polygons = []
+    for n in (4, 17, 5, 120, 9):
+        lon = rng.uniform(-20, 40, n)
+        lat = rng.uniform(50, 80, n)
+        polygons.append((np.append(lon, lon[0]), np.append(lat, lat[0])))
+    return polygons
+
+
+def _save_legacy(filename, polygons):
+    """Old style coast file, an object array of lon and lat arrays"""
+    a = np.empty((len(polygons), 2), dtype=object)
+    for i, (lon, lat) in enumerate(polygons):
+        a[i, 0] = lon
+        a[i, 1] = lat
+    np.save(filename, a, allow_pickle=True)
+
+
+def _assert_same(c0, c1):
+    assert len(c0) == len(c1)
+    assert np.array_equal(c0.offsets, c1.offsets)
+    assert np.array_equal(c0.lonlat, c1.lonlat)
+    assert np.array_equal(c0.bbox, c1.bbox)
+    assert np.array_equal(c0.types, c1.types)
+    assert c0.digest == c1.digest
+
+
+@pytest.mark.parametrize('mmap_mode', ['r', None])
+def test_packed_and_legacy(tmp_path, mmap_mode):
+    polygons = _polygons()
+    legacy = str(tmp_path / 'coast.npy')
+    packed = str(tmp_path / 'coast.npz')
+    _save_legacy(legacy, polygons)
+    save_coast(packed, polygons)
+
+    old = load_coast(legacy)
+    new = load_coast(packed, mmap_mode)
+    _assert_same(old, new)
+    for p, (lon, lat) in zip(new, polygons):
+        assert np.array_equal(p[0], lon) and np.array_equal(p[1], lat)
+    if mmap_mode is not None:
+        assert isinstance(new.lonlat, np.memmap)
+
+
+def test_converted(tmp_path):
+    # An old style file saved again in the packed format
+    packed = str(tmp_path / 'converted.npz')
+    old = load_coast(LEGACYFILE)
+    save_coast(packed, old)
+    _assert_same(old, load_coast(packed))
+
+
+def test_bundled_files():
+    _assert_same(load_coast(LEGACYFILE), load_coast(COASTFILE))
+
+
+def test_coast_unchanged():
+    coast = load_coast(COASTFILE)
+    assert load_coast(coast) is coast
+    assert isinstance(coast, Coast)
+
+
+def _box(lon0, lon1, lat0, lat1):
+    """Closed rectangle as a (lon, lat) polygon"""
+    return (np.array([lon0, lon1, lon1, lon0, lon0], dtype=float),
+            np.array([lat0, lat0, lat1, lat1, lat0], dtype=float))
+
+
+def test_cull_dateline():
+    coast = pack([
+        _box(0, 10, 60, 65),
+        _box(175, 185, 60, 62),        # Crossing the dateline
+        _box(-178, -170, 63, 64),      # West of the dateline
+        _box(100, 110, 60, 62),        # Outside in longitude
+        _box(0, 10, 20, 25),           # Outside in latitude
+    ])
+
+    # East of the dateline, the western polygon is shifted by 360
+    subset, inside, stats = cull(coast, 180, 200, 55, 70)
+    assert np.allclose(subset.bbox, [[175, 185, 60, 62],
+                                     [182, 190, 63, 64]])
+    assert np.allclose(subset[1][0], [182, 190, 190, 182, 182])
+    assert inside.tolist() == [False, True]
+    assert stats['culled_polygons'] == 2
+
+    # West of the dateline, the crossing polygon is shifted by -360
+    subset, inside, stats = cull(coast, -180, -160, 55, 70)
+    assert np.allclose(subset.bbox, [[-185, -175, 60, 62],
+                                     [-178, -170, 63, 64]])
+    assert inside.tolist() == [False, True]
+
+    subset, inside, stats = cull(coast, -10, 30, 54, 72)
+    assert len(subset) == 1 and inside.tolist() == [True]
+    assert subset.digest != coast.digest
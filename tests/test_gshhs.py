@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+
+"""Round trip of a small synthetic GSHHS file through gshhs.py"""
+
+# ---------------
+# Imports
+# ---------------
+
+import numpy as np
+import pytest
+
+from coast import pack
+from gshhs import HEADER, SCALE, VERSION, read_coast, read_polygons, \
+    write_gshhs
+
+# Domain of the extraction tests
+DOMAIN = (-10, 30, 50, 80)
+
+
+def _box(lon0, lon1, lat0, lat1):
+    """Closed rectangle as a (lon, lat) polygon"""
+    return (np.array([lon0, lon1, lon1, lon0, lon0], dtype=float),
+            np.array([lat0, lat0, lat1, lat1, lat0], dtype=float))
+
+
+# Polygons of the fixture file and their GSHHS types
+POLYGONS = [
+    (_box(0, 10, 60, 65), 1),          # Land inside the domain
+    (_box(2, 4, 61, 62), 2),           # Lake
+    (_box(100, 110, 0, 10), 1),        # Far away, skipped by header bbox
+    (_box(-5, 5, 70, 72), 1),          # Crossing Greenwich
+    (_box(-8, -2, 55, 57), 1),         # West of Greenwich
+    (_box(25, 35, 52, 54), 1),         # Crossing the domain edge lon1
+    (_box(175, 185, 65, 68), 1),       # Crossing the dateline
+]
+
+
+@pytest.fixture
+def gshhsfile(tmp_path):
+    """Small GSHHS file written from POLYGONS"""
+    coast = pack([p for p, _ in POLYGONS], types=[t for _, t in POLYGONS])
+    filename = str(tmp_path / 'gshhs_test.b')
+    write_gshhs(filename, coast)
+    return filename
+
+
+def _polygons(coast):
+    """Sorted list of the bounding boxes of a Coast, rounded"""
+    return sorted(tuple(np.round(b, 6)) for b in np.asarray(coast.bbox))
+
+
+def test_round_trip(gshhsfile):
+    coast = read_coast(gshhsfile, clip=False)
+    assert len(coast) == len(POLYGONS)
+    assert sorted(coast.types) == sorted(t for _, t in POLYGONS)
+    expected = sorted((p[0].min(), p[0].max(), p[1].min(), p[1].max())
+                      for p, _ in POLYGONS)
+    assert np.allclose(_polygons(coast), expected, atol=SCALE)
+    for p in coast:
+        assert p.shape == (2, 5)
+
+
+def test_types(gshhsfile):
+    land = read_coast(gshhsfile, *DOMAIN, types=[1], clip=False)
+    assert set(land.types) == {1}
+    lakes = read_coast(gshhsfile, *DOMAIN, types=[2], clip=False)
+    assert len(lakes) == 1
+    assert np.allclose(lakes.bbox[0], (2, 4, 61, 62))
+
+
+def test_header_bbox_skip(gshhsfile):
+    # Move the points of the far away polygon into the domain, keeping
+    # its header. The polygon is skipped by the header bounding box.
+    with open(gshhsfile, 'r+b') as fid:
+        for i in range(2):
+            n = HEADER.unpack(fid.read(HEADER.size))[1]
+            fid.seek(8 * n, 1)
+        n = HEADER.unpack(fid.read(HEADER.size))[1]
+        xy = np.column_stack((np.full(n, 5.0), np.full(n, 62.0)))
+        fid.write(np.round(xy / SCALE).astype('>i4').tobytes())
+    polygons = list(read_polygons(gshhsfile, *DOMAIN))
+    assert len(polygons) == 5
+    for lon, lat, level in polygons:
+        assert lon.min() < 30 and lon.max() > -10
+
+
+def test_greenwich(gshhsfile):
+    coast = read_coast(gshhsfile, *DOMAIN, clip=False)
+    boxes = _polygons(coast)
+    assert (-5, 5, 70, 72) in boxes
+    assert (-8, -2, 55, 57) in boxes
+
+
+def test_stored_west_of_greenwich(tmp_path):
+    # As in the GSHHS files, west longitudes stored as 180..360
+    filename = str(tmp_path / 'west.b')
+    x = np.array([340, 345, 345, 340, 340]) * 1000000
+    y = np.array([60, 60, 62, 62, 60]) * 1000000
+    with open(filename, 'wb') as fid:
+        fid.write(HEADER.pack(0, 5, 1 | VERSION << 8, 340000000, 345000000,
+                              60000000, 62000000, 0, 0, -1, -1))
+        fid.write(np.column_stack((x, y)).astype('>i4').tobytes())
+    lon, lat, level = next(read_polygons(filename, -30, 0, 50, 70))
+    assert np.allclose(lon, [-20, -15, -15, -20, -20])
+    assert level == 1
+
+
+def test_dateline(gshhsfile):
+    # Stored at 175..185, read shifted to the domain west of the dateline
+    coast = read_coast(gshhsfile, -180, -170, 60, 70)
+    assert len(coast) == 1
+    assert np.allclose(coast.bbox[0], (-180, -175, 65, 68))
+
+
+def test_clip(gshhsfile):
+    coast = read_coast(gshhsfile, *DOMAIN)
+    lon0, lon1, lat0, lat1 = DOMAIN
+    lon, lat = coast.lonlat
+    assert lon.min() >= lon0 and lon.max() <= lon1
+    assert lat.min() >= lat0 and lat.max() <= lat1
+    # The polygon crossing lon1 is cut at the edge
+    assert (25, 30, 52, 54) in _polygons(coast)
+    # The polygons inside are unchanged
+    assert (0, 10, 60, 65) in _polygons(coast)
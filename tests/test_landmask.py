@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+
+"""Land/sea mask of landmask.py against matplotlib point in polygon"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+
+import numpy as np
+import pytest
+from matplotlib.path import Path
+
+from coast import load_coast, pack
+from landmask import LandIndex
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+
+
+def _star(lon, lat, radius, npoints, seed):
+    """Closed concave polygon with random radii around a centre"""
+    rng = np.random.default_rng(seed)
+    angle = np.linspace(0, 2 * np.pi, npoints, endpoint=False)
+    r = radius * rng.uniform(0.3, 1.0, npoints)
+    x = np.append(lon + r * np.cos(angle), lon + r[0])
+    y = np.append(lat + r * np.sin(angle), lat)
+    return x, y
+
+
+def _ring(lon0, lon1, lat0, lat1):
+    return (np.array([lon0, lon1, lon1, lon0, lon0], dtype=float),
+            np.array([lat0, lat0, lat1, lat1, lat0], dtype=float))
+
+
+@pytest.fixture
+def coast():
+    """Land with a lake and an island in the lake, and concave islands"""
+    polygons = [
+        _ring(0, 10, 60, 65),          # Land
+        _ring(2, 6, 61, 64),           # Lake in the land
+        _ring(3, 4, 62, 63),           # Island in the lake
+        _star(15, 70, 3, 40, 1),
+        _star(-5, 55, 2, 200, 2),
+        _star(20, 58, 4, 7, 3),
+    ]
+    return pack(polygons, types=[1, 2, 3, 1, 1, 1])
+
+
+def _expected(coast, lon, lat):
+    """Even-odd combination of Path.contains_points over the polygons"""
+    points = np.column_stack((lon, lat))
+    inside = np.zeros(len(points), dtype=bool)
+    for p in coast:
+        inside ^= Path(np.asarray(p).T).contains_points(points)
+    return inside
+
+
+def _points(n, box, seed=0):
+    rng = np.random.default_rng(seed)
+    lon0, lon1, lat0, lat1 = box
+    return rng.uniform(lon0, lon1, n), rng.uniform(lat0, lat1, n)
+
+
+@pytest.mark.parametrize('cellsize', [None, 0.25, 5.0])
+def test_contains(coast, cellsize):
+    lon, lat = _points(20000, (-10, 25, 50, 75))
+    index = LandIndex(coast, cellsize)
+    assert np.array_equal(index.contains(lon, lat),
+                          _expected(coast, lon, lat))
+
+
+def test_lake_and_island(coast):
+    index = LandIndex(coast)
+    assert index.contains([1, 2.5, 3.5, 30], [60.5, 61.5, 62.5, 60]).tolist() \
+        == [True, False, True, False]
+
+
+def test_grid(coast):
+    index = LandIndex(coast, 0.5)
+    lon = np.linspace(-8.03, 23.97, 161)
+    lat = np.linspace(51.01, 73.01, 89)
+    mask = index.grid(lon, lat)
+    llon, llat = np.meshgrid(lon, lat)
+    assert mask.shape == (len(lat), len(lon))
+    assert np.array_equal(mask, index.contains(llon, llat))
+    assert np.array_equal(mask.ravel(),
+                          _expected(coast, llon.ravel(), llat.ravel()))
+
+
+def test_coast_file():
+    coast = load_coast(COASTFILE)
+    lon, lat = _points(5000, (-10, 30, 54, 72), seed=1)
+    assert np.array_equal(LandIndex(coast).contains(lon, lat),
+                          _expected(coast, lon, lat))
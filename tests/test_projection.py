@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+"""Chunked evaluation of the projection engines against one chunk
+
+The engines in projection.py evaluate large arrays in chunks, and
+broadcast inputs chunk by chunk. A small chunk size makes every case
+below cross many chunk boundaries, also within rows.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import numpy as np
+import pytest
+
+from projection import Mercator, PolarStereographic, ll2xy, memmap_output, \
+    merc, xy2ll
+
+LON = np.linspace(-20, 40, 37)
+LAT = np.linspace(50, 80, 23)
+
+
+def _engines(chunk):
+    """Engines with the chunk size set on the instances"""
+    engines = [PolarStereographic(10.0), Mercator()]
+    for proj in engines:
+        proj.chunk = chunk
+    return engines
+
+
+def _reference(proj, lon, lat):
+    lon, lat = np.broadcast_arrays(lon, lat)
+    if isinstance(proj, Mercator):
+        return lon.astype(float), merc(lat)
+    return ll2xy(lon, lat, proj.vlon)
+
+
+# Inputs broadcasting to the same 23 x 37 grid
+INPUTS = {
+    'points': lambda: (np.meshgrid(LON, LAT)[0].ravel(),
+                       np.meshgrid(LON, LAT)[1].ravel()),
+    'mesh': lambda: np.meshgrid(LON, LAT),
+    'axes': lambda: (LON[np.newaxis, :], LAT[:, np.newaxis]),
+    'mixed': lambda: (np.meshgrid(LON, LAT)[0], LAT[:, np.newaxis]),
+    'transposed': lambda: (LON[:, np.newaxis], LAT[np.newaxis, :]),
+}
+
+
+@pytest.mark.parametrize('kind', sorted(INPUTS))
+@pytest.mark.parametrize('chunk', [1, 7, 50])
+@pytest.mark.parametrize('threads', [None, 3])
+def test_forward(kind, chunk, threads):
+    lon, lat = INPUTS[kind]()
+    for small, whole in zip(_engines(chunk), _engines(2**20)):
+        x, y = small.forward(lon, lat, threads=threads)
+        x0, y0 = whole.forward(lon, lat)
+        assert x.shape == x0.shape == np.broadcast(lon, lat).shape
+        assert np.allclose(x, x0, rtol=1e-12, atol=1e-12)
+        assert np.allclose(y, y0, rtol=1e-12, atol=1e-12)
+        xr, yr = _reference(small, lon, lat)
+        assert np.allclose(x, xr) and np.allclose(y, yr)
+
+
+@pytest.mark.parametrize('chunk', [1, 7, 50])
+def test_inverse(chunk):
+    lon, lat = np.meshgrid(LON, LAT)
+    for proj in _engines(chunk):
+        x, y = proj.forward(lon, lat)
+        lon2, lat2 = proj.inverse(x, y, threads=2)
+        assert np.allclose(lon2, lon) and np.allclose(lat2, lat)
+    x, y = ll2xy(lon, lat, 10.0)
+    lon2, lat2 = _engines(chunk)[0].inverse(x, y)
+    assert np.allclose((lon2, lat2), xy2ll(x, y, 10.0))
+
+
+def test_out_and_dtype(tmp_path):
+    lon, lat = LON[np.newaxis, :], LAT[:, np.newaxis]
+    for small, whole in zip(_engines(5), _engines(2**20)):
+        x0, y0 = whole.forward(lon, lat)
+        out = (np.empty(x0.shape), np.empty(x0.shape))
+        assert small.forward(lon, lat, out=out) is out
+        assert np.allclose(out[0], x0) and np.allclose(out[1], y0)
+
+        x, y = small.forward(*np.meshgrid(LON, LAT), dtype='float32')
+        assert x.dtype == y.dtype == np.float32
+        assert np.allclose(x, x0, atol=1e-4) and np.allclose(y, y0, atol=1e-4)
+
+        out = memmap_output(str(tmp_path / type(small).__name__), x0.shape)
+        small.forward(lon, lat, out=out, threads=2)
+        x = np.load(str(tmp_path / (type(small).__name__ + '_x.npy')))
+        assert np.allclose(x, x0, atol=1e-4)
+
+
+def test_out_shape():
+    proj = PolarStereographic(0.0)
+    with pytest.raises(ValueError):
+        proj.forward(LON, LAT[0], out=(np.empty(3), np.empty(3)))
+
+
+def test_scalar():
+    for small, whole in zip(_engines(1), _engines(2**20)):
+        x, y = small.forward(5.0, 60.0)
+        assert np.ndim(x) == 0
+        assert np.allclose((x, y), np.ravel(whole.forward([5.0], [60.0])))
@@ -0,0 +1,114 @@
+# -*- coding: utf-8 -*-
+
+"""Images of the raster lookup tables against direct interpolation
+
+Bilinear interpolation is exact for fields a + b*lon + c*lat +
+d*lon*lat, so the image of such a field is compared with the field
+evaluated at the inverse projected pixel centres.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+
+import numpy as np
+import pytest
+
+import raster
+from mercator import MercatorMap
+from polarmap import PolarMap, agg_figure
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+DOMAIN = (-10, 30, 54, 72)
+
+
+def _bilinear(lon, lat):
+    return 2.0 + 0.5 * lon - 0.3 * lat + 0.01 * lon * lat
+
+
+def _map(mapclass):
+    ax = agg_figure(figsize=(4, 3), dpi=50).add_subplot(1, 1, 1)
+    return mapclass(*DOMAIN, coastfile=COASTFILE, ax=ax)
+
+
+def _lut(pmap, lon, lat, method):
+    if pmap.projection.separable:
+        return raster.separable_lut(pmap, lon, lat, method)
+    return raster.raster_lut(pmap, lon, lat, method)
+
+
+def _pixel_lonlat(pmap, lut):
+    """Lon/lat of the pixel centres of a lookup table image"""
+    x, y = raster.pixel_centres(lut.shape, lut.extent)
+    xx, yy = np.meshgrid(x, y)
+    return pmap(xx, yy, inverse=True)
+
+
+@pytest.fixture(autouse=True)
+def empty_cache():
+    raster.cache.clear()
+
+
+@pytest.mark.parametrize('mapclass', [PolarMap, MercatorMap])
+@pytest.mark.parametrize('decreasing', [False, True])
+def test_bilinear(mapclass, decreasing):
+    pmap = _map(mapclass)
+    lon = np.linspace(-12, 32, 45)
+    lat = np.linspace(53, 73, 21)
+    if decreasing:
+        lat = lat[::-1]
+    llon, llat = np.meshgrid(lon, lat)
+    lut = _lut(pmap, lon, lat, 'bilinear')
+    image = lut(_bilinear(llon, llat))
+    assert image.shape == lut.shape
+
+    plon, plat = _pixel_lonlat(pmap, lut)
+    inside = ((plon >= DOMAIN[0]) & (plon <= DOMAIN[1]) &
+              (plat >= DOMAIN[2]) & (plat <= DOMAIN[3]))
+    valid = ~np.isnan(image)
+    assert valid.sum() > 0.9 * inside.sum()
+    if not pmap.projection.separable:
+        assert not np.any(valid & ~inside)
+    assert np.allclose(image[valid], _bilinear(plon, plat)[valid],
+                       rtol=0, atol=1e-3)
+
+
+@pytest.mark.parametrize('mapclass', [PolarMap, MercatorMap])
+def test_nearest(mapclass):
+    pmap = _map(mapclass)
+    lon = np.linspace(-12, 32, 23)
+    lat = np.linspace(53, 73, 11)
+    ids = np.arange(len(lat) * len(lon), dtype=float).reshape(len(lat), -1)
+    lut = _lut(pmap, lon, lat, 'nearest')
+    image = lut(ids)
+
+    plon, plat = _pixel_lonlat(pmap, lut)
+    valid = ~np.isnan(image)
+    i = np.abs(plon[valid][:, np.newaxis] - lon).argmin(axis=1)
+    j = np.abs(plat[valid][:, np.newaxis] - lat).argmin(axis=1)
+    assert np.array_equal(image[valid], ids[j, i])
+
+
+def test_masked():
+    pmap = _map(PolarMap)
+    lon = np.linspace(-12, 32, 45)
+    lat = np.linspace(53, 73, 21)
+    llon, llat = np.meshgrid(lon, lat)
+    field = np.ma.masked_where(llon > 10, _bilinear(llon, llat))
+    lut = _lut(pmap, lon, lat, 'bilinear')
+    image = lut(field)
+    plon, plat = _pixel_lonlat(pmap, lut)
+    assert np.all(np.isnan(image[plon > 11]))
+    assert not np.all(np.isnan(image[plon < 9]))
+
+
+@pytest.mark.parametrize('mapclass', [PolarMap, MercatorMap])
+def test_shape_mismatch(mapclass):
+    pmap = _map(mapclass)
+    lon = np.linspace(-12, 32, 45)
+    lat = np.linspace(53, 73, 21)
+    lut = _lut(pmap, lon, lat, 'bilinear')
+    with pytest.raises(ValueError):
+        lut(np.zeros((len(lon), len(lat))))
@@ -0,0 +1,111 @@
+# -*- coding: utf-8 -*-
+
+"""A map moved by set_extent against a new map of the same region
+
+Both figures are rendered with Agg and compared pixel by pixel.
+"""
+
+# ---------------
+# Imports
+# ---------------
+
+import os
+
+import numpy as np
+import pytest
+
+from mercator import MercatorMap
+from polarmap import PolarMap, agg_figure
+
+COASTFILE = os.path.join(os.path.dirname(__file__), os.pardir, 'coast.npz')
+DOMAIN = (-10, 30, 54, 72)
+
+LON = np.linspace(-20, 40, 121)
+LAT = np.linspace(50, 76, 53)
+LLON, LLAT = np.meshgrid(LON, LAT)
+FIELD = np.sin(0.1 * LLON) + np.cos(0.2 * LLAT)
+
+
+def _contours(pmap):
+    pmap.contourf(LLON, LLAT, FIELD)
+    pmap.contour(LLON, LLAT, FIELD, colors='k')
+
+
+def _image(pmap):
+    pmap.imshow(LON, LAT, FIELD, vmin=-1, vmax=2)
+
+
+def _density(pmap):
+    rng = np.random.default_rng(0)
+    pmap.density(rng.uniform(-20, 40, 20000), rng.uniform(50, 76, 20000),
+                  vmin=0, vmax=5)
+
+
+def _layers(pmap):
+    pmap.fillcontinents()
+    pmap.drawcoastlines()
+    pmap.drawparallels([56, 60, 64, 68])
+    pmap.drawmeridians([0, 10, 20])
+    pmap.plot([2, 10, 18], [59, 62, 65], 'r-')
+    pmap.fill([2, 5, 5], [59, 59, 62], 'g')
+
+
+def _unbatched(pmap):
+    pmap.fillcontinents(batch=False)
+    pmap.drawcoastlines(batch=False)
+
+
+DRAW = dict(contours=_contours, image=_image, density=_density,
+            layers=_layers, unbatched=_unbatched)
+
+# Map classes with new domains, and the new vlon of a PolarMap
+MOVES = [(PolarMap, (0, 20, 58, 66), None),
+         (PolarMap, (-15, 35, 52, 74), None),
+         (PolarMap, (0, 20, 58, 66), 0.0),
+         (MercatorMap, (0, 20, 58, 66), None),
+         (MercatorMap, (-15, 35, 52, 74), None)]
+
+
+def _render(pmap):
+    canvas = pmap.ax.figure.canvas
+    canvas.draw()
+    return np.array(canvas.buffer_rgba())
+
+
+def _map(mapclass, domain, vlon=None):
+    ax = agg_figure(figsize=(4, 3), dpi=60).add_subplot(1, 1, 1)
+    kwargs = {} if vlon is None else dict(vlon=vlon)
+    return mapclass(*domain, coastfile=COASTFILE, ax=ax, **kwargs)
+
+
+@pytest.mark.parametrize('layers', sorted(DRAW))
+@pytest.mark.parametrize('move', range(len(MOVES)))
+def test_set_extent(layers, move):
+    mapclass, extent, vlon = MOVES[move]
+    draw = DRAW[layers]
+
+    pmap = _map(mapclass, DOMAIN)
+    draw(pmap)
+    before = _render(pmap)
+    if vlon is None:
+        pmap.set_extent(*extent)
+    else:
+        pmap.set_extent(*extent, vlon=vlon)
+    moved = _render(pmap)
+
+    fresh = _map(mapclass, extent, vlon)
+    draw(fresh)
+    expected = _render(fresh)
+    assert pmap.ax.axis() == pytest.approx(fresh.ax.axis())
+    assert not np.array_equal(moved, before)
+    assert np.array_equal(moved, expected)
+
+
+def test_removed_artists():
+    pmap = _map(PolarMap, DOMAIN)
+    h = pmap.plot([2, 10, 18], [59, 62, 65], 'r-')
+    h[0].remove()
+    pmap.set_extent(0, 20, 58, 66)
+    assert h[0].axes is None
+    assert not any(a is h[0] for artists, _ in pmap._updates
+                   for a in artists)
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+
+"""Local tile server for PolarMap
+
+The projected x/y plane of a PolarMap domain is split into a tile
+pyramid. Zoom level z has 2**z by 2**z tiles of 256 by 256 pixels,
+tile (0, 0) in the upper left corner. Tiles are rendered on demand in
+a worker pool and kept in a TileCache, an LRU bounded cache in memory
+backed by PNG files on disk.
+
+The coast is culled and projected once when the server starts. The
+thread workers share the projection cache, process workers get the
+projected coast in shared memory, as in batch.py. Threads are enough
+for a few users, processes render in parallel on several cores.
+Tiles outside the map frame are served from one empty tile.
+
+Usage:
+
+  python tileserver.py [--port 8000] [--workers N] [--processes]
+                       [--cachedir DIR] [--maxzoom Z]
+
+  GET /{z}/{x}/{y}.png   Tile, 404 outside the pyramid, 500 if the
+                         rendering fails
+  GET /metrics           Cache hits and misses, latencies, as json
+
+From python:
+
+  tiles = TileServer(-10, 30, 54, 72, 'coast.npz', draw=my_layers)
+  png = tiles.tile(2, 1, 3)
+
+"""
+
+# --------------------------------------
+# Bjørn Ådlandsvik   <bjorn@imr.no>
+# Institute of Marine Research
+# --------------------------------------
+
+# ---------------
+# Imports
+# ---------------
+
+from __future__ import unicode_literals
+import argparse
+import io
+import json
+import re
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+
+import batch
+from polarmap import PolarMap, agg_figure
+from rastercache import RasterCache
+
+# Tile size in pixels, and the resolution giving line widths as
+# on ordinary figures
+TILESIZE = 256
+DPI = 100
+
+_TILE_INCHES = (TILESIZE / float(DPI), TILESIZE / float(DPI))
+
+# Latency samples kept for the percentiles
+NSAMPLES = 1000
+
+# --- Classes ---
+
+
+class TileGrid(object):
+    """Tile pyramid over a square in map coordinates
+
+    x0, x1, y0, y1 : Extent to cover, extended to a square
+    """
+
+    def __init__(self, x0, x1, y0, y1, maxzoom=8):
+        self.size = max(x1 - x0, y1 - y0)
+        self.left = 0.5 * (x0 + x1 - self.size)
+        self.top = 0.5 * (y0 + y1 + self.size)
+        self.maxzoom = maxzoom
+
+    def valid(self, z, x, y):
+        return 0 <= z <= self.maxzoom and 0 <= x < 2**z and 0 <= y < 2**z
+
+    def extent(self, z, x, y):
+        """Map coordinates of a tile, (x0, x1, y0, y1)"""
+        w = self.size / 2**z
+        return (self.left + x * w, self.left + (x + 1) * w,
+                self.top - (y + 1) * w, self.top - y * w)
+
+
+class PNGCache(RasterCache):
+    """Directory of cached PNG tiles with LRU eviction
+
+    As RasterCache, but stores the PNG bytes as they are, in .png
+    files that can be viewed directly.
+    """
+
+    suffix = '.png'
+
+    def _read(self, fid):
+        return fid.read()
+
+    def _write(self, fid, png):
+        fid.write(png)
+
+
+class TileCache(object):
+    """LRU cache of PNG tiles in memory, optionally backed by disk
+
+    maxbytes : Bound on the tiles in memory
+    cachedir : Directory of a PNGCache for the tiles, or None
+    maxdiskbytes : Bound on the tiles on disk
+    """
+
+    def __init__(self, maxbytes=64 * 2**20, cachedir=None,
+                 maxdiskbytes=512 * 2**20):
+        self.maxbytes = maxbytes
+        self.nbytes = 0
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+        self.disk = None
+        if cachedir is not None:
+            self.disk = PNGCache(cachedir, maxdiskbytes)
+
+    def get(self, key):
+        """The tile and where it was found, 'memory' or 'disk'
+
+        Returns None, None on a miss
+        """
+        with self._lock:
+            png = self._items.pop(key, None)
+            if png is not None:
+                self._items[key] = png
+                return png, 'memory'
+        if self.disk is not None:
+            png = self.disk.get(key)
+            if png is not None:
+                self._insert(key, png)
+                return png, 'disk'
+        return None, None
+
+    def put(self, key, png):
+        self._insert(key, png)
+        if self.disk is not None:
+            self.disk.put(key, png)
+
+    def _insert(self, key, png):
+        with self._lock:
+            old = self._items.pop(key, None)
+            if old is not None:
+                self.nbytes -= len(old)
+            self._items[key] = png
+            self.nbytes += len(png)
+            while self.nbytes > self.maxbytes and len(self._items) > 1:
+                self.nbytes -= len(self._items.popitem(last=False)[1])
+
+    def __len__(self):
+        return len(self._items)
+
+
+class TileMetrics(object):
+    """Counters and latencies of a tile server"""
+
+    def __init__(self):
+        self.start = time.time()
+        self.counts = dict.fromkeys(
+            ('requests', 'memory', 'disk', 'empty', 'rendered', 'shared',
+             'errors', 'invalid'), 0)
+        self.latency = deque(maxlen=NSAMPLES)
+        self.render_time = deque(maxlen=NSAMPLES)
+        self._lock = threading.Lock()
+
+    def count(self, name, latency=None, render_time=None):
+        with self._lock:
+            self.counts[name] += 1
+            if latency is not None:
+                self.counts['requests'] += 1
+                self.latency.append(latency)
+            if render_time is not None:
+                self.render_time.append(render_time)
+
+    def as_dict(self):
+        """Counts, hit rate, tiles per second and latencies in ms"""
+        with self._lock:
+            d = OrderedDict(self.counts)
+            latency = np.array(self.latency)
+            render_time = np.array(self.render_time)
+        elapsed = time.time() - self.start
+        hits = d['memory'] + d['disk'] + d['empty']
+        d['hit_rate'] = hits / float(max(d['requests'], 1))
+        d['tiles_per_s'] = d['requests'] / max(elapsed, 1e-9)
+        for name, a in (('latency', latency), ('render', render_time)):
+            if len(a):
+                p50, p95 = np.percentile(a, [50, 95]) * 1e3
+                d[name + '_ms'] = dict(p50=p50, p95=p95,
+                                       max=a.max() * 1e3)
+        return d
+
+
+class TileServer(object):
+    """Tiles of a PolarMap domain, rendered on demand and cached
+
+    draw : Function drawing the layers, called as draw(pmap), must be
+           defined at module level with processes=True
+    workers : Size of the worker pool
+    processes : Render in worker processes instead of threads
+    cache : TileCache, by default in memory only
+    """
+
+    def __init__(self, lon0, lon1, lat0, lat1, coastfile, vlon=None,
+                 draw=None, maxzoom=8, workers=None, processes=False,
+                 cache=None):
+        self.draw = draw if draw is not None else draw_coast
+        self.cache = cache if cache is not None else TileCache()
+        self.metrics = TileMetrics()
+
+        # Cull and project the coast once
+        pmap = PolarMap(lon0, lon1, lat0, lat1, coastfile, vlon=vlon,
+                        ax=agg_figure().add_subplot(1, 1, 1))
+        self.coast = pmap.coast
+        self.domain = (lon0, lon1, lat0, lat1, pmap.vlon)
+        self.frame = (pmap.xbry.min(), pmap.xbry.max(),
+                      pmap.ybry.min(), pmap.ybry.max())
+        self.grid = TileGrid(*self.frame, maxzoom=maxzoom)
+        self.key = (pmap.projection_key, self.domain, self.coast.digest,
+                    getattr(self.draw, '__module__', None),
+                    getattr(self.draw, '__name__', repr(self.draw)))
+
+        self._shm = None
+        if processes:
+            self._shm, initargs = batch.share_coast(pmap)
+            self.pool = ProcessPoolExecutor(
+                workers, initializer=batch.attach,
+                initargs=initargs + (self.domain,))
+            self._coast = None   # Taken from shared memory by the workers
+        else:
+            pmap._project_coast()
+            self.pool = ThreadPoolExecutor(workers)
+            self._coast = pmap.coast_polygons
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._empty = None
+
+    def tile(self, z, x, y):
+        """PNG bytes of a tile
+
+        Raises ValueError if the tile is outside the pyramid, and
+        RuntimeError if the rendering fails, for instance in draw.
+        """
+        t0 = time.perf_counter()
+        if not self.grid.valid(z, x, y):
+            self.metrics.count('invalid')
+            raise ValueError("No tile {}/{}/{}".format(z, x, y))
+        extent = self.grid.extent(z, x, y)
+        if not _overlaps(extent, self.frame):
+            png = self._empty_tile()
+            self.metrics.count('empty', time.perf_counter() - t0)
+            return png
+
+        key = self.key + ((z, x, y),)
+        png, source = self.cache.get(key)
+        if png is not None:
+            self.metrics.count(source, time.perf_counter() - t0)
+            return png
+
+        # Render, or wait for a render of the same tile in progress
+        with self._lock:
+            future = self._pending.get(key)
+            shared = future is not None
+            if not shared:
+                future = self.pool.submit(render_tile, self.domain,
+                                          self._coast, self.draw, extent)
+                self._pending[key] = future
+        try:
+            png, render_time = future.result()
+        except Exception as e:
+            self.metrics.count('errors', time.perf_counter() - t0)
+            raise RuntimeError("Rendering tile {}/{}/{} failed: {!r}".format(
+                z, x, y, e)) from e
+        finally:
+            if not shared:
+                with self._lock:
+                    self._pending.pop(key, None)
+        if shared:
+            self.metrics.count('shared', time.perf_counter() - t0)
+        else:
+            self.cache.put(key, png)
+            self.metrics.count('rendered', time.perf_counter() - t0,
+                               render_time)
+        return png
+
+    def _empty_tile(self):
+        if self._empty is None:
+            fig = agg_figure(figsize=_TILE_INCHES, dpi=DPI)
+            buf = io.BytesIO()
+            fig.savefig(buf, format='png', dpi=DPI, transparent=True)
+            self._empty = buf.getvalue()
+        return self._empty
+
+    def close(self):
+        """Stop the workers and release the shared coast"""
+        self.pool.shutdown()
+        if self._shm is not None:
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
+
+
+class TileHTTPServer(ThreadingHTTPServer):
+    """Threaded HTTP server with room for many waiting connections"""
+
+    request_queue_size = 128
+    daemon_threads = True
+
+
+class TileHandler(BaseHTTPRequestHandler):
+    """HTTP requests for tiles and metrics, of the server's TileServer"""
+
+    pattern = re.compile(r'^/(\d+)/(\d+)/(\d+)\.png$')
+
+    def do_GET(self):
+        tiles = self.server.tiles
+        if self.path == '/metrics':
+            body = json.dumps(tiles.metrics.as_dict()).encode('utf-8')
+            return self._send(200, 'application/json', body)
+        m = self.pattern.match(self.path)
+        if m is None:
+            return self._send(404, 'text/plain', b'Not found\n')
+        try:
+            png = tiles.tile(*(int(v) for v in m.groups()))
+        except ValueError as e:
+            return self._send(404, 'text/plain', str(e).encode('utf-8'))
+        except RuntimeError as e:
+            return self._send(500, 'text/plain', str(e).encode('utf-8'))
+        self._send(200, 'image/png', png)
+
+    def _send(self, status, ctype, body):
+        self.send_response(status)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            BaseHTTPRequestHandler.log_message(self, format, *args)
+
+
+# --- Functions ---
+
+
+def draw_coast(pmap):
+    """Default tile layers, filled land with a coast line"""
+    pmap.fillcontinents(facecolor='0.8', edgecolor='black')
+
+
+def render_tile(domain, coast, draw, extent):
+    """Render one tile, in a worker
+
+    coast : Coast polygons, None in a worker process attached to the
+            shared coast
+
+    Returns the PNG bytes and the rendering time
+    """
+    t0 = time.perf_counter()
+    if coast is None:
+        coast = batch.shared['coast']
+    lon0, lon1, lat0, lat1, vlon = domain
+    fig = agg_figure(figsize=_TILE_INCHES, dpi=DPI)
+    ax = fig.add_axes([0, 0, 1, 1])
+    pmap = PolarMap(lon0, lon1, lat0, lat1, coast, vlon=vlon, ax=ax)
+    draw(pmap)
+    ax.set_aspect('auto')
+    ax.set_xlim(extent[0], extent[1])
+    ax.set_ylim(extent[2], extent[3])
+    buf = io.BytesIO()
+    fig.savefig(buf, format='png', dpi=DPI, transparent=True)
+    return buf.getvalue(), time.perf_counter() - t0
+
+
+def _overlaps(a, b):
+    """True if the boxes (x0, x1, y0, y1) overlap"""
+    return a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]
+
+
+def make_server(tiles, host='127.0.0.1', port=8000, verbose=False):
+    """HTTP server of a TileServer, call serve_forever to run it
+
+    With port 0 a free port is chosen, see server.server_address
+    """
+    server = TileHTTPServer((host, port), TileHandler)
+    server.tiles = tiles
+    server.verbose = verbose
+    return server
+
+
+def main():
+    """Main function if used as a script"""
+    parser = argparse.ArgumentParser(description='PolarMap tile server')
+    parser.add_argument('--coastfile', default='coast.npz')
+    parser.add_argument('--domain', type=float, nargs=4,
+                        default=(-10, 30, 54, 72),
+                        metavar=('LON0', 'LON1', 'LAT0', 'LAT1'))
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--processes', action='store_true')
+    parser.add_argument('--cachedir', help='On-disk tile cache')
+    parser.add_argument('--maxzoom', type=int, default=8)
+    parser.add_argument('--verbose', action='store_true')
+    args = parser.parse_args()
+
+    tiles = TileServer(*args.domain, coastfile=args.coastfile,
+                       maxzoom=args.maxzoom, workers=args.workers,
+                       processes=args.processes,
+                       cache=TileCache(cachedir=args.cachedir))
+    server = make_server(tiles, args.host, args.port, args.verbose)
+    print("Serving tiles on http://{}:{}/".format(*server.server_address))
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        tiles.close()
+
+
+if __name__ == '__main__':
+    main()